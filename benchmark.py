@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+import sys
+from utils.bench import compare_results, run_benchmarks, save_results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark processing, prepping and recommending on synthetic matches.')
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help='Comma-separated numbers of player rows.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, the fastest is kept.')
+    parser.add_argument('--out', default=os.path.join('benchmarks', 'results.json'), help='File to save the results to.')
+    parser.add_argument('--baseline', default=os.path.join('benchmarks', 'baseline.json'), help='Results to compare against.')
+    parser.add_argument('--save-baseline', action='store_true', help='Save the results as the new baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against the baseline, e.g. 0.25 for 25%%.')
+    parser.add_argument('--ci', action='store_true', help='Fail when there is no baseline to compare against, instead of only warning.')
+    args = parser.parse_args()
+
+    results = run_benchmarks([int(size) for size in args.sizes.split(',')], args.repeat)
+    save_results(results, args.baseline if args.save_baseline else args.out)
+    if args.save_baseline:
+        return
+    if not os.path.exists(args.baseline):
+        print(f'\nWARNING: no baseline at {args.baseline}, nothing was compared. Run with --save-baseline to record one.')
+        if args.ci:
+            sys.exit(1)
+        return
+
+    with open(args.baseline, 'r') as file:
+        baseline = json.load(file)
+    rows = compare_results(results, baseline, args.tolerance)
+
+    print(f'\nCompared with {args.baseline} ({baseline["meta"]["created"]}):')
+    for name, size, base, seconds, ratio, regressed in rows:
+        print(f'{name:<28} {size:>9,} rows {base:>10.4f}s -> {seconds:>10.4f}s {ratio:>6.2f}x{"  REGRESSION" if regressed else ""}')
+
+    regressions = sum(regressed for *_, regressed in rows)
+    if regressions:
+        print(f'{regressions} measurements are more than {args.tolerance:.0%} slower than the baseline.')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
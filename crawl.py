@@ -0,0 +1,37 @@
+import argparse
+import os
+from utils import metrics
+from utils.const import region_routing
+from utils.crawl import crawl, crawl_pipeline, crawl_planned
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl ranked matches of several regions at once into the match store.')
+    parser.add_argument('--regions', default='NA1,EUW1,KR', help=f'Comma-separated platform regions out of {",".join(region_routing)}.')
+    parser.add_argument('--tiers', default='CHALLENGER', help='Comma-separated ladders to seed new regions from, e.g. CHALLENGER,GRANDMASTER.')
+    parser.add_argument('--pipeline', action='store_true', help='Crawl the whole ladder of --tiers as a streaming pipeline instead of following match histories from the frontier.')
+    parser.add_argument('--pages', type=int, default=1, help='With --pipeline, ladder pages per division of tiers below Master.')
+    parser.add_argument('--budget', type=int, default=None, help='Spend this many requests per region as planned across --tiers (or --weights) for the most new matches per request.')
+    parser.add_argument('--weights', default=None, help='With --budget, comma-separated tier weights, e.g. CHALLENGER=2,GRANDMASTER=1.5,MASTER=1. Defaults to 1 for each of --tiers.')
+    parser.add_argument('--max-matches', type=int, default=None, help='Matches to save per region. Defaults to no limit.')
+    parser.add_argument('--frontier', default=os.path.join('data', 'frontier.sqlite'), help='SQLite file of seen players and matches.')
+    parser.add_argument('--store', default=os.path.join('data', 'matches_raw'), help='Match store directory.')
+    parser.add_argument('--metrics', default=None, help='Record metrics and write them to this JSON file.')
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable(args.metrics)
+
+    regions = [region.strip().upper() for region in args.regions.split(',')]
+    tiers = [tier.strip().upper() for tier in args.tiers.split(',')]
+    if args.budget is not None:
+        weights = dict.fromkeys(tiers, 1.0)
+        if args.weights:
+            weights = {tier.strip().upper(): float(weight) for tier, weight in (pair.split('=') for pair in args.weights.split(','))}
+        crawl_planned(regions, args.budget, weights, args.frontier, args.store)
+    elif args.pipeline:
+        crawl_pipeline(regions, args.max_matches, args.frontier, args.store, tiers=tiers, pages=args.pages)
+    else:
+        crawl(regions, args.max_matches, args.frontier, args.store, tiers=tiers)
+
+if __name__ == '__main__':
+    main()
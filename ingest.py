@@ -0,0 +1,47 @@
+import argparse
+import os
+import time
+from utils import metrics
+from utils.columnar import build_column_store
+from utils.ingest import benchmark_ingest, ingest_store
+from utils.store import MatchStore, iter_legacy_matches
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest raw match details into a Parquet dataset partitioned by patch and region.')
+    parser.add_argument('--store', default=os.path.join('data', 'matches_raw'), help='Match store directory.')
+    parser.add_argument('--out', default=os.path.join('data', 'matches_parquet'), help='Parquet dataset directory.')
+    parser.add_argument('--arrow', nargs='?', const=os.path.join('data', 'matches_arrow'), default=None,
+                        help='Also build a memory-mapped columnar store (see utils.columnar) in this directory. Defaults to data/matches_arrow.')
+    parser.add_argument('--legacy', help='Legacy matches_detailed.txt to import into the store first.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes. Defaults to the number of CPUs.')
+    parser.add_argument('--benchmark', action='store_true', help='Measure throughput with 1, 2, 4, ... workers instead of ingesting.')
+    parser.add_argument('--metrics', default=None, help='Record metrics and write them to this JSON file.')
+    parser.add_argument('--offline', action='store_true', help='Never download static data, use the patches saved in data/static.')
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable(args.metrics)
+    if args.offline:
+        os.environ['static_offline'] = '1'
+
+    if args.legacy:
+        with MatchStore(args.store) as store:
+            added = sum(store.put(match_json) for match_json in iter_legacy_matches(args.legacy))
+        print(f'Imported {added} matches from {args.legacy}.')
+
+    if args.benchmark:
+        for result in benchmark_ingest(args.store, args.workers):
+            print(f'{result["workers"]:>3} workers: {result["rows_per_second"]:>10,.0f} rows/s ({result["speedup"]:.2f}x)')
+        return
+
+    result = ingest_store(args.store, args.out, args.workers)
+    metrics.record_rows('ingest', result['rows'], result['seconds'])
+    print(f'Wrote {result["rows"]} rows to {args.out} in {result["seconds"]:.1f}s. Skipped: {result["skipped"]}')
+
+    if args.arrow:
+        start = time.perf_counter()
+        column_store = build_column_store(args.out, args.arrow)
+        print(f'Wrote {len(column_store.patches())} patches to {args.arrow} in {time.perf_counter() - start:.1f}s.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import json
+from utils.const import app_rate_limits
+from utils.mock_api import MockRiotAPI, benchmark_crawl, create_mock_server
+from utils.store import MatchStore
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the Riot API, or benchmark the crawler against one, without touching the real API.')
+    parser.add_argument('--regions', default='NA1', help='Comma-separated platform regions to serve.')
+    parser.add_argument('--players', type=int, default=2000, help='Synthetic players per region.')
+    parser.add_argument('--matches', type=int, default=20000, help='Synthetic matches per region.')
+    parser.add_argument('--store', default=None, help='Serve the recorded matches of this match store instead of synthetic ones.')
+    parser.add_argument('--app-limits', default=app_rate_limits, help='Application rate limits per host, e.g. 20:1,100:120.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mean seconds added to every response.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a 503.')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Share of requests whose connection is dropped without a response.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data and of the injected faults.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Run the mock API.')
+    serve.add_argument('--host', default='127.0.0.1', help='Address to listen on.')
+    serve.add_argument('--port', type=int, default=8080, help='Port to listen on.')
+
+    bench = commands.add_parser('bench', help='Crawl the mock API and report throughput and the responses served.')
+    bench.add_argument('--max-matches', type=int, default=1000, help='Matches to save per region.')
+    bench.add_argument('--scheduler', action='store_true', help='Crawl with CrawlScheduler instead of CrawlPipeline.')
+    bench.add_argument('--tiers', default='CHALLENGER,GRANDMASTER', help='Comma-separated ladders to crawl.')
+    args = parser.parse_args()
+
+    regions = [region.strip().upper() for region in args.regions.split(',')]
+    options = dict(app_limits=args.app_limits, latency=args.latency, error_rate=args.error_rate, drop_rate=args.drop_rate, seed=args.seed)
+    if args.store:
+        api = MockRiotAPI.from_store(MatchStore(args.store), **options)
+    else:
+        api = MockRiotAPI(regions, args.players, args.matches, **options)
+
+    if args.command == 'serve':
+        server = create_mock_server(api, args.host, args.port)
+        print(f'Serving a mock Riot API on http://{args.host}:{args.port}. Set api_base_url=http://{args.host}:{args.port}/{{host}} to crawl it.')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return
+
+    tiers = [tier.strip().upper() for tier in args.tiers.split(',')]
+    result = benchmark_crawl(api, regions, args.max_matches, not args.scheduler, tiers=tiers)
+    print(f'Saved {result["saved"]} matches in {result["seconds"]:.1f}s ({result["matches_per_second"]:.1f} matches/s).')
+    print(json.dumps({'responses': result['responses'], 'requests': result['requests']}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,79 @@
+import time
+start_time = time.perf_counter()
+
+import argparse
 import os
-import numpy as np
-import pandas as pd
-import tkinter as tk
-from tkinter import ttk
 from utils.const import *
-from utils.func import prep_for_rec, create_recommender, recommend_based_on_champion, display_most_popular
+from utils.cube import AggregateCube
+from utils.gui import create_recommender
 
-def main():
-    if os.path.exists(os.path.join('data', 'matches_data_prepped.csv')):
+def newest_source():
+    # Modification time of the newest data the cube is built from, 0 if there is none
+    sources = [os.path.join('data', 'matches_raw', 'index.tsv'), os.path.join('data', 'matches_data_prepped.parquet'),
+               os.path.join('data', 'matches_data_prepped.csv'), os.path.join('data', 'matches_arrow', 'index.json'),
+               os.path.join('data', 'matches_parquet'), os.path.join('data', 'matches_data.csv')]
+    return max((os.path.getmtime(source) for source in sources if os.path.exists(source)), default=0)
+
+def build_cube(cube_path):
+    # pandas and the processing functions are only imported when the snapshot is missing or stale
+    import pandas as pd
+    from utils.cube import refresh_cube
+    from utils.func import prep_for_rec
+
+    if os.path.isdir(os.path.join('data', 'matches_raw')):
+        # Only the matches downloaded since the cube was last saved are counted
+        return refresh_cube(cube_path, os.path.join('data', 'matches_raw'))
+
+    # The prepped data is stored as Parquet so its categorical columns survive the round trip
+    prepped_path = os.path.join('data', 'matches_data_prepped.parquet')
+    if os.path.exists(prepped_path):
+        df = pd.read_parquet(prepped_path)
+    elif os.path.exists(os.path.join('data', 'matches_data_prepped.csv')):
         df = pd.read_csv(os.path.join('data', 'matches_data_prepped.csv'))
-    elif os.path.exists(os.path.join('data', 'matches_data.csv')):
-        df = pd.read_csv(os.path.join('data', 'matches_data.csv'))
+    elif any(os.path.exists(os.path.join('data', name)) for name in ('matches_arrow', 'matches_parquet', 'matches_data.csv')):
+        if os.path.exists(os.path.join('data', 'matches_arrow')):
+            from utils.columnar import ColumnStore
+            df = ColumnStore(os.path.join('data', 'matches_arrow')).read(columns_to_keep + ['Game Version'])
+        elif os.path.exists(os.path.join('data', 'matches_parquet')):
+            df = pd.read_parquet(os.path.join('data', 'matches_parquet'), columns=columns_to_keep + ['Game Version'])
+        else:
+            df = pd.read_csv(os.path.join('data', 'matches_data.csv'), usecols=columns_to_keep + ['Game Version'])
         df = prep_for_rec(df, item_columns, finished_items, columns_to_keep)
 
         os.makedirs('data', exist_ok=True)
-        df.to_csv(os.path.join('data', 'matches_data_prepped.csv'), index=False)
+        df.to_parquet(prepped_path, index=False)
     else:
-        raise FileNotFoundError('Neither matches_data_prepped.csv nor matches_data.csv exist in the data folder.')
+        raise FileNotFoundError('None of matches_raw, matches_data_prepped.parquet, matches_arrow, matches_parquet or matches_data.csv exist in the data folder.')
+
+    cube = AggregateCube.from_df(df)
+    cube.save(cube_path)
+    return cube
+
+def main():
+    parser = argparse.ArgumentParser(description='Champion build recommender.')
+    parser.add_argument('--timing', action='store_true', help='Print how long imports and loading the data took.')
+    parser.add_argument('--offline', action='store_true', help='Never download static data, use the patches saved in data/static.')
+    args = parser.parse_args()
+    if args.offline:
+        os.environ['static_offline'] = '1'
+    import_time = time.perf_counter()
+
+    # Aggregates of every (champion, role), memory-mapped from the snapshot unless the data is newer
+    cube_path = os.path.join('data', 'cube')
+    meta_path = os.path.join(cube_path, 'meta.json')
+    if os.path.exists(meta_path) and os.path.getmtime(meta_path) >= newest_source():
+        cube = AggregateCube.load(cube_path, match_ids=False)
+    else:
+        cube = build_cube(cube_path)
+    load_time = time.perf_counter()
+
+    champion_names = sorted(set(champion for champion, _ in cube.keys))
+    roles = list(dict.fromkeys(role for _, role in cube.keys))
 
-    champion_names = sorted([champion for champion in df['Champion Name'].unique()])
-    roles = [role for role in df['Role'].unique()]
+    if args.timing:
+        print(f'Imports: {import_time - start_time:.3f}s, loading data: {load_time - import_time:.3f}s.')
 
-    create_recommender(df, champion_names, roles, rune_section_map, sec_rune_section_map, stat_section_map, num_items=10)
+    create_recommender(None, champion_names, roles, rune_section_map, sec_rune_section_map, stat_section_map, num_items=10, cube=cube)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import sys
+from utils import metrics
+from utils.export import export_all
+from utils.service import RecommendationService, create_server, run_batch
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve recommendations over HTTP, answer a batch of queries, or export every recommendation, without the GUI.')
+    parser.add_argument('--cube', default=os.path.join('data', 'cube'), help='Cube snapshot directory (see recommender.py).')
+    parser.add_argument('--index', default=os.path.join('data', 'cubes'), help='Patch index directory, for queries over recent patches.')
+    parser.add_argument('--metrics', default=None, help='Record metrics and write them to this JSON file. The server also shows them at /metrics.')
+    parser.add_argument('--cache-size', type=int, default=4096, help='Number of responses kept in the LRU cache.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Run the HTTP/JSON service.')
+    serve.add_argument('--host', default='127.0.0.1', help='Address to listen on.')
+    serve.add_argument('--port', type=int, default=8000, help='Port to listen on.')
+
+    batch = commands.add_parser('batch', help='Answer "champion,role" lines and write one JSON object per line.')
+    batch.add_argument('input', nargs='?', default='-', help='File of "champion,role" lines. Defaults to stdin.')
+    batch.add_argument('--out', default='-', help='File to write. Defaults to stdout.')
+    batch.add_argument('--num-items', type=int, default=10, help='Number of items per recommendation.')
+    batch.add_argument('--last-patches', type=int, default=None, help='Only count the newest N patches.')
+    batch.add_argument('--half-life', type=float, default=None, help='Weight patches by recency with this half-life in patches.')
+
+    export = commands.add_parser('export', help='Write the recommendations of every champion and role, plus a manifest.')
+    export.add_argument('--out', default=os.path.join('data', 'export'), help='Directory to write.')
+    export.add_argument('--num-items', type=int, default=10, help='Number of items per recommendation.')
+    export.add_argument('--workers', type=int, default=None, help='Number of worker processes. Defaults to the number of CPUs.')
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable(args.metrics)
+
+    if args.command == 'export':
+        export_all(args.cube, args.out, args.num_items, args.workers)
+        return
+
+    service = RecommendationService(args.cube, cache_size=args.cache_size, index_path=args.index)
+
+    if args.command == 'serve':
+        server = create_server(service, args.host, args.port)
+        print(f'Serving recommendations on http://{args.host}:{args.port} (data version {service.version}).')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return
+
+    in_file = sys.stdin if args.input == '-' else open(args.input, 'r')
+    out_file = sys.stdout if args.out == '-' else open(args.out, 'w')
+    # A line without a role gets an error entry rather than stopping the batch
+    queries = ([part.strip() for part in (line.split(',', 1) + [''])[:2]] for line in in_file if line.strip())
+    for result in run_batch(service, queries, args.num_items, args.last_patches, args.half_life):
+        out_file.write(json.dumps(result) + '\n')
+    if out_file is not sys.stdout:
+        out_file.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import pytest
+from utils.const import columns_to_keep, finished_items, item_columns
+from utils.func import prep_for_rec, process_matches
+from utils.static import StaticData
+from utils.synthetic import synthetic_matches, write_synthetic_static
+
+patches = ('14.12', '14.13', '14.14', '14.15', '14.16', '14.17')
+
+@pytest.fixture(scope='session')
+def static(tmp_path_factory):
+    # Static data of the synthetic IDs, so nothing is downloaded
+    path = str(tmp_path_factory.mktemp('static'))
+    write_synthetic_static(path, patches)
+    return StaticData(path, offline=True)
+
+@pytest.fixture(scope='session')
+def matches():
+    return list(synthetic_matches(600, patches, num_champions=20))
+
+@pytest.fixture(scope='session')
+def matches_df(matches):
+    df, _ = process_matches(matches)
+    return df
+
+@pytest.fixture(scope='session')
+def prepped(matches_df, static):
+    # Prepped rows that keep their match ID and game version, as the cube and patch index need
+    return prep_for_rec(matches_df, item_columns, finished_items, columns_to_keep + ['Match ID', 'Game Version'], static)
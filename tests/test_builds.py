@@ -0,0 +1,57 @@
+import numpy as np
+from utils.builds import BuildIndex
+from utils.cube import PatchIndex
+from utils.static import patch_of
+
+def test_half_life_window_key_only_in_old_patches(prepped):
+    # A (champion, role) only played in the oldest patch weighs almost nothing at half_life=1 and rounds to no games
+    df = prepped.copy()
+    df['Champion Name'] = df['Champion Name'].astype(str)
+    oldest = df['Game Version'].map(patch_of) == '14.12'
+    first = df[oldest].iloc[0]
+    old_only = oldest & (df['Champion Name'] == first['Champion Name']) & (df['Role'] == first['Role'])
+    df.loc[old_only, 'Champion Name'] = 'OLDONLY'
+
+    window = PatchIndex.from_df(df).window(half_life=1)
+    recommendations = window.recommend('OLDONLY', first['Role'], items=[first['Item 1']])
+    assert recommendations['Cores'] == []
+    assert recommendations['Next Items'] == []
+    assert (window.builds.levels[3]['count'] > 0).all()
+
+def test_half_life_window_keeps_builds(prepped):
+    index = PatchIndex.from_df(prepped)
+    window = index.window(half_life=2)
+    unweighted = index.window()
+    assert window.builds is not None
+    champion, role = unweighted.keys[0]
+    assert window.builds.count(champion, role, []) <= unweighted.builds.count(champion, role, [])
+
+def assert_same_index(index, expected):
+    assert index.keys == expected.keys and index.vocab == expected.vocab
+    assert np.array_equal(index.games, expected.games)
+    assert sorted(index.levels) == sorted(expected.levels)
+    for size in expected.levels:
+        for name in BuildIndex.names:
+            assert np.array_equal(index.levels[size][name], expected.levels[size][name]), (size, name)
+
+def test_merged_batches_match_one_index(prepped):
+    batches = np.array_split(np.arange(len(prepped)), 4)
+    merged = BuildIndex.from_df(prepped.iloc[batches[0]])
+    for batch in batches[1:]:
+        merged.merge(BuildIndex.from_df(prepped.iloc[batch]))
+    assert merged._pending
+
+    # Keys and items are coded in order of appearance, so the whole index is built by merging into an empty one too
+    expected = BuildIndex.empty()
+    expected.merge(BuildIndex.from_df(prepped))
+    assert_same_index(merged, expected)
+    assert not merged._pending
+
+    champion, role = merged.keys[0]
+    items = [item for item, _, _ in merged.next_items(champion, role, top=2)]
+    assert merged.next_items(champion, role, items) == expected.next_items(champion, role, items)
+
+def test_from_df_in_chunks(prepped, monkeypatch):
+    expected = BuildIndex.from_df(prepped)
+    monkeypatch.setattr(BuildIndex, 'chunk_rows', 97)
+    assert_same_index(BuildIndex.from_df(prepped), expected)
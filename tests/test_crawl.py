@@ -0,0 +1,29 @@
+from utils.crawl import CrawlPlanner
+from utils.frontier import Frontier
+from utils.store import MatchStore
+
+def test_planner_only_crawls_read_ladders(tmp_path):
+    # Every Challenger player was crawled before, so the budget planned for them has to move to Grandmaster,
+    # whose ladder must be read before any of its players are crawled
+    with Frontier(str(tmp_path / 'frontier.sqlite')) as frontier, MatchStore(str(tmp_path / 'matches')) as store:
+        planner = CrawlPlanner('NA1', frontier, store, budget=200, weights={'CHALLENGER': 10, 'GRANDMASTER': 1})
+        events = []
+
+        async def read_ladder(tier, players):
+            planner.calls += 1
+            events.append(('read', tier))
+            return [] if tier == 'CHALLENGER' else [f'{tier}-{i}' for i in range(players)]
+
+        async def crawl_tier(tier, puuids, depth):
+            assert ('read', tier) in events
+            planner.calls += len(puuids)
+            events.append(('crawl', tier))
+            return {'players': len(puuids), 'calls': len(puuids), 'new': 0, 'downloaded': 0, 'matches': 0}
+
+        planner.read_ladder, planner.crawl_tier = read_ladder, crawl_tier
+        report = planner.crawl()
+
+    assert events[0] == ('read', 'CHALLENGER')
+    assert ('crawl', 'GRANDMASTER') in events
+    assert ('crawl', 'CHALLENGER') not in events
+    assert report['CHALLENGER']['actual']['players'] == 0
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from utils.const import rune_section_map, sec_rune_section_map, stat_section_map
+from utils.cube import AggregateCube
+from utils.func import recommend_based_on_champion
+
+def assert_same_recommendations(recommendations, expected):
+    # Items with the same count can come in either order, so counts are compared as dicts
+    for name, value in expected.items():
+        if hasattr(value, 'to_dict'):
+            assert recommendations[name].to_dict() == value.to_dict(), name
+        else:
+            assert recommendations[name] == value, name
+
+def totals(cube):
+    return dict(zip(cube.keys, np.asarray(cube.games).tolist()))
+
+def test_cube_matches_recommend_based_on_champion(prepped):
+    cube = AggregateCube.from_df(prepped)
+    for champion, role in cube.keys:
+        expected = recommend_based_on_champion(prepped, champion, role, rune_section_map, sec_rune_section_map, stat_section_map)
+        assert_same_recommendations(cube.recommend(champion, role), expected)
+    assert cube.recommend('NOBODY', 'MIDDLE') == recommend_based_on_champion(prepped, 'NOBODY', 'MIDDLE', rune_section_map,
+                                                                             sec_rune_section_map, stat_section_map)
+
+def test_update_counts_each_match_once(prepped):
+    match_ids = prepped['Match ID'].unique()
+    first = prepped[prepped['Match ID'].isin(match_ids[:len(match_ids) // 2])]
+    cube = AggregateCube.from_df(first)
+
+    # The whole data again: only the matches not in the first half are counted
+    assert cube.update(prepped) == len(match_ids) - first['Match ID'].nunique()
+    assert cube.update(prepped) == 0
+    expected = AggregateCube.from_df(prepped)
+    assert totals(cube) == totals(expected)
+    assert cube.match_ids == expected.match_ids
+    champion, role = expected.keys[0]
+    assert_same_recommendations(cube.recommend(champion, role), expected.recommend(champion, role))
+
+def test_merge_adds_counts(prepped):
+    match_ids = prepped['Match ID'].unique()
+    halves = [prepped[prepped['Match ID'].isin(ids)] for ids in np.array_split(match_ids, 2)]
+    cube = AggregateCube.from_df(halves[0])
+    cube.merge(AggregateCube.from_df(halves[1]))
+    assert totals(cube) == totals(AggregateCube.from_df(prepped))
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_snapshot_round_trip(prepped, tmp_path, mmap):
+    cube = AggregateCube.from_df(prepped)
+    cube.save(str(tmp_path))
+    loaded = AggregateCube.load(str(tmp_path), mmap=mmap)
+
+    assert loaded.keys == cube.keys
+    assert loaded.match_ids == cube.match_ids
+    assert isinstance(loaded.games, np.memmap) == mmap
+    for group, counts in cube.counts.items():
+        assert np.array_equal(loaded.counts[group], counts)
+        assert list(loaded.vocab[group]) == list(cube.vocab[group])
+    for champion, role in cube.keys[:10]:
+        assert_same_recommendations(loaded.recommend(champion, role), cube.recommend(champion, role))
+        assert loaded.recommend(champion, role)['Cores'] == cube.recommend(champion, role)['Cores']
+
+def test_loaded_snapshot_updates(prepped, tmp_path):
+    # Memory-mapped counts are read-only, so updating a loaded cube makes new arrays
+    match_ids = prepped['Match ID'].unique()
+    AggregateCube.from_df(prepped[prepped['Match ID'].isin(match_ids[:100])]).save(str(tmp_path))
+    loaded = AggregateCube.load(str(tmp_path))
+    assert loaded.update(prepped) == len(match_ids) - 100
+    assert totals(loaded) == totals(AggregateCube.from_df(prepped))
@@ -0,0 +1,75 @@
+import threading
+import time
+import pytest
+import requests
+from utils.fetch import FetchEngine, RateLimiter, riot_url, run
+from utils.mock_api import MockRiotAPI, create_mock_server
+
+summoner_path = '/lol/summoner/v4/summoners/by-puuid/mock-NA1-{}'
+
+@pytest.fixture
+def serve(monkeypatch):
+    # Serves a MockRiotAPI on a free port and points the Riot API base URL at it
+    servers = []
+
+    def serve(api):
+        server = create_mock_server(api, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setenv('api_base_url', f'http://127.0.0.1:{server.server_address[1]}/{{host}}')
+        return api
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_rate_limiter_enforces_every_window():
+    # 2 requests per 0.2s and 3 per second: the third waits for the short window, the fourth for the long one
+    limiter = RateLimiter([(2, 0.2), (3, 1)])
+    delays = [limiter.reserve() for _ in range(4)]
+    assert delays[0] == pytest.approx(0, abs=0.01) and delays[1] == pytest.approx(0, abs=0.01)
+    assert delays[2] == pytest.approx(0.2 + RateLimiter.margin, abs=0.02)
+    assert delays[3] == pytest.approx(1 + RateLimiter.margin, abs=0.02)
+
+def test_rate_limiter_catches_up_with_riot_counts():
+    # Requests Riot counted but this limiter did not (e.g. another process) use up the window
+    limiter = RateLimiter('2:1')
+    limiter.update('2:1', '2:1')
+    assert limiter.headroom() == 0
+    assert limiter.reserve() == pytest.approx(1 + RateLimiter.margin, abs=0.02)
+
+def test_rate_limiter_block():
+    limiter = RateLimiter('100:1')
+    limiter.block(0.5)
+    assert limiter.reserve() == pytest.approx(0.5, abs=0.02)
+
+def test_429_retried_after_retry_after(serve):
+    # The engine does not know the mock allows one request per second, so one of two concurrent requests gets a 429
+    api = serve(MockRiotAPI(players=20, matches=10, app_limits='1:1'))
+    engine = FetchEngine(app_limits='100:1', method_limits='100:1', backoff=0.01)
+    urls = [riot_url('na1', summoner_path.format(rank), 'key') for rank in range(2)]
+
+    start = time.perf_counter()
+    results = run(engine.fetch_all(urls, 'summoner-v4.getByPUUID'))
+    assert [result['puuid'] for result in results] == ['mock-NA1-0', 'mock-NA1-1']
+    assert api.stats[('summoner-v4.getByPUUID', 429)] == 1
+    assert engine.stats.summary()['na1']['statuses'] == {200: 2, 429: 1}
+    # Retry-After is rounded up to whole seconds
+    assert time.perf_counter() - start >= 1
+
+def test_dropped_connections_end_in_exception(serve):
+    api = serve(MockRiotAPI(players=20, matches=10, drop_rate=1.0))
+    engine = FetchEngine(max_retries=2, backoff=0.01)
+    results = run(engine.fetch_all([riot_url('na1', summoner_path.format(0), 'key')], 'summoner-v4.getByPUUID'))
+    assert isinstance(results[0], requests.exceptions.ConnectionError)
+    assert api.stats[('summoner-v4.getByPUUID', 'dropped')] == 3
+
+def test_server_errors_end_in_exception(serve):
+    api = serve(MockRiotAPI(players=20, matches=10, error_rate=1.0))
+    engine = FetchEngine(max_retries=2, backoff=0.01)
+    url = riot_url('na1', summoner_path.format(0), 'key')
+    with pytest.raises(requests.exceptions.HTTPError):
+        engine.get_json(url, 'summoner-v4.getByPUUID')
+    assert api.stats[('summoner-v4.getByPUUID', 503)] == 3
+    assert engine.stats.summary()['na1']['statuses'] == {503: 3}
@@ -0,0 +1,18 @@
+import pandas as pd
+from utils.formatting import display_most_popular, format_counts
+
+def test_format_counts():
+    series = pd.Series({'Flash': 12, 'Ignite': 3})
+    assert format_counts(series) == series.to_string()
+    assert format_counts(series, 1) == series.head(1).to_string()
+    assert format_counts([('Flash', 12), ('Ignite', 3)]) == 'Flash     12\nIgnite     3'
+
+def test_format_counts_empty():
+    assert format_counts(pd.Series([], dtype='int64')) == 'No data.'
+    assert format_counts([]) == 'No data.'
+    assert format_counts(pd.Series({'Flash': 12}), 0) == 'No data.'
+
+def test_display_most_popular_without_items():
+    text = display_most_popular({'Items': pd.Series([], dtype='int64'), 'Summoner Spells': [('Flash', 1)]})
+    assert 'Series([]' not in text
+    assert 'Most Popular Items:\n' + '-' * 20 + '\nNo data.' in text
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+from utils.const import match_columns, rune_section_map, sec_rune_section_map, stat_section_map
+from utils.func import aggregate_runes, process_match, process_matches, recommend_based_on_champion
+
+def row_by_row(matches):
+    # The frame `process_matches` replaces: one `process_match` per match, skipping the ones it rejects
+    frames = []
+    for match_json in matches:
+        try:
+            frames.append(process_match(match_json))
+        except ValueError:
+            pass
+    df = pd.concat(frames, ignore_index=True)
+    return df.astype({name: dtype for name, dtype in match_columns.items() if dtype != 'str'})
+
+@pytest.mark.parametrize('block_size', [1024, 7])
+def test_process_matches_matches_process_match(matches, block_size):
+    expected = row_by_row(matches)
+    df, skipped = process_matches(matches, block_size=block_size)
+    pd.testing.assert_frame_equal(df, expected)
+    assert sum(skipped.values()) == len(matches) - expected['Match ID'].nunique()
+
+@pytest.mark.parametrize('block_size', [1024, 7])
+def test_process_matches_arrow_matches_process_match(matches, block_size):
+    table, _ = process_matches(iter(matches), as_arrow=True, block_size=block_size)
+    assert table.column_names == list(match_columns)
+    pd.testing.assert_frame_equal(table.to_pandas(), row_by_row(matches))
+
+rune_columns = ['Rune 1', 'Rune 2', 'Rune 3', 'Rune 4']
+sec_rune_columns = ['Sec Rune 1', 'Sec Rune 2']
+
+def nested_loop_runes(df):
+    # The original dict-of-dicts counting that the section index and bincount replace
+    runes = {section: {slot: {rune: 0 for rune in slot_runes} for slot, slot_runes in slots.items()} for section, slots in rune_section_map.items()}
+    sec_runes = {section: {slot: {rune: 0 for rune in slot_runes} for slot, slot_runes in slots.items()} for section, slots in sec_rune_section_map.items()}
+    for column, slot in zip(rune_columns, ['Keystone', 'Slot 1', 'Slot 2', 'Slot 3']):
+        for rune, count in df[column].value_counts().items():
+            for section in rune_section_map:
+                if rune in runes[section][slot]:
+                    runes[section][slot][rune] += count
+    for rune, count in pd.concat([df['Sec Rune 1'], df['Sec Rune 2']]).value_counts().items():
+        for section, slots in sec_rune_section_map.items():
+            for slot, slot_runes in slots.items():
+                if rune in slot_runes:
+                    sec_runes[section][slot][rune] += count
+    return runes, sec_runes
+
+@pytest.fixture
+def with_unknown_runes(prepped):
+    # Runes from a patch newer than the rune map
+    df = prepped.astype({column: object for column in rune_columns + sec_rune_columns})
+    df.loc[df.index[:3], 'Rune 2'] = 'New Rune'
+    df.loc[df.index[1:3], 'Sec Rune 1'] = 'New Rune'
+    df.loc[df.index[5], 'Sec Rune 2'] = 'Other Rune'
+    return df
+
+def test_aggregate_runes_returns_two_counts(with_unknown_runes):
+    result = aggregate_runes(with_unknown_runes, rune_columns, sec_rune_columns, rune_section_map, sec_rune_section_map)
+    assert len(result) == 2
+    assert result == nested_loop_runes(with_unknown_runes)
+
+def test_aggregate_runes_return_unknown(with_unknown_runes):
+    runes, sec_runes, unknown = aggregate_runes(with_unknown_runes, rune_columns, sec_rune_columns, rune_section_map, sec_rune_section_map,
+                                                return_unknown=True)
+    assert (runes, sec_runes) == nested_loop_runes(with_unknown_runes)
+    assert unknown == {'New Rune': 5, 'Other Rune': 1}
+
+def test_recommendations_show_unknown_runes(with_unknown_runes):
+    row = with_unknown_runes.iloc[0]
+    df = with_unknown_runes[(with_unknown_runes['Champion Name'] == row['Champion Name']) & (with_unknown_runes['Role'] == row['Role'])]
+    _, _, unknown = aggregate_runes(df, rune_columns, sec_rune_columns, rune_section_map, sec_rune_section_map, return_unknown=True)
+    recommendations = recommend_based_on_champion(with_unknown_runes, row['Champion Name'], row['Role'], rune_section_map,
+                                                  sec_rune_section_map, stat_section_map)
+    assert recommendations['Unknown Runes'] == unknown
+    assert 'New Rune' in recommendations['Unknown Runes']
@@ -0,0 +1,8 @@
+import os
+import subprocess
+import sys
+
+def test_service_imports_without_tkinter():
+    # The headless service and serve.py have to start on machines without Tk
+    code = 'import sys; sys.modules["tkinter"] = None; import utils.service, utils.export'
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,141 @@
+# Necessary imports
+import json
+import os
+import platform
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from utils.const import columns_to_keep, finished_items, item_columns, rune_section_map, sec_rune_section_map, stat_section_map
+from utils.formatting import display_most_popular
+from utils.func import aggregate_runes, filter_items, name_replace, prep_for_rec, process_match, process_matches, recommend_based_on_champion
+from utils.static import StaticData
+from utils.synthetic import synthetic_matches, write_synthetic_static
+
+
+
+# Largest number of rows the one-match-at-a-time `process_match` is timed at
+process_match_max_rows = 10000
+
+
+
+def best_time(func, repeat=3):
+    """
+    Times a function, keeping the fastest of a few runs.
+
+    Args:
+        func (callable): Function to time, called with no arguments.
+        repeat (int, optional): Number of runs. Defaults to 3.
+
+    Returns:
+        tuple: Fastest time in seconds and the result of the last run.
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+
+def run_benchmarks(sizes=(1000, 10000, 100000, 1000000), repeat=3, patches=('14.16', '14.17'), num_queries=20):
+    """
+    Times the processing, prepping and recommendation functions on synthetic matches (see `utils.synthetic`).
+
+    Args:
+        sizes (tuple, optional): Numbers of player rows to time at (10 per match). Defaults to 1k, 10k, 100k and 1M.
+        repeat (int, optional): Runs per measurement, the fastest is kept. Defaults to 3.
+        patches (tuple, optional): Patches the matches are spread over. Defaults to ('14.16', '14.17').
+        num_queries (int, optional): Number of (champion, role) queries per recommendation measurement. Defaults to 20.
+
+    Returns:
+        dict: 'meta' describing the machine and 'results' as benchmark -> size -> seconds.
+    """
+
+    results = {}
+
+    def record(name, size, seconds):
+        results.setdefault(name, {})[str(size)] = seconds
+        print(f'{name:<28} {size:>9,} rows {seconds:>10.4f}s')
+
+    with tempfile.TemporaryDirectory() as static_path:
+        write_synthetic_static(static_path, patches)
+        static = StaticData(static_path, offline=True)
+
+        for size in sizes:
+            # At most 1000 distinct matches are generated, larger runs reuse them under new match IDs
+            matches = list(synthetic_matches(size // 10, patches, num_distinct=1000, skip_rate=0))
+
+            if size <= process_match_max_rows:
+                record('process_match', size, best_time(lambda: [process_match(match_json) for match_json in matches], repeat)[0])
+
+            seconds, (df, _) = best_time(lambda: process_matches(matches), repeat)
+            record('process_matches', size, seconds)
+            del matches
+
+            seconds, prepped = best_time(lambda: prep_for_rec(df, item_columns, finished_items, columns_to_keep, static), repeat)
+            record('prep_for_rec', size, seconds)
+
+            named = name_replace(df[columns_to_keep + ['Game Version']].copy(), static)
+            record('filter_items', size, best_time(lambda: filter_items(named.copy(), item_columns, finished_items), repeat)[0])
+
+            rune_columns = ['Rune 1', 'Rune 2', 'Rune 3', 'Rune 4']
+            sec_rune_columns = ['Sec Rune 1', 'Sec Rune 2']
+            record('aggregate_runes', size, best_time(
+                lambda: aggregate_runes(prepped, rune_columns, sec_rune_columns, rune_section_map, sec_rune_section_map), repeat)[0])
+
+            # Per-query times, averaged over the most common (champion, role) pairs
+            queries = prepped.groupby(['Champion Name', 'Role'], observed=True).size().nlargest(num_queries).index.tolist()
+            seconds, recommendations = best_time(
+                lambda: [recommend_based_on_champion(prepped, champion, role, rune_section_map, sec_rune_section_map, stat_section_map)
+                         for champion, role in queries], repeat)
+            record('recommend_based_on_champion', size, seconds / len(queries))
+
+            seconds, _ = best_time(lambda: [display_most_popular(recommendation) for recommendation in recommendations], repeat)
+            record('display_most_popular', size, seconds / len(recommendations))
+
+    meta = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'cpus': os.cpu_count(), 'repeat': repeat}
+    return {'meta': meta, 'results': results}
+
+
+
+def compare_results(results, baseline, tolerance=0.25):
+    """
+    Compares benchmark results against a baseline run.
+
+    Args:
+        results (dict): Results from `run_benchmarks`.
+        baseline (dict): Earlier results from `run_benchmarks`.
+        tolerance (float, optional): Allowed slowdown before a measurement counts as a regression. Defaults to 0.25 (25%).
+
+    Returns:
+        list: (benchmark, size, baseline seconds, seconds, ratio, regressed) for every measurement in both runs.
+    """
+
+    rows = []
+    for name, sizes in results['results'].items():
+        for size, seconds in sizes.items():
+            base = baseline['results'].get(name, {}).get(size)
+            if base is None:
+                continue
+            ratio = seconds / base if base else float('inf')
+            rows.append((name, int(size), base, seconds, ratio, ratio > 1 + tolerance))
+    return rows
+
+
+
+def save_results(results, path):
+    """
+    Saves benchmark results as JSON.
+
+    Args:
+        results (dict): Results from `run_benchmarks`.
+        path (str): File to write.
+    """
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=1)
@@ -0,0 +1,441 @@
+# Necessary imports
+import itertools
+import json
+import os
+import numpy as np
+from utils.const import item_columns
+
+
+
+class BuildIndex:
+    """
+    Counts of every combination of finished items built together, for every (champion, role).
+
+    `AggregateCube` counts each item on its own, which loses which items were built together. Here every row's
+    set of finished items (see `filter_items`) is split into all of its subsets of up to `max_size` items,
+    and each subset is counted per (champion, role). Subsets of 2 items are the item co-occurrence counts,
+    and larger ones are the frequent cores, e.g. the most common 3-item core.
+
+    A subset is stored as one integer: the key code followed by the subset's sorted item codes, `bits` bits
+    each, so each size is one sorted array of codes and one of counts. For the itemsets seen at least
+    `min_support` times, the index also keeps every (itemset without one item, that item) pair, sorted by
+    the smaller itemset and then by count, so the best next items after some items are a binary search and a
+    slice. Counts are exact and kept for every itemset, so indexes of separate batches can be merged.
+
+    A merge only remaps and sorts the itemsets of the new batch, which wait as a pending run until the index is
+    next read (see `compact`). Compacting inserts them into the sorted arrays without re-sorting the history, and
+    only re-sorts the next items of the itemsets the batch changed, so refreshing with a batch costs a sort of
+    the batch plus a copy of the arrays, however many batches came before.
+
+    Every row is split into up to C(6, size) itemsets of each size, 56 in all for sizes 1 to 4, each an 8-byte
+    integer. `from_df` splits rows into chunks of `chunk_rows`, so at most `chunk_rows` x 20 itemsets (the most of
+    any size) are held at once, on top of the distinct itemsets counted so far.
+
+    Example:
+        builds = BuildIndex.from_df(df)
+        builds.next_items('AHRI', 'MIDDLE', ["Luden's Companion", "Sorcerer's Shoes", "Shadowflame"])
+    """
+
+    bits = 10
+    names = ('code', 'count', 'parent', 'child', 'child_count')
+    chunk_rows = 100000                         # Rows split into itemsets at a time by `from_df`, about 16 MB of codes per size
+
+    def __init__(self, keys, vocab, games, levels, min_support=2):
+        self.keys = list(keys)                  # (champion, role) of each key code
+        self.vocab = list(vocab)                # Item name of each item code
+        self.games = games                      # np.ndarray of rows seen per key
+        self._levels = levels                   # Itemset size -> dict of arrays, see `_level`
+        self._pending = {}                      # Itemset size -> sorted (codes, counts) runs merged but not compacted yet
+        self.min_support = min_support
+        self._rows = {key: i for i, key in enumerate(self.keys)}
+        self._codes = {item: i for i, item in enumerate(self.vocab)}
+        if len(self.vocab) >= 1 << self.bits:
+            raise ValueError(f'Too many distinct items ({len(self.vocab)}) to pack into {self.bits} bits each.')
+        if levels and len(self.keys) >= 1 << (62 - self.bits * max(levels)):
+            raise ValueError(f'Too many (champion, role) keys ({len(self.keys)}) to pack with itemsets of {max(levels)} items.')
+
+    @classmethod
+    def empty(cls, max_size=4, min_support=2):
+        """
+        Creates an index with no data, to be filled with `merge`.
+
+        Args:
+            max_size (int, optional): Largest itemset counted. Defaults to 4.
+            min_support (int, optional): Fewest builds an itemset needs to be suggested by `next_items`. Defaults to 2.
+
+        Returns:
+            BuildIndex: The empty index.
+        """
+
+        empty = np.zeros(0, dtype=np.int64)
+        return cls([], [], empty, {size: cls._level(empty, empty, size, min_support) for size in range(1, max_size + 1)}, min_support)
+
+    @property
+    def levels(self):
+        if self._pending:
+            self.compact()
+        return self._levels
+
+    @property
+    def max_size(self):
+        return max(self._levels)
+
+    @classmethod
+    def _encode(cls, items, keys=None):
+        # Packs an (n, size) array of item codes, each row sorted ascending, and optionally their keys, into one integer per row
+        codes = np.zeros(len(items), dtype=np.int64) if keys is None else np.asarray(keys, dtype=np.int64).copy()
+        for column in range(items.shape[1]):
+            codes = (codes << cls.bits) | items[:, column]
+        return codes
+
+    @classmethod
+    def _decode(cls, codes, size):
+        # Inverse of `_encode`: the (n, size) item codes and the keys
+        mask = (1 << cls.bits) - 1
+        if not size:
+            return np.zeros((len(codes), 0), dtype=np.int64), codes
+        items = np.stack([(codes >> (cls.bits * (size - 1 - column))) & mask for column in range(size)], axis=1).reshape(len(codes), size)
+        return items, codes >> (cls.bits * size)
+
+    @classmethod
+    def _sum(cls, codes, counts):
+        # Sorts codes and sums the counts of repeated ones
+        if len(codes) and (counts == 1).all():
+            codes, counts = np.unique(codes, return_counts=True)
+        elif len(codes):
+            order = np.argsort(codes, kind='stable')
+            codes = codes[order]
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            codes, counts = codes[starts], np.add.reduceat(counts[order], starts)
+        return codes, counts.astype(np.result_type(counts, np.int64))     # Weighted counts (see `scaled`) stay floats
+
+    @classmethod
+    def _children(cls, codes, counts, size, min_support):
+        # Next-item table of the summed itemsets with enough support: (itemset without one item, that item, count)
+        # Most built first, so sorting by parent with a stable sort keeps each parent's children in count order
+        frequent = np.flatnonzero(counts >= min_support)
+        frequent = frequent[np.argsort(-counts[frequent], kind='stable')]
+        items, keys = cls._decode(codes[frequent], size)
+        parents = np.concatenate([cls._encode(np.delete(items, column, axis=1), keys) for column in range(size)]) if size else codes[:0]
+        children = items.T.ravel()
+        child_counts = np.tile(counts[frequent], size)
+        order = np.argsort(parents, kind='stable')
+        return {'parent': parents[order], 'child': children[order].astype(np.int16), 'child_count': child_counts[order]}
+
+    @classmethod
+    def _level(cls, codes, counts, size, min_support):
+        # Sums the counts of repeated codes and builds the next-item table of the itemsets with enough support
+        codes, counts = cls._sum(codes, counts)
+        return {'code': codes, 'count': counts, **cls._children(codes, counts, size, min_support)}
+
+    @classmethod
+    def from_df(cls, df, max_size=4, min_support=2):
+        """
+        Builds the index from a prepped DataFrame (see `prep_for_rec`), whose item columns only hold finished items.
+
+        Args:
+            df (pd.DataFrame): Prepped match data with champion, role and item columns.
+            max_size (int, optional): Largest itemset counted. Sizes up to 4 answer the best 4th item after 3. Defaults to 4.
+            min_support (int, optional): Fewest builds an itemset needs to be suggested by `next_items`. Defaults to 2.
+
+        Returns:
+            BuildIndex: The index.
+        """
+
+        import pandas as pd
+
+        key_codes, key_index = pd.MultiIndex.from_frame(df[['Champion Name', 'Role']]).factorize()
+        item_codes, vocab = pd.factorize(df[item_columns].to_numpy().ravel(order='F'))
+        items = item_codes.reshape(len(item_columns), len(df)).T.astype(np.int64)
+
+        # Each row becomes a sorted set: empty slots and repeated items are -1, which sorts first
+        items.sort(axis=1)
+        items[:, 1:][items[:, 1:] == items[:, :-1]] = -1
+        items.sort(axis=1)
+        sizes = (items >= 0).sum(axis=1)
+
+        levels = {}
+        for size in range(1, max_size + 1):
+            # Each chunk of rows is split into itemsets and summed on its own, which bounds the memory per row
+            runs = []
+            for start in range(0, len(items), cls.chunk_rows):
+                # Rows with fewer items than `size` have no subsets of that size
+                rows = start + np.flatnonzero(sizes[start:start + cls.chunk_rows] >= size)
+                row_items, row_keys = items[rows], key_codes[rows]
+                codes = []
+                for columns in itertools.combinations(range(items.shape[1]), size):
+                    subset = row_items[:, columns]
+                    present = subset[:, 0] >= 0     # Rows are sorted, so the first column is the smallest
+                    codes.append(cls._encode(subset[present], row_keys[present]))
+                codes = np.concatenate(codes) if codes else np.zeros(0, dtype=np.int64)
+                runs.append(cls._sum(codes, np.ones(len(codes), dtype=np.int64)))
+
+            if len(runs) == 1:
+                codes, counts = runs[0]
+            else:
+                codes, counts = cls._sum(np.concatenate([codes for codes, _ in runs] or [np.zeros(0, dtype=np.int64)]),
+                                         np.concatenate([counts for _, counts in runs] or [np.zeros(0, dtype=np.int64)]))
+            levels[size] = {'code': codes, 'count': counts, **cls._children(codes, counts, size, min_support)}
+
+        games = np.bincount(key_codes, minlength=len(key_index)).astype(np.int64)
+        return cls(list(key_index), list(vocab), games, levels, min_support)
+
+    def merge(self, other):
+        """
+        Adds the counts of another index into this one. Sizes that are not in both indexes are dropped.
+
+        Only the other index is remapped and sorted here. Its itemsets are kept as a pending run, which is inserted
+        into this index the next time it is read (see `compact`), so merging many batches in a row is cheap.
+
+        Args:
+            other (BuildIndex): Index of matches not yet counted in this one.
+        """
+
+        keys = self.keys + [key for key in other.keys if key not in self._rows]
+        vocab = self.vocab + [item for item in other.vocab if item not in self._codes]
+        rows = {key: i for i, key in enumerate(keys)}
+        codes = {item: i for i, item in enumerate(vocab)}
+        key_map = np.array([rows[key] for key in other.keys] or [0], dtype=np.int64)
+        item_map = np.array([codes[item] for item in other.vocab] or [0], dtype=np.int64)
+
+        other_levels = other.levels
+        sizes = sorted(set(self._levels) & set(other_levels))
+        for size in sizes:
+            # Item codes of the other index change, so its itemsets are re-sorted before packing
+            items, other_keys = self._decode(np.asarray(other_levels[size]['code']), size)
+            other_codes = self._encode(np.sort(item_map[items], axis=1), key_map[other_keys])
+            self._pending.setdefault(size, []).append(self._sum(other_codes, np.asarray(other_levels[size]['count'])))
+        self._levels = {size: self._levels[size] for size in sizes}
+        self._pending = {size: runs for size, runs in self._pending.items() if size in self._levels}
+
+        games = np.zeros(len(keys), dtype=np.result_type(self.games, other.games))
+        games[:len(self.keys)] = self.games
+        np.add.at(games, key_map[:len(other.keys)], other.games)
+
+        self.keys, self.vocab, self.games = keys, vocab, games
+        self._rows, self._codes = rows, codes
+
+    def compact(self):
+        """
+        Inserts the runs of merged itemsets into the sorted arrays. Reading the index compacts it first, so calling
+        this is only needed to compact it ahead of time, e.g. before sharing it between threads.
+        """
+
+        pending, self._pending = self._pending, {}
+        for size, runs in pending.items():
+            codes, counts = self._sum(np.concatenate([codes for codes, _ in runs]), np.concatenate([counts for _, counts in runs]))
+            if not len(codes):
+                continue
+            level = self._levels[size]
+            base_codes, base_counts = np.asarray(level['code']), np.asarray(level['count'])
+
+            # Itemsets already counted get their counts added, new ones are inserted where they sort
+            positions = np.searchsorted(base_codes, codes)
+            found = positions < len(base_codes)
+            found[found] = base_codes[positions[found]] == codes[found]
+            merged_counts = base_counts.astype(np.result_type(base_counts, counts))
+            merged_counts[positions[found]] += counts[found]
+            merged_codes = np.insert(base_codes, positions[~found], codes[~found])
+            merged_counts = np.insert(merged_counts, positions[~found], counts[~found])
+
+            self._levels[size] = {'code': merged_codes, 'count': merged_counts,
+                                  **self._update_children(level, codes, merged_counts[positions + np.cumsum(~found) - ~found], size)}
+
+    def _update_children(self, level, codes, counts, size):
+        # Next-item table of a level after the itemsets `codes` got the new total `counts`. Only the parents of those
+        # itemsets have changed children, so only their rows are rebuilt, and the rest of the table is copied as is
+        parents = np.asarray(level['parent'])
+        frequent = counts >= self.min_support
+        changed = self._children(codes[frequent], counts[frequent], size, self.min_support)
+        changed['code'] = self._itemsets(changed['parent'], changed['child'], size)
+
+        # Rows of the changed parents, found by bisecting the table, which is sorted by parent
+        affected = np.unique(changed['parent'])
+        starts, ends = np.searchsorted(parents, affected, 'left'), np.searchsorted(parents, affected, 'right')
+        lengths = ends - starts
+        rows = np.arange(lengths.sum()) + np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+
+        # Their unchanged children are kept, the changed ones replaced, and each parent's children sorted again the way
+        # `_children` orders them: most built first, then by the position of the child in the itemset, then by itemset
+        old = {name: np.asarray(level[name])[rows] for name in ('parent', 'child', 'child_count')}
+        old['code'] = self._itemsets(old['parent'], old['child'], size)
+        position = np.searchsorted(codes, old['code'])
+        unchanged = (position >= len(codes)) | (codes[np.minimum(position, len(codes) - 1)] != old['code'])
+        group = {name: np.concatenate([old[name][unchanged], changed[name]]) for name in ('parent', 'child', 'child_count', 'code')}
+        items, _ = self._decode(group['parent'], size - 1)
+        column = (items < group['child'][:, None].astype(np.int64)).sum(axis=1)
+        order = np.lexsort((group['code'], column, -group['child_count'], group['parent']))
+
+        keep = np.ones(len(parents), dtype=bool)
+        keep[rows] = False
+        at = np.searchsorted(parents[keep], group['parent'][order])
+        return {name: np.insert(np.asarray(level[name])[keep].astype(np.result_type(level[name], group[name]), copy=False), at, group[name][order])
+                for name in ('parent', 'child', 'child_count')}
+
+    @classmethod
+    def _itemsets(cls, parents, children, size):
+        # Packed codes of the itemsets made of each parent itemset and its child item
+        items, keys = cls._decode(parents, size - 1)
+        return cls._encode(np.sort(np.column_stack([items, children.astype(np.int64)]), axis=1), keys)
+
+    def scaled(self, weight, rounded=False):
+        """
+        Copies the index with every count multiplied by a weight, e.g. to weight a patch by its recency.
+
+        Args:
+            weight (float): Weight of every build.
+            rounded (bool, optional): Round the weighted counts to integers. Defaults to False, keeping floats so that
+                weighted indexes can be merged before rounding.
+
+        Returns:
+            BuildIndex: The weighted index.
+        """
+
+        def scale(counts):
+            counts = np.asarray(counts) * weight
+            return np.rint(counts).astype(np.int64) if rounded else counts
+
+        # Itemsets fall above or below `min_support` with their new counts, so the next-item tables are rebuilt
+        levels = {}
+        for size, level in self.levels.items():
+            codes, counts = np.asarray(level['code']), scale(level['count'])
+            if rounded:
+                # Itemsets rounded down to no builds are dropped, as if never seen
+                codes, counts = codes[counts > 0], counts[counts > 0]
+            levels[size] = self._level(codes, counts, size, self.min_support)
+        return BuildIndex(self.keys, self.vocab, scale(self.games), levels, self.min_support)
+
+    def _code(self, row, items):
+        # Packed code of a key and a list of item names, or None if one of the items was never built
+        if any(item not in self._codes for item in items):
+            return None
+        return int(self._encode(np.array(sorted(self._codes[item] for item in items), dtype=np.int64).reshape(1, len(items)), [row])[0])
+
+    def count(self, champion_name, role, items):
+        """
+        Counts the builds of a (champion, role) that include all of some items.
+
+        Args:
+            champion_name (str): Upper-case champion name.
+            role (str): Role.
+            items (list): Item names. At most `max_size` of them.
+
+        Returns:
+            int: Number of builds. The number of games for no items.
+        """
+
+        if (champion_name, role) not in self._rows:
+            return 0
+        row = self._rows[(champion_name, role)]
+        items = list(dict.fromkeys(items))
+        if not items:
+            return int(self.games[row])
+
+        code = self._code(row, items)
+        level = self.levels.get(len(items))
+        if code is None or level is None:
+            return 0
+        position = np.searchsorted(level['code'], code)
+        return int(level['count'][position]) if position < len(level['code']) and level['code'][position] == code else 0
+
+    def next_items(self, champion_name, role, items=(), top=10):
+        """
+        Gets the items most often built together with some items, e.g. the best 4th item given the first 3.
+
+        Args:
+            champion_name (str): Upper-case champion name.
+            role (str): Role.
+            items (list, optional): Items already built. At most `max_size - 1` of them. Defaults to none, giving the most built items.
+            top (int, optional): Number of items to return. Defaults to 10.
+
+        Returns:
+            list: (item, count, share) tuples, most common first, where share is the fraction of builds with `items` that
+                also have the item. Items built fewer than `min_support` times together with `items` are left out.
+        """
+
+        items = list(dict.fromkeys(items))
+        level = self.levels.get(len(items) + 1)
+        total = self.count(champion_name, role, items)
+        if level is None or not total:
+            return []
+
+        parent = self._code(self._rows[(champion_name, role)], items)
+        start, end = np.searchsorted(level['parent'], [parent, parent + 1])
+        end = min(end, start + top)
+        return [(self.vocab[child], count, count / total)
+                for child, count in zip(level['child'][start:end].tolist(), level['child_count'][start:end].tolist())]
+
+    def cores(self, champion_name, role, size=3, top=10):
+        """
+        Gets the most common sets of items built together, e.g. 3-item cores.
+
+        Args:
+            champion_name (str): Upper-case champion name.
+            role (str): Role.
+            size (int, optional): Number of items in a core. At most `max_size`. Defaults to 3.
+            top (int, optional): Number of cores to return. Defaults to 10.
+
+        Returns:
+            list: (items, count, share) tuples, most common first, where share is the fraction of games with the core.
+        """
+
+        level = self.levels.get(size)
+        if level is None or (champion_name, role) not in self._rows:
+            return []
+
+        # A key only seen in old patches can have its weighted games rounded down to none (see `scaled`)
+        row = self._rows[(champion_name, role)]
+        if not self.games[row]:
+            return []
+        start, end = np.searchsorted(level['code'], [row << (self.bits * size), (row + 1) << (self.bits * size)])
+        counts = np.asarray(level['count'][start:end])
+        order = np.argsort(-counts, kind='stable')[:top]
+        items, _ = self._decode(np.asarray(level['code'][start:end])[order], size)
+        return [([self.vocab[code] for code in codes], count, count / int(self.games[row]))
+                for codes, count in zip(items.tolist(), counts[order].tolist())]
+
+    def save(self, path):
+        """
+        Saves the index as a directory of `.npy` arrays that `load` can memory-map, plus `builds.json`.
+
+        Args:
+            path (str): Directory to write.
+        """
+
+        def replace(name, array):
+            # A loaded index may be memory-mapping the old file, so it is replaced rather than overwritten
+            with open(os.path.join(path, f'{name}.tmp'), 'wb') as file:
+                np.save(file, array)
+            os.replace(os.path.join(path, f'{name}.tmp'), os.path.join(path, name))
+
+        os.makedirs(path, exist_ok=True)
+        replace('games.npy', np.asarray(self.games))
+        for size, level in self.levels.items():
+            for name in self.names:
+                replace(f'{size}-{name}.npy', np.ascontiguousarray(level[name]))
+
+        meta = {'keys': [list(key) for key in self.keys], 'vocab': self.vocab, 'sizes': sorted(self.levels), 'min_support': self.min_support}
+        with open(os.path.join(path, 'builds.json.tmp'), 'w') as file:
+            json.dump(meta, file)
+        os.replace(os.path.join(path, 'builds.json.tmp'), os.path.join(path, 'builds.json'))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads an index saved with `save`.
+
+        Args:
+            path (str): Directory to read.
+            mmap (bool, optional): Memory-map the arrays instead of reading them. Defaults to True.
+
+        Returns:
+            BuildIndex: The index.
+        """
+
+        with open(os.path.join(path, 'builds.json'), 'r') as file:
+            meta = json.load(file)
+
+        mmap_mode = 'r' if mmap else None
+        levels = {size: {name: np.load(os.path.join(path, f'{size}-{name}.npy'), mmap_mode=mmap_mode) for name in cls.names} for size in meta['sizes']}
+        games = np.load(os.path.join(path, 'games.npy'), mmap_mode=mmap_mode)
+        return cls([tuple(key) for key in meta['keys']], meta['vocab'], games, levels, meta['min_support'])
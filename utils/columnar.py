@@ -0,0 +1,219 @@
+# Necessary imports
+import json
+import os
+import shutil
+from utils.const import match_columns
+from utils.static import patch_key, patch_of
+
+
+
+# Repetitive string columns, stored once per distinct value and loaded as pandas categoricals
+dictionary_columns = ['Game Version', 'Summoner Tag', 'Champion Name', 'Role']
+
+
+
+def arrow_schema(columns=None):
+    """
+    Gets the Arrow schema of the match table (see `match_columns`), with repetitive strings dictionary-encoded.
+
+    Args:
+        columns (list, optional): Only these columns. Defaults to all of them.
+
+    Returns:
+        pyarrow.Schema: The schema.
+    """
+
+    import pyarrow as pa
+
+    fields = []
+    for name, dtype in match_columns.items():
+        if columns is not None and name not in columns:
+            continue
+        if name in dictionary_columns:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string() if dtype == 'str' else pa.from_numpy_dtype(dtype)))
+    return pa.schema(fields)
+
+
+
+class ColumnStore:
+    """
+    The match table as uncompressed Arrow IPC (Feather v2) files that are memory-mapped rather than read.
+
+    Every patch is one file, with its rows sorted by (champion, role), and `index.json` records the row range of
+    every (champion, role) in every file. A query only opens the files of the patches it asks for, only touches the
+    columns it selects, and only slices the row ranges of the champions and roles it asks for, so nothing else is
+    read from disk. Selecting a few columns for one champion out of millions of rows takes milliseconds, and the
+    memory used is the pages of those columns alone.
+
+    Example:
+        store = ColumnStore()
+        df = store.read(['Kills', 'Deaths', 'Win'], champion='Ahri', role='MIDDLE', last=2)
+    """
+
+    index_name = 'index.json'
+
+    def __init__(self, path=os.path.join('data', 'matches_arrow')):
+        self.path = path
+        with open(os.path.join(path, self.index_name), 'r') as file:
+            index = json.load(file)
+        self.columns = index['columns']
+        self.files = index['patches']           # Patch -> {'file', 'rows', 'ranges': [[champion, role, start, stop], ...]}
+        self._tables = {}
+
+    @staticmethod
+    def _write_patch(table, path, patch):
+        # Sorts one patch by (champion, role), writes it and returns its index entry
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        table = table.sort_by([('Champion Name', 'ascending'), ('Role', 'ascending')])
+        table = table.cast(arrow_schema(table.column_names)).combine_chunks().unify_dictionaries()
+
+        champions, roles = table['Champion Name'].chunk(0), table['Role'].chunk(0)
+        codes = champions.indices.to_numpy(zero_copy_only=False).astype(np.int64) * (len(roles.dictionary) + 1) + roles.indices.to_numpy(zero_copy_only=False)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, dtype=np.intp)
+        stops = np.r_[starts[1:], len(codes)]
+        champion_names = pc.take(champions.dictionary, champions.indices.take(pa.array(starts))).to_pylist()
+        role_names = pc.take(roles.dictionary, roles.indices.take(pa.array(starts))).to_pylist()
+
+        name = f'{patch}.arrow'
+        with pa.OSFile(os.path.join(path, name), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return {'file': name, 'rows': table.num_rows,
+                'ranges': [[champion, role, int(start), int(stop)] for champion, role, start, stop in zip(champion_names, role_names, starts, stops)]}
+
+    @classmethod
+    def write(cls, tables, path=os.path.join('data', 'matches_arrow')):
+        """
+        Writes a store, replacing any store already at `path` once the new one is complete.
+
+        Args:
+            tables (iterable): `pyarrow.Table`s or DataFrames with the `match_columns`. All rows of a patch must be in the same table,
+                e.g. one table per patch, or a single table of everything.
+            path (str, optional): Directory to write. Defaults to 'data/matches_arrow'.
+
+        Returns:
+            ColumnStore: The new store.
+        """
+
+        import numpy as np
+        import pyarrow as pa
+
+        tmp_path = f'{path}.tmp'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+
+        files = {}
+        for table in tables:
+            if not isinstance(table, pa.Table):
+                table = pa.Table.from_pandas(table, preserve_index=False)
+            table = table.select([name for name in match_columns if name in table.column_names])
+
+            # Game versions repeat, so the patch is worked out once per distinct version
+            versions = table['Game Version'].combine_chunks().dictionary_encode()
+            version_patches = np.array([patch_of(version) for version in versions.dictionary.to_pylist()] + [None], dtype=object)
+            row_patches = version_patches[versions.indices.fill_null(len(version_patches) - 1).to_numpy()]
+            for patch in sorted(set(row_patches) - {None}, key=patch_key):
+                if patch in files:
+                    raise ValueError(f'Rows of patch {patch} are split across tables.')
+                files[patch] = cls._write_patch(table.filter(pa.array(row_patches == patch)), tmp_path, patch)
+
+        with open(os.path.join(tmp_path, cls.index_name), 'w') as file:
+            json.dump({'columns': [name for name in match_columns], 'patches': files}, file)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def patches(self):
+        """
+        Gets the patches in the store.
+
+        Returns:
+            list: Patches, oldest first.
+        """
+
+        return sorted(self.files, key=patch_key)
+
+    def _table(self, patch):
+        # The whole file of a patch, memory-mapped: no data is read until a column is used
+        import pyarrow as pa
+
+        if patch not in self._tables:
+            source = pa.memory_map(os.path.join(self.path, self.files[patch]['file']), 'r')
+            self._tables[patch] = pa.ipc.open_file(source).read_all()
+        return self._tables[patch]
+
+    def read(self, columns=None, champion=None, role=None, patches=None, last=None, as_arrow=False):
+        """
+        Reads some columns of the rows matching a champion, role and patch filter.
+
+        Args:
+            columns (list, optional): Columns to read, see `match_columns`. Defaults to all of them.
+            champion (str or list, optional): Champion name(s), any case. Defaults to every champion.
+            role (str or list, optional): Role(s), any case. Defaults to every role.
+            patches (list, optional): Only these patches. Defaults to every patch.
+            last (int, optional): Only the newest `last` patches. Ignored if `patches` is given. Defaults to every patch.
+            as_arrow (bool, optional): Return a `pyarrow.Table`, which shares memory with the files, instead of a DataFrame. Defaults to False.
+
+        Returns:
+            pd.DataFrame or pyarrow.Table: The rows, grouped by patch and then by (champion, role). Dictionary-encoded
+                columns are categoricals in the DataFrame.
+        """
+
+        import pyarrow as pa
+
+        if patches is None:
+            patches = self.patches()[-last:] if last else self.patches()
+        patches = [patch for patch in patches if patch in self.files]
+        champions = None if champion is None else {name.upper() for name in ([champion] if isinstance(champion, str) else champion)}
+        roles = None if role is None else {name.upper() for name in ([role] if isinstance(role, str) else role)}
+
+        pieces = []
+        for patch in patches:
+            table = self._table(patch)
+            table = table.select(columns) if columns is not None else table
+            if champions is None and roles is None:
+                pieces.append(table)
+                continue
+            for range_champion, range_role, start, stop in self.files[patch]['ranges']:
+                if (champions is None or range_champion.upper() in champions) and (roles is None or range_role.upper() in roles):
+                    pieces.append(table.slice(start, stop - start))
+
+        if pieces:
+            result = pa.concat_tables(pieces)
+        else:
+            result = arrow_schema(columns).empty_table()
+        return result if as_arrow else result.to_pandas()
+
+
+
+def build_column_store(source=os.path.join('data', 'matches_parquet'), path=os.path.join('data', 'matches_arrow')):
+    """
+    Builds a `ColumnStore` from the Parquet dataset written by `ingest_store`, one patch at a time, or from a CSV
+    written by `save_matches_data`.
+
+    Args:
+        source (str, optional): Parquet dataset directory or CSV file. Defaults to 'data/matches_parquet'.
+        path (str, optional): Directory of the store. Defaults to 'data/matches_arrow'.
+
+    Returns:
+        ColumnStore: The new store.
+    """
+
+    import pyarrow as pa
+
+    if os.path.isdir(source):
+        import pyarrow.parquet as pq
+        patch_dirs = sorted((name for name in os.listdir(source) if name.startswith('Patch=')), key=lambda name: patch_key(name[len('Patch='):]))
+        tables = (pq.read_table(os.path.join(source, name), columns=list(match_columns)) for name in patch_dirs)
+    else:
+        import pyarrow.csv as csv
+        types = {name: pa.string() if dtype == 'str' else pa.from_numpy_dtype(dtype) for name, dtype in match_columns.items()}
+        tables = [csv.read_csv(source, convert_options=csv.ConvertOptions(column_types=types, include_columns=list(match_columns)))]
+    return ColumnStore.write(tables, path)
@@ -67,4 +67,59 @@ stat_section_map = {
     'Offense': ['Adaptive Force', 'Attack Speed', 'Ability Haste'],
     'Flex': ['Adaptive Force', 'Move Speed', 'Health Scaling'],
     'Defense': ['Health', 'Tenacity and Slow Resist', 'Health Scaling']
-}
\ No newline at end of file
+}
+
+# Riot API rate limits of a personal/development key, as `count:seconds` pairs. Corrected from response headers at runtime
+app_rate_limits = '20:1,100:120'
+
+# Method rate limits of a development key, as sent in `X-Method-Rate-Limit`. Served by `utils.mock_api`
+method_rate_limits = {
+    'league-v4.getChallengerLeague': '30:10,500:600', 'league-v4.getGrandmasterLeague': '30:10,500:600',
+    'league-v4.getMasterLeague': '30:10,500:600', 'league-v4.getLeagueEntries': '50:10',
+    'summoner-v4.getBySummonerId': '1600:60', 'summoner-v4.getByPUUID': '1600:60',
+    'match-v5.getMatchIdsByPUUID': '2000:10', 'match-v5.getMatch': '2000:10'
+}
+
+# Base URL of the Riot API, {host} being a platform or routing host ('na1', 'americas', ...). The `api_base_url` environment
+# variable (or `.env`) overrides it, e.g. with 'http://127.0.0.1:8080/{host}' to crawl a local `utils.mock_api` server
+riot_api_url = 'https://{host}.api.riotgames.com'
+
+# Routing cluster of each platform region, used for the match-v5 endpoints
+region_routing = {
+    'NA1': 'americas', 'BR1': 'americas', 'LA1': 'americas', 'LA2': 'americas',
+    'EUW1': 'europe', 'EUN1': 'europe', 'TR1': 'europe', 'RU': 'europe', 'ME1': 'europe',
+    'KR': 'asia', 'JP1': 'asia',
+    'OC1': 'sea', 'PH2': 'sea', 'SG2': 'sea', 'TH2': 'sea', 'TW2': 'sea', 'VN2': 'sea'
+}
+
+# Typical number of players on each ranked ladder of a region, used to plan a crawl before the ladders are read
+ladder_sizes = {'CHALLENGER': 300, 'GRANDMASTER': 700, 'MASTER': 4000, 'DIAMOND': 20000, 'EMERALD': 60000, 'PLATINUM': 100000}
+
+# Share of the match IDs in a history that no other history returned, assumed for a tier until a crawl has measured it.
+# Top players queue into each other, so the higher the tier the more of their games are duplicates
+unique_match_priors = {'CHALLENGER': 0.4, 'GRANDMASTER': 0.5, 'MASTER': 0.65, 'DIAMOND': 0.85, 'EMERALD': 0.9, 'PLATINUM': 0.95}
+
+# Hosts given their own keep-alive connection pool
+pooled_hosts = ['na1.api.riotgames.com', 'euw1.api.riotgames.com', 'kr.api.riotgames.com',
+                'americas.api.riotgames.com', 'europe.api.riotgames.com', 'asia.api.riotgames.com',
+                'raw.communitydragon.org', 'ddragon.leagueoflegends.com']
+
+# Columns produced by `process_match`/`process_matches` and the type each is stored as
+match_columns = {
+    'Match ID': 'str', 'Game Duration': 'int32', 'Game Version': 'str',
+    'Summoner Name': 'str', 'Summoner Tag': 'str',
+    'Champion ID': 'int16', 'Champion Name': 'str', 'Champion Level': 'int8', 'Team': 'int16', 'Role': 'str',
+    'Kills': 'int16', 'Deaths': 'int16', 'Assists': 'int16', 'CS': 'int16', 'CS (Jungle)': 'int16',
+    'First Blood': 'bool', 'First Tower': 'bool', 'Objective Stolen': 'int8',
+    'Total Gold Earned': 'int32', 'Gold Spent': 'int32', 'Gold/Minute': 'float32',
+    'Damage Dealt': 'int32', '% of Team\'s Damage': 'float32', 'Damage Taken': 'int32', 'Damage Mitigated': 'int32',
+    'Heal and Shielding': 'float32', 'CC Time Dealt': 'int32', 'Turret Plates Taken': 'int8', 'Turret Takedowns': 'int8',
+    'Vision Score': 'int16',
+    'Rune 1': 'int16', 'Rune 2': 'int16', 'Rune 3': 'int16', 'Rune 4': 'int16', 'Sec Rune 1': 'int16', 'Sec Rune 2': 'int16',
+    'Stat 1': 'int16', 'Stat 2': 'int16', 'Stat 3': 'int16',
+    'Summ 1': 'int16', 'Summ 2': 'int16',
+    'Item 1': 'int32', 'Item 2': 'int32', 'Item 3': 'int32', 'Item 4': 'int32', 'Item 5': 'int32', 'Item 6': 'int32',
+    'Triplekills': 'int8', 'Quadrakills': 'int8', 'Pentakills': 'int8',
+    'Grubs Taken (Team)': 'int8', 'Heralds Taken (Team)': 'int8', 'Barons Taken (Team)': 'int8', 'Dragons Taken (Team)': 'int8',
+    'Game Ended in Surrender': 'bool', 'Win': 'bool'
+}
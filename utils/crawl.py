@@ -0,0 +1,898 @@
+# Necessary imports
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import metrics
+from utils.const import ladder_sizes, region_routing, unique_match_priors
+from utils.fetch import PriorityBudget, engine, riot_host, riot_url, run
+from utils.frontier import Frontier
+from utils.store import MatchStore
+
+
+
+# Seconds a player's watermark is kept behind the time their history was read, so games still in progress
+# during one crawl (match-v5 filters `startTime` by game start) are picked up by the next
+history_overlap = 3600
+
+# Match IDs per page when re-reading a history from its watermark. Max 100
+history_page_size = 100
+
+
+
+def history_path(puuid, queue=420, start=0, count=20, since=None):
+    """
+    Gets the match-v5 path listing a player's ranked match IDs.
+
+    Args:
+        puuid (str): PUUID of the player.
+        queue (int, optional): Queue ID. Defaults to 420 (ranked solo/duo).
+        start (int, optional): Start index of matches. Defaults to 0.
+        count (int, optional): Number of match IDs to return. Max 100. Defaults to 20.
+        since (float, optional): Only matches started after this Unix time. Defaults to any.
+
+    Returns:
+        str: Path, without the host or API key.
+    """
+
+    path = f'/lol/match/v5/matches/by-puuid/{puuid}/ids?queue={queue}&start={start}&count={count}'
+    return path if since is None else f'{path}&startTime={int(since)}'
+
+
+
+def _saturation(observed, drawn):
+    # Size of the pool that `drawn` random draws would have to come from to turn up `observed` distinct items,
+    # i.e. the s solving observed = s * (1 - exp(-drawn / s)). Infinite if nothing was drawn twice
+    if drawn <= 0 or observed >= drawn:
+        return math.inf
+    if observed <= 0:
+        return 0.0
+    low, high = observed, 2.0 * observed
+    while high * -math.expm1(-drawn / high) < observed:
+        low, high = high, 2.0 * high
+    for _ in range(100):
+        middle = (low + high) / 2
+        low, high = (middle, high) if middle * -math.expm1(-drawn / middle) < observed else (low, middle)
+    return high
+
+
+
+class CrawlScheduler:
+    """
+    Crawls ranked matches in several regions at once, each region on its own routing hosts and rate limits.
+
+    Each region is seeded from its top ladders, then alternates between reading the match histories of the
+    players crawled longest ago and downloading the matches it found. The players in every downloaded match
+    are added back to the frontier, so the crawl keeps finding new players. Since `FetchEngine` keeps separate
+    limiters for every host (`na1`, `euw1`, `americas`, `europe`, ...), the regions do not slow each other down
+    and total throughput grows with the number of regions.
+
+    Every player and match goes through the persistent `Frontier`, so no match is downloaded twice, whether it
+    is seen from another of its players or in a later run. Players read before are only asked for games newer
+    than their watermark, a page of `history_page_size` at a time, so a re-crawl costs one request per player
+    plus one per page of new games, and summoner IDs are only resolved to PUUIDs once.
+
+    Example:
+        with Frontier() as frontier, MatchStore() as store:
+            CrawlScheduler(['NA1', 'EUW1', 'KR'], frontier, store).crawl(max_matches=1000)
+    """
+
+    def __init__(self, regions, frontier, store, tiers=('CHALLENGER',), players_per_round=20, matches_per_player=20,
+                 matches_per_round=100, queue=420, fetch_engine=None):
+        unknown = [region for region in regions if region not in region_routing]
+        if unknown:
+            raise ValueError(f'Unknown regions: {unknown}. Valid options are {list(region_routing)}.')
+
+        self.regions = list(regions)
+        self.frontier = frontier
+        self.store = store
+        self.tiers = tiers
+        self.players_per_round = players_per_round
+        self.matches_per_player = matches_per_player
+        self.matches_per_round = matches_per_round
+        self.queue = queue
+        self.engine = fetch_engine or engine
+        self.saved = {region: 0 for region in self.regions}
+
+    def _url(self, host, path):
+        from utils.func import api_key
+        return riot_url(host, path, api_key)
+
+    async def seed(self, region):
+        """
+        Adds the players of the region's top ladders (see `tiers`) to the frontier.
+
+        Args:
+            region (str): Platform region, e.g. 'NA1'.
+
+        Returns:
+            int: Number of new players.
+        """
+
+        host = region.lower()
+        urls = [self._url(host, f'/lol/league/v4/{tier.lower()}leagues/by-queue/RANKED_SOLO_5x5') for tier in self.tiers]
+        leagues = await self.engine.fetch_all(urls, 'league-v4.getLeague')
+        entries = [entry for league in leagues if not isinstance(league, Exception) for entry in league.get('entries', [])]
+
+        # Ladder entries carry the PUUID, older responses only the summoner ID
+        puuids = [entry['puuid'] for entry in entries if 'puuid' in entry]
+        summoner_ids = [entry['summonerId'] for entry in entries if 'puuid' not in entry and 'summonerId' in entry]
+        cached = self.frontier.summoner_puuids(summoner_ids)
+        puuids += cached.values()
+        summoner_ids = [summoner_id for summoner_id in summoner_ids if summoner_id not in cached]
+        if summoner_ids:
+            urls = [self._url(host, f'/lol/summoner/v4/summoners/{summoner_id}') for summoner_id in summoner_ids]
+            summoners = await self.engine.fetch_all(urls, 'summoner-v4.getBySummonerId')
+            resolved = {summoner_id: summoner['puuid'] for summoner_id, summoner in zip(summoner_ids, summoners) if not isinstance(summoner, Exception)}
+            self.frontier.add_summoners(resolved)
+            puuids += resolved.values()
+
+        new = self.frontier.add_players(puuids, region)
+        print(f'{region}: seeded {len(new)} new players from {", ".join(tier.capitalize() for tier in self.tiers)}.')
+        return len(new)
+
+    async def crawl_histories(self, region, puuids):
+        """
+        Reads the ranked match IDs of some players into the frontier: the last `matches_per_player` for new players,
+        every game since the watermark for players read before.
+
+        Args:
+            region (str): Platform region of the players, e.g. 'NA1'.
+            puuids (list): PUUIDs of the players.
+
+        Returns:
+            int: Number of new matches found.
+        """
+
+        routing = region_routing[region]
+        watermarks = self.frontier.watermarks(puuids)
+        read_at = time.time()
+
+        # One round of requests per page, until every player's history is read back to their watermark
+        match_ids, crawled, failed = [], [], []
+        starts = dict.fromkeys(puuids, 0)
+        while starts:
+            pages = [(puuid, start, history_page_size if puuid in watermarks else self.matches_per_player) for puuid, start in starts.items()]
+            urls = [self._url(routing, history_path(puuid, self.queue, start, count, watermarks.get(puuid))) for puuid, start, count in pages]
+            histories = await self.engine.fetch_all(urls, 'match-v5.getMatchIdsByPUUID')
+
+            starts = {}
+            for (puuid, start, count), history in zip(pages, histories):
+                if isinstance(history, Exception):
+                    failed.append(puuid)
+                    continue
+                match_ids.extend(history)
+                if puuid in watermarks and len(history) == count:
+                    starts[puuid] = start + count
+                else:
+                    crawled.append(puuid)
+
+        new = self.frontier.add_matches(match_ids, region)
+        self.frontier.mark_crawled(crawled, read_at, read_at - history_overlap)
+        # Players whose history could not be read (e.g. a 4xx for a bad PUUID) go to the back of the queue with their
+        # watermark unchanged, so the next round moves on to other players and a later run reads them again
+        self.frontier.mark_crawled(failed, read_at, 0)
+        metrics.count('crawl_matches_found_total', len(new), region=region)
+        return len(new)
+
+    async def download(self, region, match_ids):
+        """
+        Downloads matches into the store, adding their players to the frontier.
+
+        Args:
+            region (str): Platform region the matches were found in, e.g. 'NA1'.
+            match_ids (list): IDs of pending matches.
+
+        Returns:
+            int: Number of matches saved.
+        """
+
+        # Matches saved by an earlier crawl that did not use the frontier are not requested again
+        missing = self.store.missing(match_ids)
+        self.frontier.mark_matches(set(match_ids) - set(missing), Frontier.done)
+        match_ids = missing
+
+        routing = region_routing[region]
+        urls = [self._url(routing, f'/lol/match/v5/matches/{match_id}') for match_id in match_ids]
+
+        def save(i, result):
+            if isinstance(result, Exception):
+                return
+            self.store.put(result)
+            platform = result['metadata']['matchId'].split('_')[0]
+            self.frontier.add_players(result['metadata'].get('participants', []), platform if platform in region_routing else region)
+
+        results = await self.engine.fetch_all(urls, 'match-v5.getMatch', on_result=save, keep=False)
+        failed = [match_id for match_id, result in zip(match_ids, results) if isinstance(result, Exception)]
+        saved = len(match_ids) - len(failed)
+        self.frontier.mark_matches((match_id for match_id, result in zip(match_ids, results) if not isinstance(result, Exception)), Frontier.done)
+        self.frontier.mark_matches(failed, Frontier.failed)
+
+        self.saved[region] += saved
+        metrics.count('crawl_matches_saved_total', saved, region=region)
+        metrics.count('crawl_matches_failed_total', len(failed), region=region)
+        return saved
+
+    async def crawl_region(self, region, max_matches=None, started=None):
+        """
+        Crawls one region until it has saved `max_matches` matches or runs out of players.
+
+        Args:
+            region (str): Platform region, e.g. 'NA1'.
+            max_matches (int, optional): Number of matches to save. Defaults to no limit.
+            started (float, optional): Unix time the run started. Players crawled since then are not read again. Defaults to now.
+
+        Returns:
+            int: Number of matches saved.
+        """
+
+        started = time.time() if started is None else started
+        if not self.frontier.next_players(region, 1):
+            await self.seed(region)
+
+        while max_matches is None or self.saved[region] < max_matches:
+            limit = self.matches_per_round if max_matches is None else min(self.matches_per_round, max_matches - self.saved[region])
+            pending = self.frontier.pending_matches(region, limit)
+            if pending:
+                await self.download(region, pending)
+                print(f'{region}: saved {self.saved[region]} matches.')
+                continue
+
+            players = self.frontier.next_players(region, self.players_per_round, before=started)
+            if not players:
+                print(f'{region}: no players left to crawl.')
+                break
+            await self.crawl_histories(region, players)
+
+        return self.saved[region]
+
+    async def crawl_async(self, max_matches=None):
+        """
+        Crawls every region concurrently (see `crawl_region`).
+
+        Args:
+            max_matches (int, optional): Number of matches to save per region. Defaults to no limit.
+
+        Returns:
+            dict: region -> number of matches saved.
+        """
+
+        started = time.time()
+        await asyncio.gather(*(self.crawl_region(region, max_matches, started) for region in self.regions))
+        return dict(self.saved)
+
+    def crawl(self, max_matches=None):
+        """
+        Blocking version of `crawl_async`, usable from scripts and notebooks.
+
+        Args:
+            max_matches (int, optional): Number of matches to save per region. Defaults to no limit.
+
+        Returns:
+            dict: region -> number of matches saved.
+        """
+
+        return run(self.crawl_async(max_matches))
+
+
+
+class CrawlPipeline:
+    """
+    Crawls one region as a streaming pipeline instead of one phase after another.
+
+    The four stages (ladder pages -> summoner IDs -> match histories -> match details) run at the same time,
+    connected by bounded queues, so match details start downloading as soon as the first history comes back
+    and a full queue pauses the stage feeding it. Every request goes through one `PriorityBudget`, which
+    serves the details stage first, then histories, then summoners, then the ladder, so the stage that
+    produces matches is never starved by the stages that only find more work. The crawl then takes about
+    as long as its slowest stage rather than the sum of all of them.
+
+    Example:
+        with MatchStore() as store:
+            CrawlPipeline('NA1', store, tiers=['CHALLENGER', 'GRANDMASTER']).crawl(max_matches=5000)
+    """
+
+    stages = ('ladder', 'summoners', 'histories', 'details')
+    _done = object()
+
+    def __init__(self, region, store, frontier=None, tiers=('CHALLENGER',), divisions=('I', 'II', 'III', 'IV'), pages=1,
+                 matches_per_player=20, queue=420, slots=20, queue_size=200, fetch_engine=None, budget=None):
+        if region not in region_routing:
+            raise ValueError(f'Unknown region: {region}. Valid options are {list(region_routing)}.')
+
+        self.region = region
+        self.store = store
+        self.frontier = frontier
+        self.tiers = tiers
+        self.divisions = divisions
+        self.pages = pages
+        self.matches_per_player = matches_per_player
+        self.queue = queue
+        self.slots = slots
+        self.queue_size = queue_size
+        self.engine = fetch_engine or engine
+        self.budget = budget or PriorityBudget(slots)
+        self.processed = dict.fromkeys(self.stages, 0)
+        self.failed = dict.fromkeys(self.stages, 0)
+        self.busy = {}                          # stage -> [first start, last finish] as perf_counter times
+        self.saved = 0
+        self._players = set()
+        self._matches = set()
+        self._executor = None
+
+    def _url(self, host, path):
+        from utils.func import api_key
+        return riot_url(host, path, api_key)
+
+    def ladder_urls(self):
+        """
+        Gets the league-v4 URLs listing the players of every tier, division and page to crawl.
+
+        Returns:
+            list: URLs.
+        """
+
+        host = self.region.lower()
+        urls = []
+        for tier in self.tiers:
+            if tier.lower() in ('challenger', 'grandmaster', 'master'):
+                urls.append(self._url(host, f'/lol/league/v4/{tier.lower()}leagues/by-queue/RANKED_SOLO_5x5'))
+            else:
+                urls.extend(self._url(host, f'/lol/league/v4/entries/RANKED_SOLO_5x5/{tier.upper()}/{division}?page={page}')
+                            for division in self.divisions for page in range(1, self.pages + 1))
+        return urls
+
+    async def _get(self, url, method, stage):
+        host = riot_host(url)
+        async with self.budget.slot(host, self.stages[::-1].index(stage)):
+            return await self.engine.get_json_async(url, method, self._executor)
+
+    async def _ladder(self, url):
+        league = await self._get(url, 'league-v4.getLeague' if 'leagues/by-queue' in url else 'league-v4.getLeagueEntries', 'ladder')
+        return league['entries'] if isinstance(league, dict) else league
+
+    async def _summoner(self, entry):
+        # Ladder entries carry the PUUID, older responses only the summoner ID
+        puuid = entry.get('puuid')
+        if puuid is None and self.frontier is not None:
+            puuid = self.frontier.summoner_puuids([entry['summonerId']]).get(entry['summonerId'])
+        if puuid is None:
+            summoner = await self._get(self._url(self.region.lower(), f'/lol/summoner/v4/summoners/{entry["summonerId"]}'),
+                                       'summoner-v4.getBySummonerId', 'summoners')
+            puuid = summoner['puuid']
+            if self.frontier is not None:
+                self.frontier.add_summoners({entry['summonerId']: puuid})
+        if puuid in self._players:
+            return []
+        self._players.add(puuid)
+        if self.frontier is not None:
+            self.frontier.add_players([puuid], self.region)
+        return [puuid]
+
+    async def _history(self, puuid):
+        # New players get their last `matches_per_player` games, players read before every game since their watermark
+        since = self.frontier.watermarks([puuid]).get(puuid) if self.frontier is not None else None
+        count = self.matches_per_player if since is None else history_page_size
+        read_at = time.time()
+        history, start = [], 0
+        while True:
+            url = self._url(region_routing[self.region], history_path(puuid, self.queue, start, count, since))
+            page = await self._get(url, 'match-v5.getMatchIdsByPUUID', 'histories')
+            history.extend(page)
+            if since is None or len(page) < count:
+                break
+            start += count
+
+        match_ids = [match_id for match_id in history if match_id not in self._matches]
+        self._matches.update(match_ids)
+        if self.frontier is not None:
+            match_ids = self.frontier.add_matches(match_ids, self.region)
+            self.frontier.mark_crawled([puuid], read_at, read_at - history_overlap)
+        return self.store.missing(match_ids)
+
+    async def _details(self, match_id):
+        url = self._url(region_routing[self.region], f'/lol/match/v5/matches/{match_id}')
+        try:
+            match_json = await self._get(url, 'match-v5.getMatch', 'details')
+        except Exception:
+            if self.frontier is not None:
+                self.frontier.mark_matches([match_id], self.frontier.failed)
+            raise
+        self.saved += self.store.put(match_json)
+        if self.frontier is not None:
+            self.frontier.mark_matches([match_id], self.frontier.done)
+        return []
+
+    async def _stage(self, stage, handle, inbox, outbox):
+        # Runs `slots` workers until the upstream stage is finished, then tells the downstream workers
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is self._done:
+                    return
+                start = time.perf_counter()
+                self.busy.setdefault(stage, [start, start])
+                try:
+                    results = await handle(item)
+                except Exception:
+                    results = ()
+                    self.failed[stage] += 1
+                    metrics.count('crawl_stage_failed_total', stage=stage, region=self.region)
+                self.processed[stage] += 1
+                self.busy[stage][1] = time.perf_counter()
+                metrics.count('crawl_stage_items_total', stage=stage, region=self.region)
+                for result in results if outbox is not None else ():
+                    await outbox.put(result)
+
+        await asyncio.gather(*(worker() for _ in range(self.slots)))
+        for _ in range(self.slots if outbox is not None else 0):
+            await outbox.put(self._done)
+
+    async def crawl_async(self, max_matches=None):
+        """
+        Runs the pipeline until the ladder is exhausted or `max_matches` matches are saved.
+
+        Args:
+            max_matches (int, optional): Number of matches to save. Defaults to no limit.
+
+        Returns:
+            dict: Items handled per stage ('ladder', 'summoners', 'histories', 'details') and 'saved'.
+        """
+
+        urls = asyncio.Queue()
+        for url in self.ladder_urls():
+            urls.put_nowait(url)
+        for _ in range(self.slots):
+            urls.put_nowait(self._done)
+        queues = [urls] + [asyncio.Queue(self.queue_size) for _ in self.stages[1:]] + [None]
+        handlers = [self._ladder, self._summoner, self._history, self._details]
+
+        self._executor = ThreadPoolExecutor(max_workers=self.slots * 2)
+        tasks = [asyncio.ensure_future(self._stage(stage, handle, queues[i], queues[i + 1]))
+                 for i, (stage, handle) in enumerate(zip(self.stages, handlers))]
+
+        async def enough():
+            while self.saved < max_matches:
+                await asyncio.sleep(0.05)
+
+        try:
+            if max_matches is None:
+                await asyncio.gather(*tasks)
+            else:
+                # Stops every stage once enough matches are saved. Unfinished matches stay pending in the frontier
+                stop = asyncio.ensure_future(enough())
+                await asyncio.wait([tasks[-1], stop], return_when=asyncio.FIRST_COMPLETED)
+                stop.cancel()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._executor.shutdown(wait=False)
+
+        for stage in self.stages:
+            first, last = self.busy.get(stage, (0.0, 0.0))
+            print(f'{self.region} {stage:<10} {self.processed[stage]:>7} done {self.failed[stage]:>5} failed {last - first:>8.1f}s')
+        return {**self.processed, 'saved': self.saved}
+
+    def crawl(self, max_matches=None):
+        """
+        Blocking version of `crawl_async`, usable from scripts and notebooks.
+
+        Args:
+            max_matches (int, optional): Number of matches to save. Defaults to no limit.
+
+        Returns:
+            dict: Items handled per stage and 'saved'.
+        """
+
+        return run(self.crawl_async(max_matches))
+
+
+
+class CrawlPlanner:
+    """
+    Splits a budget of API requests between ladder tiers to get as many new valid ranked matches per request as possible.
+
+    A player costs one match-v5 request for up to 100 match IDs, and every ID that no earlier history returned costs
+    one more request to download. Top players keep meeting each other, so the more histories of a tier are read, the
+    more of each new one is games already found. Each tier is modelled as a pool of games, sized from the running totals
+    of earlier crawls in the frontier (see `Frontier.add_yields`), or from `unique_match_priors` before the first. Players
+    are then added a batch at a time to the tier whose next batch finds the most new valid matches (ranked, at least 15
+    minutes) per request, times the tier's weight, until the budget is spent. The history depth of a tier is the number
+    of games its players are measured to have in the queue, up to 100, since a shorter request costs the same.
+
+    `crawl` reads the ladders, plans again with the players actually on them and runs the plan, in rounds that are each
+    planned with what the earlier ones measured, until the budget is spent. It adds what every tier yielded to the
+    frontier and prints the expected yield next to the actual one.
+
+    Example:
+        with Frontier() as frontier, MatchStore() as store:
+            planner = CrawlPlanner('NA1', frontier, store, budget=5000, weights={'CHALLENGER': 2, 'GRANDMASTER': 1.5, 'MASTER': 1})
+            print(planner.plan())
+            planner.crawl()
+    """
+
+    apex_tiers = ('CHALLENGER', 'GRANDMASTER', 'MASTER')
+    divisions = ('I', 'II', 'III', 'IV')
+    page_size = 205                             # Players per league-v4 page of the tiers below Master
+    max_depth = 100                             # Match IDs per match-v5 history request
+    valid_prior = 0.95                          # Share of ranked matches lasting 15 minutes, until measured
+
+    def __init__(self, region, frontier, store, budget, weights=None, queue=420, batch=5, fetch_engine=None):
+        if region not in region_routing:
+            raise ValueError(f'Unknown region: {region}. Valid options are {list(region_routing)}.')
+        weights = {tier.upper(): weight for tier, weight in (weights or {'CHALLENGER': 1.0}).items()}
+        unknown = [tier for tier in weights if tier not in ladder_sizes]
+        if unknown:
+            raise ValueError(f'Unknown tiers: {unknown}. Valid options are {list(ladder_sizes)}.')
+
+        self.region = region
+        self.frontier = frontier
+        self.store = store
+        self.budget = budget
+        self.weights = weights
+        self.queue = queue
+        self.batch = batch
+        self.engine = fetch_engine or engine
+        self.calls = 0
+
+    def _url(self, host, path):
+        from utils.func import api_key
+        return riot_url(host, path, api_key)
+
+    def estimates(self):
+        """
+        Gets the model of every tier the plan is based on, from the running totals in the frontier.
+
+        Returns:
+            dict: tier -> 'pool' (distinct games its histories are estimated to hold, inf until a duplicate is seen),
+                'drawn' (match IDs read from its histories so far), 'unique' (share of IDs assumed new while the pool is inf),
+                'games' (estimated games per player in the queue, inf until a history comes back short)
+                and 'valid' (share of downloaded matches that are valid).
+        """
+
+        totals = self.frontier.yields(self.region)
+        estimates = {}
+        for tier in self.weights:
+            total = totals.get(tier, dict.fromkeys(Frontier.yield_columns, 0))
+            players = total['players']
+            estimates[tier] = {
+                'pool': _saturation(total['new'], total['returned']),
+                'drawn': total['returned'],
+                'unique': unique_match_priors.get(tier, 1.0) if total['returned'] == 0 else 1.0,
+                'games': _saturation(total['returned'] / players, total['requested'] / players) if players else math.inf,
+                'valid': (total['valid'] + 20 * self.valid_prior) / (total['downloaded'] + 20)
+            }
+        return estimates
+
+    def _ids(self, estimate, players, depth):
+        # Expected match IDs returned by the histories of `players` players asked for `depth` games each
+        games = estimate['games']
+        return players * (depth if math.isinf(games) else -games * math.expm1(-depth / games))
+
+    def _new(self, estimate, ids):
+        # Expected new match IDs among `ids` more IDs read from a tier's histories
+        pool, drawn = estimate['pool'], estimate['drawn']
+        if math.isinf(pool):
+            return ids * estimate['unique']
+        if pool == 0:
+            return 0.0
+        return pool * (math.exp(-drawn / pool) - math.exp(-(drawn + ids) / pool))
+
+    def _depth(self, estimate):
+        # Shortest depth, in steps of 5, getting 95% of the games a full-size request would
+        full = self._ids(estimate, 1, self.max_depth)
+        return next(depth for depth in range(5, self.max_depth + 1, 5) if self._ids(estimate, 1, depth) >= 0.95 * full)
+
+    def _ladder_calls(self, tier, players):
+        if players == 0:
+            return 0
+        return 1 if tier in self.apex_tiers else math.ceil(players / self.page_size)
+
+    def plan(self, budget=None, available=None):
+        """
+        Plans how many players of each tier to crawl and how deep.
+
+        Args:
+            budget (int, optional): Requests to spend. Defaults to `budget`.
+            available (dict, optional): tier -> players left to crawl, for tiers whose ladder has been read. Other tiers
+                are assumed to have `ladder_sizes` players, and reading their ladder is counted. Defaults to none read.
+
+        Returns:
+            dict: tier -> 'players', 'depth', expected 'calls', expected new valid 'matches' and their 'yield' per request,
+                for the tiers that get players, best yield first.
+        """
+
+        budget = self.budget if budget is None else budget
+        estimates = self.estimates()
+        depths = {tier: self._depth(estimate) for tier, estimate in estimates.items()}
+        available = available or {}
+        limits = {tier: available.get(tier, ladder_sizes[tier]) for tier in self.weights}
+
+        def cost(tier, players):
+            # Expected requests and new match IDs of crawling `players` players of a tier
+            new = self._new(estimates[tier], self._ids(estimates[tier], players, depths[tier]))
+            return (0 if tier in available else self._ladder_calls(tier, players)) + players + new, new
+
+        players = dict.fromkeys(self.weights, 0)
+        open_tiers = [tier for tier, weight in self.weights.items() if weight > 0 and limits.get(tier, 0) > 0]
+        spent = 0.0
+        while open_tiers:
+            best = None
+            for tier in list(open_tiers):
+                calls, new = cost(tier, players[tier])
+                # A whole batch, or a single player to spend the end of the budget
+                for size in dict.fromkeys((min(self.batch, limits[tier] - players[tier]), 1)):
+                    next_calls, next_new = cost(tier, players[tier] + size)
+                    if spent + next_calls - calls <= budget:
+                        break
+                else:
+                    open_tiers.remove(tier)
+                    continue
+                if next_new <= new:
+                    open_tiers.remove(tier)
+                    continue
+                score = self.weights[tier] * estimates[tier]['valid'] * (next_new - new) / (next_calls - calls)
+                if best is None or score > best[0]:
+                    best = (score, tier, size, next_calls - calls)
+            if best is None:
+                break
+            _, tier, size, calls = best
+            players[tier] += size
+            spent += calls
+            if players[tier] >= limits[tier]:
+                open_tiers.remove(tier)
+
+        plan = {}
+        for tier in self.weights:
+            if players[tier]:
+                calls, new = cost(tier, players[tier])
+                matches = estimates[tier]['valid'] * new
+                plan[tier] = {'players': players[tier], 'depth': depths[tier], 'calls': round(calls), 'matches': round(matches, 1), 'yield': matches / calls}
+        return dict(sorted(plan.items(), key=lambda item: -item[1]['yield']))
+
+    async def _fetch(self, urls, method, **kwargs):
+        # Every request counts against the budget, whether it succeeds or not
+        self.calls += len(urls)
+        return await self.engine.fetch_all(urls, method, **kwargs)
+
+    async def read_ladder(self, tier, players):
+        """
+        Reads a tier's ladder until it has enough players whose history has never been read.
+
+        Args:
+            tier (str): Ladder tier, e.g. 'CHALLENGER'. Master and above are read whole, lower tiers a page per division at a time.
+            players (int): Players wanted.
+
+        Returns:
+            list: PUUIDs of new players, which are added to the frontier.
+        """
+
+        host = self.region.lower()
+        puuids, page = [], 1
+        while len(puuids) < players:
+            if tier in self.apex_tiers:
+                urls = [self._url(host, f'/lol/league/v4/{tier.lower()}leagues/by-queue/RANKED_SOLO_5x5')]
+            else:
+                urls = [self._url(host, f'/lol/league/v4/entries/RANKED_SOLO_5x5/{tier}/{division}?page={page}') for division in self.divisions]
+            leagues = await self._fetch(urls, 'league-v4.getLeague' if tier in self.apex_tiers else 'league-v4.getLeagueEntries')
+            entries = [entry for league in leagues if not isinstance(league, Exception)
+                       for entry in (league['entries'] if isinstance(league, dict) else league)]
+
+            # Ladder entries carry the PUUID, older responses only the summoner ID
+            found = [entry['puuid'] for entry in entries if 'puuid' in entry]
+            summoner_ids = [entry['summonerId'] for entry in entries if 'puuid' not in entry and 'summonerId' in entry]
+            cached = self.frontier.summoner_puuids(summoner_ids)
+            found += cached.values()
+            summoner_ids = [summoner_id for summoner_id in summoner_ids if summoner_id not in cached][:players - len(puuids) - len(found)]
+            if summoner_ids:
+                summoners = await self._fetch([self._url(host, f'/lol/summoner/v4/summoners/{summoner_id}') for summoner_id in summoner_ids],
+                                              'summoner-v4.getBySummonerId')
+                resolved = {summoner_id: summoner['puuid'] for summoner_id, summoner in zip(summoner_ids, summoners) if not isinstance(summoner, Exception)}
+                self.frontier.add_summoners(resolved)
+                found += resolved.values()
+
+            crawled = self.frontier.watermarks(found)
+            puuids += [puuid for puuid in dict.fromkeys(found) if puuid not in crawled and puuid not in puuids]
+            if tier in self.apex_tiers or len(entries) < self.page_size * len(self.divisions):
+                break
+            page += 1
+
+        self.frontier.add_players(puuids, self.region)
+        return puuids
+
+    async def crawl_tier(self, tier, puuids, depth):
+        """
+        Reads the histories of some players of a tier and downloads the new matches, as far as the budget goes.
+        Matches past the budget stay pending in the frontier. What the tier yielded is added to the frontier.
+
+        Args:
+            tier (str): Ladder tier of the players, e.g. 'CHALLENGER'.
+            puuids (list): PUUIDs of the players.
+            depth (int): Match IDs to ask for per player. Max 100.
+
+        Returns:
+            dict: 'players' read, 'calls' made, 'new' match IDs, matches 'downloaded' and the valid 'matches' among them.
+        """
+
+        calls = self.calls
+        routing = region_routing[self.region]
+        read_at = time.time()
+        histories = await self._fetch([self._url(routing, history_path(puuid, self.queue, 0, depth)) for puuid in puuids],
+                                      'match-v5.getMatchIdsByPUUID')
+        read = [puuid for puuid, history in zip(puuids, histories) if not isinstance(history, Exception)]
+        match_ids = [match_id for history in histories if not isinstance(history, Exception) for match_id in history]
+        returned = len(match_ids)
+        new = self.frontier.add_matches(match_ids, self.region)
+        self.frontier.mark_crawled(read, read_at, read_at - history_overlap)
+
+        # Matches saved by an earlier crawl that did not use the frontier are not requested again
+        missing = self.store.missing(new)
+        self.frontier.mark_matches(set(new) - set(missing), Frontier.done)
+        match_ids = missing[:max(0, self.budget - self.calls)]
+
+        valid = 0
+        def save(i, result):
+            nonlocal valid
+            if isinstance(result, Exception):
+                return
+            self.store.put(result)
+            info = result.get('info', {})
+            valid += info.get('queueId') == self.queue and info.get('gameDuration', 0) >= 900
+            platform = result['metadata']['matchId'].split('_')[0]
+            self.frontier.add_players(result['metadata'].get('participants', []), platform if platform in region_routing else self.region)
+
+        urls = [self._url(routing, f'/lol/match/v5/matches/{match_id}') for match_id in match_ids]
+        results = await self._fetch(urls, 'match-v5.getMatch', on_result=save, keep=False)
+        failed = [match_id for match_id, result in zip(match_ids, results) if isinstance(result, Exception)]
+        self.frontier.mark_matches(set(match_ids) - set(failed), Frontier.done)
+        self.frontier.mark_matches(failed, Frontier.failed)
+
+        downloaded = len(match_ids) - len(failed)
+        self.frontier.add_yields(self.region, tier, players=len(read), histories=len(puuids), requested=depth * len(read),
+                                 returned=returned, new=len(new), downloaded=downloaded, valid=valid)
+        metrics.count('crawl_matches_saved_total', downloaded, region=self.region)
+        return {'players': len(read), 'calls': self.calls - calls, 'new': len(new), 'downloaded': downloaded, 'matches': valid}
+
+    async def crawl_async(self):
+        """
+        Crawls in rounds until the budget is spent: plans, reads the ladders the plan needs, plans again with the
+        players found, and crawls every tier of the plan. Each round is planned with what the previous ones measured.
+
+        Returns:
+            dict: tier -> {'expected': the players, requests and valid matches the plans of every round expected, 'actual':
+                what the rounds yielded (see `crawl_tier`)}, and 'total' -> requests and matches summed over the tiers.
+                Each has the 'yield' of valid matches per request. Ladder requests are counted in both.
+        """
+
+        self.calls = 0
+        ladders = {}                            # tier -> PUUIDs read from its ladder and not crawled yet
+        expected, actual = {}, {}
+        while self.calls < self.budget:
+            read = False
+            for tier, tier_plan in self.plan(self.budget - self.calls, {tier: len(puuids) for tier, puuids in ladders.items()}).items():
+                if tier not in ladders:
+                    read = True
+                    calls = self.calls
+                    ladders[tier] = await self.read_ladder(tier, tier_plan['players'])
+                    actual[tier] = {'players': 0, 'calls': self.calls - calls, 'new': 0, 'downloaded': 0, 'matches': 0}
+                    expected[tier] = {'players': 0, 'depth': 0, 'calls': self.calls - calls, 'matches': 0.0}
+
+            # Only tiers whose ladder has been read can be crawled, so any other tier counts as having no players
+            plan = self.plan(self.budget - self.calls, {tier: len(ladders.get(tier, ())) for tier in self.weights})
+            if not plan:
+                # The ladders just read had fewer new players than planned, and the next round may read other tiers.
+                # Every tier is read at most once, so this ends
+                if read:
+                    continue
+                break
+            calls = self.calls
+            for tier, tier_plan in plan.items():
+                expected[tier].update(players=expected[tier]['players'] + tier_plan['players'], depth=tier_plan['depth'],
+                                      calls=expected[tier]['calls'] + tier_plan['calls'], matches=expected[tier]['matches'] + tier_plan['matches'])
+                puuids, ladders[tier] = ladders[tier][:tier_plan['players']], ladders[tier][tier_plan['players']:]
+                for name, count in (await self.crawl_tier(tier, puuids, tier_plan['depth'])).items():
+                    actual[tier][name] += count
+            if self.calls == calls:
+                break
+
+        report = {tier: {'expected': {**expected[tier], 'yield': expected[tier]['matches'] / max(expected[tier]['calls'], 1)},
+                         'actual': {**actual[tier], 'yield': actual[tier]['matches'] / max(actual[tier]['calls'], 1)}} for tier in actual}
+        totals = {kind: {name: sum(tier[kind][name] for tier in report.values()) for name in ('calls', 'matches')} for kind in ('expected', 'actual')}
+        report['total'] = {kind: {**total, 'yield': total['matches'] / max(total['calls'], 1)} for kind, total in totals.items()}
+
+        print(f'{self.region} {"tier":<12} {"players":>7} {"depth":>5} {"calls (expected / actual)":>23} {"matches":>19} {"matches/call":>17}')
+        for tier, result in report.items():
+            expected, actual = result['expected'], result['actual']
+            print(f'{self.region} {tier:<12} {actual.get("players", ""):>7} {expected.get("depth", ""):>5} '
+                  f'{expected["calls"]:>11.0f} / {actual["calls"]:<9} {expected["matches"]:>8.0f} / {actual["matches"]:<8} '
+                  f'{expected["yield"]:>7.3f} / {actual["yield"]:<7.3f}')
+        return report
+
+    def crawl(self):
+        """
+        Blocking version of `crawl_async`, usable from scripts and notebooks.
+
+        Returns:
+            dict: tier -> expected and actual yield, see `crawl_async`.
+        """
+
+        return run(self.crawl_async())
+
+
+
+def crawl(regions=('NA1', 'EUW1', 'KR'), max_matches=None, frontier_path=os.path.join('data', 'frontier.sqlite'),
+          store_path=os.path.join('data', 'matches_raw'), **kwargs):
+    """
+    Crawls ranked matches of several regions into a `MatchStore`, resuming from the frontier of earlier runs.
+
+    Args:
+        regions (tuple, optional): Platform regions. Defaults to ('NA1', 'EUW1', 'KR').
+        max_matches (int, optional): Number of matches to save per region. Defaults to no limit.
+        frontier_path (str, optional): SQLite frontier file. Defaults to 'data/frontier.sqlite'.
+        store_path (str, optional): Directory of the match store. Defaults to 'data/matches_raw'.
+        **kwargs: Passed on to `CrawlScheduler`.
+
+    Returns:
+        dict: region -> number of matches saved.
+    """
+
+    with Frontier(frontier_path) as frontier, MatchStore(store_path) as store:
+        saved = CrawlScheduler(regions, frontier, store, **kwargs).crawl(max_matches)
+        for region, counts in frontier.counts().items():
+            print(f'{region}: {counts["done"]} matches saved, {counts["pending"]} pending, {counts["failed"]} failed, {counts["players"]} players.')
+    return saved
+
+
+
+def crawl_pipeline(regions=('NA1',), max_matches=None, frontier_path=os.path.join('data', 'frontier.sqlite'),
+                   store_path=os.path.join('data', 'matches_raw'), **kwargs):
+    """
+    Crawls the ladders of several regions into a `MatchStore`, one `CrawlPipeline` per region running concurrently.
+
+    Args:
+        regions (tuple, optional): Platform regions. Defaults to ('NA1',).
+        max_matches (int, optional): Number of matches to save per region. Defaults to no limit.
+        frontier_path (str, optional): SQLite frontier file recording what was crawled. Defaults to 'data/frontier.sqlite'.
+        store_path (str, optional): Directory of the match store. Defaults to 'data/matches_raw'.
+        **kwargs: Passed on to `CrawlPipeline`.
+
+    Returns:
+        dict: region -> items handled per stage and 'saved'.
+    """
+
+    async def crawl_all(frontier, store):
+        pipelines = [CrawlPipeline(region, store, frontier, **kwargs) for region in regions]
+        results = await asyncio.gather(*(pipeline.crawl_async(max_matches) for pipeline in pipelines))
+        return dict(zip(regions, results))
+
+    with Frontier(frontier_path) as frontier, MatchStore(store_path) as store:
+        return run(crawl_all(frontier, store))
+
+
+
+def crawl_planned(regions=('NA1',), budget=1000, weights=None, frontier_path=os.path.join('data', 'frontier.sqlite'),
+                  store_path=os.path.join('data', 'matches_raw'), **kwargs):
+    """
+    Crawls several regions concurrently, each spending a budget of requests as planned by a `CrawlPlanner`.
+
+    Args:
+        regions (tuple, optional): Platform regions. Defaults to ('NA1',).
+        budget (int, optional): Requests to spend per region. Defaults to 1000.
+        weights (dict, optional): Tier -> value of its matches relative to the other tiers. Defaults to {'CHALLENGER': 1}.
+        frontier_path (str, optional): SQLite frontier file, which also holds the yields measured by earlier crawls. Defaults to 'data/frontier.sqlite'.
+        store_path (str, optional): Directory of the match store. Defaults to 'data/matches_raw'.
+        **kwargs: Passed on to `CrawlPlanner`.
+
+    Returns:
+        dict: region -> expected and actual yield of every tier (see `CrawlPlanner.crawl_async`).
+    """
+
+    async def crawl_all(frontier, store):
+        planners = [CrawlPlanner(region, frontier, store, budget, weights, **kwargs) for region in regions]
+        results = await asyncio.gather(*(planner.crawl_async() for planner in planners))
+        return dict(zip(regions, results))
+
+    with Frontier(frontier_path) as frontier, MatchStore(store_path) as store:
+        return run(crawl_all(frontier, store))
@@ -0,0 +1,594 @@
+# Necessary imports
+import json
+import os
+import shutil
+import numpy as np
+from utils import metrics
+from utils.builds import BuildIndex
+from utils.const import rune_section_map, sec_rune_section_map, stat_section_map
+from utils.sections import cell_positions, nest_cells, section_index
+from utils.static import patch_key, patch_of
+
+
+
+# Count groups of the cube and the prepped columns each one counts together
+cube_groups = {
+    'Items': ['Item 1', 'Item 2', 'Item 3', 'Item 4', 'Item 5', 'Item 6'],
+    'Rune 1': ['Rune 1'],
+    'Rune 2': ['Rune 2'],
+    'Rune 3': ['Rune 3'],
+    'Rune 4': ['Rune 4'],
+    'Sec Runes': ['Sec Rune 1', 'Sec Rune 2'],
+    'Stat 1': ['Stat 1'],
+    'Stat 2': ['Stat 2'],
+    'Stat 3': ['Stat 3'],
+    'Summoner Spells': ['Summ 1', 'Summ 2']
+}
+
+
+
+class AggregateCube:
+    """
+    Precomputed item, rune, stat shard and summoner spell counts for every (champion, role).
+
+    Each count group (see `cube_groups`) is a dense matrix with one row per (champion, role) key and one
+    column per value in that group's vocabulary. The cube is built in a single pass over the prepped
+    DataFrame, so a recommendation is a row lookup instead of a scan of every match.
+
+    When the DataFrame has a `Match ID` column the cube also remembers which matches it has counted, so
+    batches of new matches can be merged in with `update` without counting any match twice.
+
+    Which items are built together is kept in a `BuildIndex` next to the counts (`builds`), for the most
+    common cores and the best next item given the items already built.
+
+    Example:
+        cube = AggregateCube.from_df(df)
+        display_most_popular(cube.recommend('AHRI', 'MIDDLE'))
+    """
+
+    def __init__(self, keys, vocab, counts, games, match_ids=None, builds=None):
+        self.keys = list(keys)                  # (champion, role) of each row
+        self.vocab = vocab                      # group -> np.ndarray of values
+        self.counts = counts                    # group -> np.ndarray of shape (len(keys), len(vocab[group]))
+        self.games = games                      # np.ndarray of rows seen per key
+        self.match_ids = match_ids              # Set of counted match IDs, None if not tracked
+        self.builds = builds                    # BuildIndex of items built together, None if not built
+        self._rows = {key: i for i, key in enumerate(self.keys)}
+
+    @classmethod
+    def empty(cls):
+        """
+        Creates a cube with no data that tracks match IDs, to be filled with `update`.
+
+        Returns:
+            AggregateCube: The empty cube.
+        """
+
+        return cls([], {group: np.empty(0, dtype=object) for group in cube_groups},
+                   {group: np.zeros((0, 0), dtype=np.int32) for group in cube_groups}, np.zeros(0, dtype=np.int32), set(), BuildIndex.empty())
+
+    @classmethod
+    def from_df(cls, df):
+        """
+        Builds the cube from a prepped DataFrame (see `prep_for_rec`).
+
+        Args:
+            df (pd.DataFrame): Prepped match data with champion, role, rune, stat, item and summoner spell columns.
+
+        Returns:
+            AggregateCube: The cube.
+        """
+
+        import pandas as pd
+
+        key_codes, key_index = pd.MultiIndex.from_frame(df[['Champion Name', 'Role']]).factorize()
+        num_keys = len(key_index)
+
+        vocab = {}
+        counts = {}
+        for group, columns in cube_groups.items():
+            # One code space per group, shared by all of its columns
+            value_codes, values = pd.factorize(df[columns].to_numpy().ravel(order='F'))
+            keys = np.tile(key_codes, len(columns))
+            present = value_codes >= 0      # NaN (e.g. unfinished items) is -1
+            flat = np.bincount(keys[present] * len(values) + value_codes[present], minlength=num_keys * len(values))
+            vocab[group] = np.asarray(values, dtype=object)
+            counts[group] = flat.reshape(num_keys, len(values)).astype(np.int32)
+
+        games = np.bincount(key_codes, minlength=num_keys).astype(np.int32)
+        match_ids = set(df['Match ID']) if 'Match ID' in df.columns else None
+        return cls(list(key_index), vocab, counts, games, match_ids, BuildIndex.from_df(df))
+
+    def merge(self, other):
+        """
+        Adds the counts of another cube into this one. Costs O(keys x vocabulary), not O(rows).
+
+        Args:
+            other (AggregateCube): Cube of matches not yet counted in this one.
+        """
+
+        keys = self.keys + [key for key in other.keys if key not in self._rows]
+        rows = {key: i for i, key in enumerate(keys)}
+        other_rows = np.array([rows[key] for key in other.keys], dtype=np.intp)
+
+        for group in cube_groups:
+            columns = {value: i for i, value in enumerate(self.vocab[group])}
+            vocab = list(self.vocab[group]) + [value for value in other.vocab[group] if value not in columns]
+            columns = {value: i for i, value in enumerate(vocab)}
+            other_columns = np.array([columns[value] for value in other.vocab[group]], dtype=np.intp)
+
+            counts = np.zeros((len(keys), len(vocab)), dtype=np.result_type(self.counts[group], other.counts[group]))
+            counts[:len(self.keys), :len(self.vocab[group])] = self.counts[group]
+            counts[np.ix_(other_rows, other_columns)] += other.counts[group]
+            self.vocab[group] = np.asarray(vocab, dtype=object)
+            self.counts[group] = counts
+
+        games = np.zeros(len(keys), dtype=np.result_type(self.games, other.games))
+        games[:len(self.keys)] = self.games
+        games[other_rows] += other.games
+        self.games = games
+
+        self.keys = keys
+        self._rows = rows
+        if self.match_ids is not None:
+            self.match_ids |= other.match_ids or set()
+        if self.builds is not None and other.builds is not None:
+            self.builds.merge(other.builds)
+        else:
+            self.builds = None
+
+    def update(self, df):
+        """
+        Counts a batch of new prepped rows, skipping any match already counted.
+
+        Args:
+            df (pd.DataFrame): Prepped match data that includes the `Match ID` column.
+
+        Returns:
+            int: Number of new matches counted.
+
+        Raises:
+            ValueError: If the cube does not track match IDs.
+        """
+
+        if self.match_ids is None:
+            raise ValueError('This cube does not track match IDs. Rebuild it from data with a Match ID column.')
+
+        new_df = df[~df['Match ID'].isin(self.match_ids)].drop_duplicates(subset=['Match ID', 'Champion Name'])
+        if new_df.empty:
+            return 0
+        self.merge(AggregateCube.from_df(new_df))
+        return new_df['Match ID'].nunique()
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __len__(self):
+        return len(self.keys)
+
+    def group_counts(self, champion_name, role, group, as_series=True):
+        """
+        Gets the nonzero counts of one group for a (champion, role), most common first.
+
+        Args:
+            champion_name (str): Upper-case champion name.
+            role (str): Role.
+            group (str): Name of the count group, e.g. 'Items'.
+            as_series (bool, optional): Return a pd.Series. If False, (value, count) pairs are returned and pandas is not imported. Defaults to True.
+
+        Returns:
+            pd.Series or list: Counts indexed by value.
+        """
+
+        row = self.counts[group][self._rows[(champion_name, role)]]
+        present = np.flatnonzero(row)
+        order = present[np.argsort(-row[present], kind='stable')]
+        if not as_series:
+            return list(zip(self.vocab[group][order].tolist(), row[order].tolist()))
+
+        import pandas as pd
+        return pd.Series(row[order].astype(np.int64), index=pd.Index(self.vocab[group][order]), name='count')
+
+    def _section_counts(self, row, groups, index, lookup_groups):
+        # Counts of a row in the shape of a section map, and the counted values that are not in it
+        paths, lookup = index
+        counts = np.zeros(len(paths), dtype=np.int64)
+        unknown = {}
+        for group, lookup_group in zip(groups, lookup_groups):
+            row_counts = self.counts[group][row]
+            cells = cell_positions(self.vocab[group], lookup, lookup_group)
+            known = cells >= 0
+            counts += np.bincount(cells[known], weights=row_counts[known], minlength=len(paths)).astype(np.int64)
+            for value, count in zip(self.vocab[group][~known], row_counts[~known].tolist()):
+                if count:
+                    unknown[value] = unknown.get(value, 0) + count
+        return nest_cells(paths, counts), unknown
+
+    @metrics.timed('query_seconds', path='cube')
+    def recommend(self, champion_name, role, rune_section_map=rune_section_map, sec_rune_section_map=sec_rune_section_map, stat_section_map=stat_section_map,
+                  as_series=True, items=None):
+        """
+        Looks up the recommendations of a (champion, role), in the same structure as `recommend_based_on_champion`.
+
+        Args:
+            champion_name (str): Upper-case champion name.
+            role (str): Role.
+            rune_section_map (dict, optional): Runes of each tree and slot. Defaults to `utils.const.rune_section_map`.
+            sec_rune_section_map (dict, optional): Secondary runes of each tree and slot. Defaults to `utils.const.sec_rune_section_map`.
+            stat_section_map (dict, optional): Stat shards of each category. Defaults to `utils.const.stat_section_map`.
+            as_series (bool, optional): Give items and summoner spells as pd.Series rather than (value, count) pairs. Defaults to True.
+            items (list, optional): Items already built. Adds the best next items to the recommendations. Defaults to None.
+
+        Returns:
+            dict or str: Recommendations, or a message if there is no data for the (champion, role). With a build index,
+                they include the most common 3-item 'Cores' and, given `items`, the 'Next Items' (see `BuildIndex`).
+        """
+
+        if (champion_name, role) not in self._rows:
+            return f'No data available for champion {champion_name} in role {role}.'
+        row = self._rows[(champion_name, role)]
+
+        runes, unknown_runes = self._section_counts(row, ['Rune 1', 'Rune 2', 'Rune 3', 'Rune 4'], section_index(rune_section_map, group_level=1),
+                                                    ['Keystone', 'Slot 1', 'Slot 2', 'Slot 3'])
+        sec_runes, sec_unknown_runes = self._section_counts(row, ['Sec Runes'], section_index(sec_rune_section_map), [None])
+        stats, _ = self._section_counts(row, ['Stat 1', 'Stat 2', 'Stat 3'], section_index(stat_section_map, group_level=0),
+                                        ['Offense', 'Flex', 'Defense'])
+        for rune, count in sec_unknown_runes.items():
+            unknown_runes[rune] = unknown_runes.get(rune, 0) + count
+
+        recommendations = {
+            'Items': self.group_counts(champion_name, role, 'Items', as_series),
+            'Runes': runes,
+            'Secondary Runes': sec_runes,
+            'Stats': stats,
+            'Summoner Spells': self.group_counts(champion_name, role, 'Summoner Spells', as_series),
+            'Unknown Runes': unknown_runes
+        }
+        if self.builds is not None:
+            recommendations['Cores'] = self.builds.cores(champion_name, role, size=3, top=5)
+            if items:
+                recommendations['Next Items'] = self.builds.next_items(champion_name, role, items)
+        return recommendations
+
+    def save(self, path):
+        """
+        Saves the cube as a snapshot directory: the keys and vocabularies in `meta.json`, and every count
+        matrix as an uncompressed `.npy` file that `load` can memory-map instead of reading.
+
+        Args:
+            path (str): Directory to write.
+        """
+
+        def replace(name, array):
+            # A loaded cube may be memory-mapping the old file, so it is replaced rather than overwritten
+            with open(os.path.join(path, f'{name}.tmp'), 'wb') as file:
+                np.save(file, array)
+            os.replace(os.path.join(path, f'{name}.tmp'), os.path.join(path, name))
+
+        os.makedirs(path, exist_ok=True)
+        for i, group in enumerate(cube_groups):
+            replace(f'counts-{i}.npy', np.ascontiguousarray(self.counts[group]))
+        replace('games.npy', np.asarray(self.games))
+        if self.match_ids is not None:
+            replace('match_ids.npy', np.array(sorted(self.match_ids), dtype=str))
+        elif os.path.exists(os.path.join(path, 'match_ids.npy')):
+            os.remove(os.path.join(path, 'match_ids.npy'))
+        if self.builds is not None:
+            self.builds.save(os.path.join(path, 'builds'))
+        elif os.path.exists(os.path.join(path, 'builds')):
+            shutil.rmtree(os.path.join(path, 'builds'))
+
+        # Written last, so a snapshot interrupted mid-save is not mistaken for a complete one
+        meta = {'keys': [list(key) for key in self.keys],
+                'groups': list(cube_groups),
+                'vocab': {group: self.vocab[group].tolist() for group in cube_groups}}
+        with open(os.path.join(path, 'meta.json.tmp'), 'w') as file:
+            json.dump(meta, file)
+        os.replace(os.path.join(path, 'meta.json.tmp'), os.path.join(path, 'meta.json'))
+
+    @classmethod
+    def load(cls, path, match_ids=True, mmap=True):
+        """
+        Loads a cube saved with `save`.
+
+        Args:
+            path (str): Snapshot directory to read.
+            match_ids (bool, optional): Also load the counted match IDs, needed for `update`. Defaults to True.
+            mmap (bool, optional): Memory-map the count matrices instead of reading them, so only the rows that are
+                looked up are paged in. Memory-mapped counts are read-only; `merge` makes new arrays. Defaults to True.
+
+        Returns:
+            AggregateCube: The cube.
+
+        Raises:
+            FileNotFoundError: If there is no complete snapshot in `path`.
+        """
+
+        with open(os.path.join(path, 'meta.json'), 'r') as file:
+            meta = json.load(file)
+
+        mmap_mode = 'r' if mmap else None
+        keys = [tuple(key) for key in meta['keys']]
+        vocab = {group: np.array(meta['vocab'][group], dtype=object) for group in meta['groups']}
+        counts = {group: np.load(os.path.join(path, f'counts-{i}.npy'), mmap_mode=mmap_mode) for i, group in enumerate(meta['groups'])}
+        games = np.load(os.path.join(path, 'games.npy'), mmap_mode=mmap_mode)
+
+        ids = None
+        ids_path = os.path.join(path, 'match_ids.npy')
+        if match_ids and os.path.exists(ids_path):
+            ids = set(np.load(ids_path).tolist())
+        builds = None
+        if os.path.exists(os.path.join(path, 'builds', 'builds.json')):
+            builds = BuildIndex.load(os.path.join(path, 'builds'), mmap)
+        return cls(keys, vocab, counts, games, ids, builds)
+
+
+
+class PatchIndex:
+    """
+    One `AggregateCube` per patch, so queries over a window of recent patches only add up the counts of
+    those patches, however long the history gets.
+
+    A window is either the last few patches or every patch weighted by recency, where a patch `half_life`
+    patches older than the newest counts half as much. Combined windows are cached until the index is updated.
+
+    Example:
+        index = PatchIndex.from_df(df)      # df keeps its Game Version column
+        display_most_popular(index.recommend('AHRI', 'MIDDLE', last=2))
+    """
+
+    index_name = 'index.json'
+
+    def __init__(self, cubes, match_ids=None):
+        self.cubes = cubes                      # Patch -> AggregateCube
+        self.match_ids = match_ids              # Set of counted match IDs, None if not tracked
+        self._windows = {}                      # (patches, half_life) -> combined AggregateCube
+
+    @classmethod
+    def from_df(cls, df, version_column='Game Version'):
+        """
+        Builds the index from a prepped DataFrame that kept its game version column.
+
+        Args:
+            df (pd.DataFrame): Prepped match data, see `AggregateCube.from_df`.
+            version_column (str, optional): Column of the game version of each row. Defaults to 'Game Version'.
+
+        Returns:
+            PatchIndex: The index.
+        """
+
+        index = cls({}, set() if 'Match ID' in df.columns else None)
+        index._add(df, version_column)
+        return index
+
+    def _add(self, df, version_column):
+        import pandas as pd
+
+        # Game versions repeat, so the patch is worked out once per distinct version
+        codes, versions = pd.factorize(df[version_column])
+        patch_codes, patches = pd.factorize(np.array([patch_of(version) for version in versions] + [None], dtype=object)[codes])
+        order = np.argsort(patch_codes, kind='stable')
+        bounds = np.searchsorted(patch_codes[order], np.arange(len(patches) + 1))
+
+        for i, patch in enumerate(patches):
+            patch_df = df.take(order[bounds[i]:bounds[i + 1]])
+            cube = AggregateCube.from_df(patch_df)
+            cube.match_ids = None
+            if patch in self.cubes:
+                self.cubes[patch].merge(cube)
+            else:
+                self.cubes[patch] = cube
+            if self.match_ids is not None:
+                self.match_ids.update(patch_df['Match ID'])
+        self._windows = {}
+
+    def update(self, df, version_column='Game Version'):
+        """
+        Counts a batch of new prepped rows into their patches, skipping any match already counted.
+
+        Args:
+            df (pd.DataFrame): Prepped match data that includes the `Match ID` and game version columns.
+            version_column (str, optional): Column of the game version of each row. Defaults to 'Game Version'.
+
+        Returns:
+            int: Number of new matches counted.
+
+        Raises:
+            ValueError: If the index does not track match IDs.
+        """
+
+        if self.match_ids is None:
+            raise ValueError('This index does not track match IDs. Rebuild it from data with a Match ID column.')
+
+        new_df = df[~df['Match ID'].isin(self.match_ids)].drop_duplicates(subset=['Match ID', 'Champion Name'])
+        if new_df.empty:
+            return 0
+        self._add(new_df, version_column)
+        return new_df['Match ID'].nunique()
+
+    def patches(self):
+        """
+        Gets the patches in the index.
+
+        Returns:
+            list: Patches, oldest first.
+        """
+
+        return sorted((patch for patch in self.cubes if patch is not None), key=patch_key)
+
+    def window(self, last=None, patches=None, half_life=None):
+        """
+        Combines the counts of a window of patches into one cube.
+
+        Args:
+            last (int, optional): Only use the newest `last` patches. Defaults to every patch.
+            patches (list, optional): Only use these patches. Overrides `last`.
+            half_life (float, optional): Weight every patch by 0.5 ** (age / half_life), where age is the number of patches
+                it is older than the newest one in the window, including the build counts. Weighted counts are rounded.
+                Defaults to no weighting.
+
+        Returns:
+            AggregateCube: Counts of the window, read-only and shared between calls.
+        """
+
+        if patches is None:
+            patches = self.patches()[-last:] if last else self.patches()
+        patches = tuple(sorted((patch for patch in patches if patch in self.cubes), key=patch_key))
+        key = (patches, half_life)
+        if key in self._windows:
+            return self._windows[key]
+
+        combined = AggregateCube.empty()
+        combined.match_ids = None
+        for age, patch in enumerate(reversed(patches)):
+            cube = self.cubes[patch]
+            if half_life:
+                weight = 0.5 ** (age / half_life)
+                builds = cube.builds.scaled(weight) if cube.builds is not None else None
+                cube = AggregateCube(cube.keys, dict(cube.vocab), {group: cube.counts[group] * weight for group in cube_groups}, cube.games * weight, builds=builds)
+            combined.merge(cube)
+
+        if half_life:
+            combined.counts = {group: np.rint(counts).astype(np.int32) for group, counts in combined.counts.items()}
+            combined.games = np.rint(combined.games).astype(np.int32)
+            if combined.builds is not None:
+                combined.builds = combined.builds.scaled(1, rounded=True)
+
+        # Windows are shared between the threads of the service, so the merged builds are compacted before any read
+        if combined.builds is not None:
+            combined.builds.compact()
+
+        self._windows[key] = combined
+        return combined
+
+    def recommend(self, champion_name, role, last=None, patches=None, half_life=None, **kwargs):
+        """
+        Looks up the recommendations of a (champion, role) over a window of patches (see `window`).
+
+        Args:
+            champion_name (str): Upper-case champion name.
+            role (str): Role.
+            last (int, optional): Only use the newest `last` patches. Defaults to every patch.
+            patches (list, optional): Only use these patches. Overrides `last`.
+            half_life (float, optional): Recency half-life in patches. Defaults to no weighting.
+            **kwargs: Passed on to `AggregateCube.recommend`.
+
+        Returns:
+            dict or str: Recommendations, or a message if there is no data for the (champion, role) in the window.
+        """
+
+        return self.window(last, patches, half_life).recommend(champion_name, role, **kwargs)
+
+    def save(self, path):
+        """
+        Saves every patch as a cube snapshot in `<path>/<patch>`, and the patch list in `index.json`.
+
+        Args:
+            path (str): Directory to write.
+        """
+
+        os.makedirs(path, exist_ok=True)
+        for patch in self.patches():
+            self.cubes[patch].save(os.path.join(path, patch))
+        if self.match_ids is not None:
+            with open(os.path.join(path, 'match_ids.npy.tmp'), 'wb') as file:
+                np.save(file, np.array(sorted(self.match_ids), dtype=str))
+            os.replace(os.path.join(path, 'match_ids.npy.tmp'), os.path.join(path, 'match_ids.npy'))
+
+        with open(os.path.join(path, f'{self.index_name}.tmp'), 'w') as file:
+            json.dump({'patches': self.patches()}, file)
+        os.replace(os.path.join(path, f'{self.index_name}.tmp'), os.path.join(path, self.index_name))
+
+    @classmethod
+    def load(cls, path, match_ids=True):
+        """
+        Loads an index saved with `save`. The count matrices of every patch are memory-mapped, so patches outside
+        the windows that are queried are never read.
+
+        Args:
+            path (str): Directory to read.
+            match_ids (bool, optional): Also load the counted match IDs, needed for `update`. Defaults to True.
+
+        Returns:
+            PatchIndex: The index.
+        """
+
+        with open(os.path.join(path, cls.index_name), 'r') as file:
+            patches = json.load(file)['patches']
+        cubes = {patch: AggregateCube.load(os.path.join(path, patch), match_ids=False) for patch in patches}
+
+        ids = None
+        if match_ids and os.path.exists(os.path.join(path, 'match_ids.npy')):
+            ids = set(np.load(os.path.join(path, 'match_ids.npy')).tolist())
+        return cls(cubes, ids)
+
+
+
+def refresh_cube(cube_path=os.path.join('data', 'cube'), store_path=os.path.join('data', 'matches_raw'), batch_size=5000):
+    """
+    Brings a saved cube up to date with a `MatchStore`, counting only the matches it has not seen, and saves it.
+    The work done scales with the number of new matches rather than the size of the history.
+
+    Args:
+        cube_path (str, optional): Saved cube. Created if it does not exist or does not track match IDs. Defaults to 'data/cube'.
+        store_path (str, optional): Directory of the match store. Defaults to 'data/matches_raw'.
+        batch_size (int, optional): Number of new matches processed at a time. Defaults to 5000.
+
+    Returns:
+        AggregateCube: The updated cube.
+    """
+
+    from utils.const import columns_to_keep, finished_items, item_columns
+    from utils.func import prep_for_rec, process_matches
+    from utils.store import MatchStore
+
+    cube = AggregateCube.load(cube_path) if os.path.exists(os.path.join(cube_path, 'meta.json')) else AggregateCube.empty()
+    if cube.match_ids is None:
+        cube = AggregateCube.empty()
+
+    with MatchStore(store_path) as store:
+        new_ids = [match_id for match_id in store.ids() if match_id not in cube.match_ids]
+        print(f'Counting {len(new_ids)} new matches.')
+        for start in range(0, len(new_ids), batch_size):
+            batch_df, _ = process_matches(store.get(match_id) for match_id in new_ids[start:start + batch_size])
+            cube.update(prep_for_rec(batch_df, item_columns, finished_items, columns_to_keep + ['Match ID']))
+            # Skipped matches (not ranked, remakes) are remembered too, so they are not re-read next time
+            cube.match_ids.update(new_ids[start:start + batch_size])
+
+    cube.save(cube_path)
+    return cube
+
+
+
+def refresh_patch_index(index_path=os.path.join('data', 'cubes'), store_path=os.path.join('data', 'matches_raw'), batch_size=5000):
+    """
+    Brings a saved `PatchIndex` up to date with a `MatchStore`, counting only the matches it has not seen, and saves it.
+
+    Args:
+        index_path (str, optional): Saved index. Created if it does not exist or does not track match IDs. Defaults to 'data/cubes'.
+        store_path (str, optional): Directory of the match store. Defaults to 'data/matches_raw'.
+        batch_size (int, optional): Number of new matches processed at a time. Defaults to 5000.
+
+    Returns:
+        PatchIndex: The updated index.
+    """
+
+    from utils.const import columns_to_keep, finished_items, item_columns
+    from utils.func import prep_for_rec, process_matches
+    from utils.store import MatchStore
+
+    index = PatchIndex.load(index_path) if os.path.exists(os.path.join(index_path, PatchIndex.index_name)) else PatchIndex({}, set())
+    if index.match_ids is None:
+        index = PatchIndex({}, set())
+
+    with MatchStore(store_path) as store:
+        new_ids = [match_id for match_id in store.ids() if match_id not in index.match_ids]
+        print(f'Counting {len(new_ids)} new matches.')
+        for start in range(0, len(new_ids), batch_size):
+            batch_df, _ = process_matches(store.get(match_id) for match_id in new_ids[start:start + batch_size])
+            index.update(prep_for_rec(batch_df, item_columns, finished_items, columns_to_keep + ['Match ID', 'Game Version']))
+            # Skipped matches (not ranked, remakes) are remembered too, so they are not re-read next time
+            index.match_ids.update(new_ids[start:start + batch_size])
+
+    index.save(index_path)
+    return index
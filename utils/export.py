@@ -0,0 +1,75 @@
+# Necessary imports
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils.service import RecommendationService
+
+
+
+# Service of each export worker process, loaded once by `_init_worker`
+_worker_service = None
+
+
+
+def _init_worker(cube_path):
+    global _worker_service
+    _worker_service = RecommendationService(cube_path, cache_size=0, check_interval=float('inf'))
+
+
+
+def _file_stem(champion_name, role):
+    return re.sub(r'[^A-Za-z0-9]+', '_', f'{champion_name}_{role}')
+
+
+
+def _export_keys(keys, out_path, num_items):
+    # Renders and writes one chunk of (champion, role) pairs, returning their manifest entries
+    entries = []
+    for champion_name, role in keys:
+        recommendations = _worker_service.recommend(champion_name, role, num_items)
+        stem = _file_stem(champion_name, role)
+        with open(os.path.join(out_path, f'{stem}.json'), 'w') as file:
+            json.dump(recommendations, file)
+        with open(os.path.join(out_path, f'{stem}.txt'), 'w') as file:
+            file.write(recommendations['text'])
+        entries.append({'champion': champion_name, 'role': role, 'games': recommendations['games'],
+                        'json': f'{stem}.json', 'text': f'{stem}.txt'})
+    return entries
+
+
+
+def export_all(cube_path=os.path.join('data', 'cube'), out_path=os.path.join('data', 'export'), num_items=10, workers=None, chunk_size=64):
+    """
+    Writes the recommendations of every (champion, role) in a cube snapshot, as a JSON and a text file per pair
+    plus a `manifest.json` listing them. The counts of every pair come from the cube in one pass, and rendering
+    is spread over a pool of processes that each memory-map the snapshot once.
+
+    Args:
+        cube_path (str, optional): Cube snapshot directory. Defaults to 'data/cube'.
+        out_path (str, optional): Directory to write. Defaults to 'data/export'.
+        num_items (int, optional): Number of items per recommendation. Defaults to 10.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        chunk_size (int, optional): Number of pairs given to a worker at a time. Defaults to 64.
+
+    Returns:
+        dict: The manifest.
+    """
+
+    start = time.perf_counter()
+    service = RecommendationService(cube_path, cache_size=0)
+    keys = sorted(service.cube.keys)
+    os.makedirs(out_path, exist_ok=True)
+
+    chunks = [keys[i:i + chunk_size] for i in range(0, len(keys), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cube_path,)) as executor:
+        entries = [entry for chunk in executor.map(_export_keys, chunks, [out_path] * len(chunks), [num_items] * len(chunks))
+                   for entry in chunk]
+
+    manifest = {'version': service.version, 'num_items': num_items, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'pairs': entries}
+    with open(os.path.join(out_path, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=1)
+    print(f'Exported {len(entries)} champion/role pairs to {out_path} in {time.perf_counter() - start:.1f}s.')
+    return manifest
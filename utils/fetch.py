@@ -0,0 +1,537 @@
+# Necessary imports
+import asyncio
+import contextlib
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from utils import metrics
+from utils.const import app_rate_limits, pooled_hosts, riot_api_url
+
+
+
+def api_base_url():
+    """
+    Gets the base URL of the Riot API: the `api_base_url` environment variable if set, else `riot_api_url`.
+
+    Returns:
+        str: Base URL, with {host} standing for the platform or routing host.
+    """
+
+    return os.environ.get('api_base_url') or riot_api_url
+
+
+
+def riot_url(host, path, api_key=None):
+    """
+    Builds a Riot API URL.
+
+    Args:
+        host (str): Platform or routing host, e.g. 'na1' or 'americas'.
+        path (str): Path and query, e.g. '/lol/match/v5/matches/NA1_123'.
+        api_key (str, optional): API key to add to the query. Defaults to none.
+
+    Returns:
+        str: The URL.
+    """
+
+    url = api_base_url().format(host=host.lower()) + path
+    return url if api_key is None else f'{url}{"&" if "?" in path else "?"}api_key={api_key}'
+
+
+
+_host_patterns = {}
+
+
+
+def riot_host(url):
+    """
+    Gets the platform or routing host of a Riot API URL (see `riot_url`).
+
+    Args:
+        url (str): URL.
+
+    Returns:
+        str: Host, e.g. 'na1' or 'americas', or None if the URL is not one of the Riot API.
+    """
+
+    base = api_base_url()
+    if base not in _host_patterns:
+        _host_patterns[base] = re.compile(re.escape(base).replace(re.escape('{host}'), '([A-Za-z0-9-]+)') + '(?:[/?]|$)', re.IGNORECASE)
+    match = _host_patterns[base].match(url)
+    return match.group(1).lower() if match else None
+
+
+
+def parse_rate_limits(header):
+    """
+    Parses a Riot rate limit header into (count, seconds) pairs.
+
+    Args:
+        header (str): Header value of the form `20:1,100:120`.
+
+    Returns:
+        list: (count, seconds) tuples, e.g. [(20, 1), (100, 120)].
+    """
+
+    if not header:
+        return []
+    return [tuple(int(part) for part in pair.split(':')) for pair in header.split(',') if pair]
+
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter enforcing several rate limit windows at the same time.
+
+    Each window of `count` requests per `seconds` is a bucket of `count` tokens, and a spent
+    token only comes back `seconds` after it was spent. A request may go out once every bucket
+    has a token, so the per-second and per-two-minute limits are both respected. Reservations
+    are made under a lock and never await, so one limiter can be shared by threads and event loops.
+    """
+
+    # Extra seconds added to each window to absorb clock skew between us and Riot
+    margin = 0.05
+
+    def __init__(self, limits=None):
+        self._lock = threading.Lock()
+        self._windows = {}                      # seconds -> [count, deque of token release times]
+        self._blocked_until = 0.0
+        if limits:
+            self.update(limits)
+
+    def update(self, limits, counts=None):
+        """
+        Replaces the enforced windows, keeping the tokens already spent in windows that remain.
+
+        Args:
+            limits (str or list): `X-*-Rate-Limit` header value or (count, seconds) pairs.
+            counts (str or list, optional): Matching `X-*-Rate-Limit-Count` header value. If Riot has
+                counted more requests in a window than we have, the difference is marked as spent.
+        """
+
+        limits = parse_rate_limits(limits) if isinstance(limits, str) else list(limits)
+        counts = dict((seconds, count) for count, seconds in (parse_rate_limits(counts) if isinstance(counts, str) else counts or []))
+
+        with self._lock:
+            now = time.monotonic()
+            windows = {}
+            for count, seconds in limits:
+                released = self._windows.get(seconds, [count, deque()])[1]
+                while released and released[0] <= now:
+                    released.popleft()
+                # Catch up with requests Riot has seen but we haven't (e.g. another process using the key)
+                for _ in range(counts.get(seconds, 0) - len(released)):
+                    released.append(max(released[-1] if released else now, now + seconds + self.margin))
+                windows[seconds] = [count, released]
+            self._windows = windows
+
+    @property
+    def limits(self):
+        return [(count, seconds) for seconds, (count, _) in sorted(self._windows.items())]
+
+    def headroom(self):
+        """
+        Gets the share of tokens left in the tightest window.
+
+        Returns:
+            float: Between 0 (exhausted) and 1 (unused).
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            return min((max(count - sum(1 for released_at in released if released_at > now), 0) / count
+                        for count, released in self._windows.values()), default=1.0)
+
+    def reserve(self):
+        """
+        Spends one token in every window and returns how long to wait before sending.
+
+        Returns:
+            float: Seconds to wait before the request may be sent.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            send_at = max(now, self._blocked_until)
+            for count, released in self._windows.values():
+                while released and released[0] <= now:
+                    released.popleft()
+                if len(released) >= count:
+                    send_at = max(send_at, released[-count])
+            for seconds, (count, released) in self._windows.items():
+                released.append(send_at + seconds + self.margin)
+            return send_at - now
+
+    def block(self, seconds):
+        """
+        Stops handing out tokens for the given number of seconds (e.g. from `Retry-After`).
+
+        Args:
+            seconds (float): Seconds to block for.
+        """
+
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def acquire(self):
+        """Blocks the calling thread until a request may be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Waits without blocking the event loop until a request may be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+
+class PriorityBudget:
+    """
+    Shares a fixed number of in-flight request slots per host between callers of different priority.
+
+    `RateLimiter` hands out tokens first come, first served, so a stage that queues many cheap requests can
+    delay a more important one. Capping the requests waiting on each host and giving every freed slot to
+    the waiting caller with the lowest `priority` number puts the important requests at the front of the
+    limiter's queue, while lower priorities still use any slots it leaves idle. Only for use on one event loop.
+    """
+
+    def __init__(self, slots=20):
+        self.slots = slots
+        self._used = {}                         # host -> slots in use
+        self._waiters = {}                      # host -> heap of (priority, order, future)
+        self._order = itertools.count()
+
+    async def acquire(self, host, priority=0):
+        """
+        Waits for a free slot on a host.
+
+        Args:
+            host (str): Host the request goes to, e.g. 'americas'.
+            priority (int, optional): Lower numbers are served first. Defaults to 0.
+        """
+
+        waiters = self._waiters.setdefault(host, [])
+        if self._used.get(host, 0) < self.slots and not waiters:
+            self._used[host] = self._used.get(host, 0) + 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(waiters, (priority, next(self._order), future))
+        try:
+            await future                        # `release` hands its slot over directly
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(host)
+            raise
+
+    def release(self, host):
+        """
+        Frees a slot on a host, handing it to the highest-priority waiter if there is one.
+
+        Args:
+            host (str): Host the request went to.
+        """
+
+        waiters = self._waiters.get(host, [])
+        while waiters:
+            future = heapq.heappop(waiters)[2]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._used[host] -= 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self, host, priority=0):
+        """Holds a slot on a host for the duration of an `async with` block (see `acquire`)."""
+        await self.acquire(host, priority)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+
+
+class RequestStats:
+    """
+    Thread-safe per-host counters of response statuses and request latency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statuses = {}                      # host -> {status: count}, status is 'error' for connection failures
+        self.latency = {}                       # host -> [count, total seconds, max seconds]
+
+    def record(self, host, status, seconds):
+        with self._lock:
+            statuses = self.statuses.setdefault(host, {})
+            statuses[status] = statuses.get(status, 0) + 1
+            latency = self.latency.setdefault(host, [0, 0.0, 0.0])
+            latency[0] += 1
+            latency[1] += seconds
+            latency[2] = max(latency[2], seconds)
+
+    def summary(self):
+        """
+        Summarizes the counters per host.
+
+        Returns:
+            dict: host -> {'requests', 'statuses', 'mean_latency', 'max_latency'}.
+        """
+
+        with self._lock:
+            return {host: {'requests': count,
+                           'statuses': dict(self.statuses[host]),
+                           'mean_latency': total / count,
+                           'max_latency': longest}
+                    for host, (count, total, longest) in self.latency.items()}
+
+
+
+def create_session(hosts=(), pool_size=20):
+    """
+    Creates a keep-alive `requests.Session` with its own connection pool for each of the given hosts.
+
+    Args:
+        hosts (iterable, optional): Hostnames to give a dedicated pool. Other hosts share the default adapter. Defaults to ().
+        pool_size (int, optional): Maximum number of connections kept open per host. Defaults to 20.
+
+    Returns:
+        requests.Session: The pooled session.
+    """
+
+    session = requests.Session()
+    session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=pool_size))
+    for host in hosts:
+        session.mount(f'https://{host}', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+    return session
+
+
+
+class FetchEngine:
+    """
+    Rate-limit-aware, retrying fetcher for the Riot API and the static data sites.
+
+    Keeps one application limiter per Riot routing host (`na1`, `americas`, ...) and one method limiter per
+    (host, method), both seeded with conservative defaults and then corrected from the
+    `X-App-Rate-Limit`/`X-Method-Rate-Limit` headers of every response. A 429 blocks the limiter named
+    in `X-Rate-Limit-Type` for `Retry-After` seconds and the request is retried. Connection errors and
+    5xx responses are retried with exponential backoff. URLs outside the Riot API (see `riot_url`) are not rate limited.
+
+    All requests share one keep-alive session with a connection pool per host, and every attempt is
+    counted in `stats`. The same limiters back the blocking `get_json` used by the `get_*` functions and
+    the asyncio `fetch_all`, which keeps as many requests in flight as the quota allows.
+    """
+
+    def __init__(self, app_limits='20:1,100:120', method_limits=None, concurrency=20, max_retries=5,
+                 backoff=0.5, timeout=10, hosts=()):
+        self.app_limits = app_limits
+        self.method_limits = method_limits
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = create_session(hosts, pool_size=concurrency)
+        self.stats = RequestStats()
+        self._app_limiters = {}
+        self._method_limiters = {}
+        self._lock = threading.Lock()
+
+    def _limiters(self, url, method):
+        host = riot_host(url)
+        if host is None:
+            return ()
+
+        with self._lock:
+            if host not in self._app_limiters:
+                self._app_limiters[host] = RateLimiter(self.app_limits)
+            if (host, method) not in self._method_limiters:
+                self._method_limiters[(host, method)] = RateLimiter(self.method_limits)
+            return self._app_limiters[host], self._method_limiters[(host, method)]
+
+    def _send(self, url, method='default'):
+        # Returns the response, or the exception if the connection failed. Riot API calls are counted by platform or
+        # routing host, which also tells regions apart when `api_base_url` points every host at the same server
+        host = riot_host(url) or urlsplit(url).hostname
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+            self.stats.record(host, 'error', time.perf_counter() - start)
+            if metrics.enabled:
+                metrics.observe('api_request_seconds', time.perf_counter() - start, host=host, method=method)
+                metrics.count('api_responses_total', host=host, method=method, status='error')
+            return err
+
+        self.stats.record(host, response.status_code, time.perf_counter() - start)
+        if metrics.enabled:
+            metrics.observe('api_request_seconds', time.perf_counter() - start, host=host, method=method)
+            metrics.count('api_responses_total', host=host, method=method, status=response.status_code)
+        return response
+
+    def _retry_delay(self, outcome, attempt, limiters):
+        # Returns the seconds to wait before retrying, or None if `outcome` is final
+        if isinstance(outcome, Exception):
+            return None if attempt >= self.max_retries else min(self.backoff * 2 ** attempt, 30)
+
+        headers = outcome.headers
+        if limiters:
+            app_limiter, method_limiter = limiters
+            if 'X-App-Rate-Limit' in headers:
+                app_limiter.update(headers['X-App-Rate-Limit'], headers.get('X-App-Rate-Limit-Count'))
+            if 'X-Method-Rate-Limit' in headers:
+                method_limiter.update(headers['X-Method-Rate-Limit'], headers.get('X-Method-Rate-Limit-Count'))
+            if metrics.enabled:
+                host = riot_host(outcome.url)
+                metrics.set_gauge('api_quota_headroom', app_limiter.headroom(), host=host, limit='application')
+                metrics.set_gauge('api_quota_headroom', method_limiter.headroom(), host=host, limit='method')
+
+        if attempt >= self.max_retries:
+            return None
+
+        if outcome.status_code == 429:
+            retry_after = float(headers.get('Retry-After', 1))
+            if metrics.enabled:
+                metrics.count('api_rate_limited_total', type=headers.get('X-Rate-Limit-Type', 'unknown'))
+                metrics.count('api_rate_limited_seconds_total', retry_after)
+            if not limiters:
+                return retry_after
+            # The limiter holds back this and every other request sharing the exhausted limit
+            app_limiter, method_limiter = limiters
+            (app_limiter if headers.get('X-Rate-Limit-Type') == 'application' else method_limiter).block(retry_after)
+            return 0
+        if outcome.status_code >= 500:
+            return float(headers.get('Retry-After', min(self.backoff * 2 ** attempt, 30)))
+        return None
+
+    @staticmethod
+    def _result(outcome):
+        if isinstance(outcome, Exception):
+            raise outcome
+        outcome.raise_for_status()
+        return outcome.json()
+
+    def get_json(self, url, method='default'):
+        """
+        Sends a GET request once the rate limits allow it and returns the decoded JSON.
+
+        Args:
+            url (str): URL to request.
+            method (str, optional): Name of the API method, used to key the method rate limit. Defaults to 'default'.
+
+        Returns:
+            dict or list: Decoded JSON body.
+
+        Raises:
+            requests.exceptions.HTTPError: If the final response is an error.
+            requests.exceptions.ConnectionError: If the host could not be reached after all retries.
+        """
+
+        limiters = self._limiters(url, method)
+        attempt = 0
+        while True:
+            for limiter in limiters:
+                limiter.acquire()
+            outcome = self._send(url, method)
+            delay = self._retry_delay(outcome, attempt, limiters)
+            if delay is None:
+                return self._result(outcome)
+            if metrics.enabled:
+                metrics.count('api_retries_total', method=method)
+            time.sleep(delay)
+            attempt += 1
+
+    async def get_json_async(self, url, method='default', executor=None):
+        """
+        Asyncio version of `get_json`. The request itself runs on `executor`.
+        """
+
+        loop = asyncio.get_running_loop()
+        limiters = self._limiters(url, method)
+        attempt = 0
+        while True:
+            for limiter in limiters:
+                await limiter.acquire_async()
+            outcome = await loop.run_in_executor(executor, self._send, url, method)
+            delay = self._retry_delay(outcome, attempt, limiters)
+            if delay is None:
+                return self._result(outcome)
+            if metrics.enabled:
+                metrics.count('api_retries_total', method=method)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def fetch_all(self, urls, method='default', on_result=None, keep=True):
+        """
+        Fetches many URLs concurrently within the rate limits.
+
+        Args:
+            urls (iterable): URLs to request.
+            method (str, optional): Name of the API method. Defaults to 'default'.
+            on_result (callable, optional): Called as `on_result(index, result)` as soon as each URL completes.
+            keep (bool, optional): Whether to keep successful results in the returned list. Pass False when
+                `on_result` already saves them, so memory does not grow with the number of URLs. Defaults to True.
+
+        Returns:
+            list: The decoded JSON of each URL in input order, or the raised exception for URLs that failed.
+                Successful entries are None when `keep` is False.
+        """
+
+        urls = list(urls)
+        results = [None] * len(urls)
+        queue = asyncio.Queue()
+        for i, url in enumerate(urls):
+            queue.put_nowait((i, url))
+
+        async def worker(executor):
+            while not queue.empty():
+                i, url = queue.get_nowait()
+                try:
+                    results[i] = await self.get_json_async(url, method, executor)
+                except Exception as err:
+                    results[i] = err
+                if on_result is not None:
+                    on_result(i, results[i])
+                if not keep and not isinstance(results[i], Exception):
+                    results[i] = None
+
+        num_workers = max(1, min(self.concurrency, len(urls)))
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            await asyncio.gather(*(worker(executor) for _ in range(num_workers)))
+
+        return results
+
+
+
+def run(coro):
+    """
+    Runs a coroutine to completion from synchronous code, including inside Jupyter's running event loop.
+
+    Args:
+        coro (coroutine): Coroutine to run.
+
+    Returns:
+        The coroutine's result.
+    """
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # A loop is already running in this thread (e.g. a notebook), so run on a fresh one in another thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+
+# Shared client behind every request made by `utils.func`
+engine = FetchEngine(app_limits=app_rate_limits, hosts=pooled_hosts)
@@ -0,0 +1,103 @@
+# Plain-text formatting of recommendations, free of tkinter so that the headless service can use it too
+
+
+
+def format_counts(counts, num_items=None):
+    """
+    Formats value counts as two aligned columns, like `pd.Series.to_string`.
+
+    Args:
+        counts (pd.Series or list): Counts indexed by value, or (value, count) pairs, most common first.
+        num_items (int, optional): Only format the first `num_items`. Defaults to all of them.
+
+    Returns:
+        str: The formatted counts, or 'No data.' if there are none.
+    """
+
+    if hasattr(counts, 'to_string'):
+        counts = counts if num_items is None else counts.head(num_items)
+        return counts.to_string() if len(counts) else 'No data.'
+
+    counts = counts if num_items is None else counts[:num_items]
+    if not counts:
+        return 'No data.'
+    name_width = max(len(str(value)) for value, _ in counts)
+    count_width = max(len(str(count)) for _, count in counts)
+    return '\n'.join(f'{str(value).ljust(name_width)}    {str(count).rjust(count_width)}' for value, count in counts)
+
+
+
+def display_most_popular(recommendations, num_items=10):
+
+    if type(recommendations) == str:
+        return recommendations
+
+    def get_most_popular_runes(rune_sections):
+        most_popular = {}
+        max_count = 0
+        for section, slots in rune_sections.items():
+            section_count = sum(max(runes.values()) for slot, runes in slots.items())
+            if section_count > max_count:
+                max_count = section_count
+                most_popular = {section: slots}
+        return most_popular
+
+    res = ''
+
+    res += 'Most Popular Items:'
+    res += f'\n{'-' * 20}'
+    res += f'\n{format_counts(recommendations['Items'], num_items)}'
+
+    # Only cubes with a build index know which items are built together
+    if recommendations.get('Next Items'):
+        res += '\n\n\nBest Next Items:'
+        res += f'\n{'-' * 20}'
+        for item, count, share in recommendations['Next Items'][:num_items]:
+            res += f'\n{item}: {count} ({share:.0%})'
+
+    if recommendations.get('Cores'):
+        res += '\n\n\nMost Common 3-Item Cores:'
+        res += f'\n{'-' * 20}'
+        for items, count, share in recommendations['Cores']:
+            res += f'\n{' + '.join(items)}: {count} ({share:.0%})'
+
+    res += '\n\n\nMost Popular Runes:'
+    res += f'\n{'-' * 20}'
+    most_popular_runes = get_most_popular_runes(recommendations.get('Runes', {}))
+    for section, slots in most_popular_runes.items():
+        res += f'\n{section}:'
+        for slot, runes in slots.items():
+            res += f'\n  {slot}:'
+            for rune, count in runes.items():
+                res += f'\n    {rune}: {count}'
+
+    res += '\n\n\nMost Popular Secondary Runes:'
+    res += f'\n{'-' * 20}'
+    most_popular_sec_runes = get_most_popular_runes(recommendations.get('Secondary Runes', {}))
+    for section, slots in most_popular_sec_runes.items():
+        res += f'\n{section}:'
+        for slot, runes in slots.items():
+            res += f'\n  {slot}:'
+            for rune, count in runes.items():
+                res += f'\n    {rune}: {count}'
+
+    # Runes from a newer patch than the rune map are shown rather than dropped
+    unknown_runes = recommendations.get('Unknown Runes', {})
+    if unknown_runes:
+        res += '\n\nNot in the rune map:'
+        for rune, count in sorted(unknown_runes.items(), key=lambda item: -item[1]):
+            res += f'\n  {rune}: {count}'
+
+    res += '\n\n\nMost Popular Stats:'
+    res += f'\n{'-' * 20}'
+    stat_sections = recommendations.get('Stats', {})
+    for category, stats in stat_sections.items():
+        res += f'\n{category}:'
+        for stat, count in stats.items():
+            res += f'\n  {stat}: {count}'
+
+    res += '\n\n\nMost Popular Summoner Spells:'
+    res += f'\n{'-' * 20}'
+    res += f'\n{format_counts(recommendations['Summoner Spells'])}'
+
+    return res
@@ -0,0 +1,266 @@
+# Necessary imports
+import os
+import sqlite3
+import threading
+import time
+
+
+
+class Frontier:
+    """
+    Persistent record of the players and matches a crawl has found, in a SQLite database.
+
+    Every PUUID and match ID is inserted once, so a match seen from all ten of its players, or again in a
+    later run, is only queued for download the first time. Players are handed out oldest-crawled first and
+    matches are marked done or failed as they are saved, so a crawl can be stopped and resumed at any point.
+
+    The frontier also keeps running totals of what crawling each ladder tier has yielded (see `add_yields`), which
+    `CrawlPlanner` uses to predict how many new matches another crawl of that tier will find.
+
+    Each player also keeps a watermark, the time up to which their match history has been read, so a re-crawl
+    only asks for newer games (`startTime`). Summoner ID -> PUUID lookups are cached, since PUUIDs never change.
+
+    Example:
+        with Frontier() as frontier:
+            frontier.add_players(puuids, 'NA1')
+            for puuid in frontier.next_players('NA1', 100):
+                new_ids = frontier.add_matches(get_match_history(puuid), 'NA1')
+    """
+
+    pending, done, failed = 0, 1, 2
+    yield_columns = ('players', 'histories', 'requested', 'returned', 'new', 'downloaded', 'valid')
+
+    def __init__(self, path=os.path.join('data', 'frontier.sqlite')):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS players (puuid TEXT PRIMARY KEY, region TEXT NOT NULL, crawled_at REAL NOT NULL DEFAULT 0)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS players_next ON players (region, crawled_at)')
+        if 'watermark' not in [column[1] for column in self._db.execute('PRAGMA table_info(players)')]:
+            # Frontiers created before watermarks were added
+            self._db.execute('ALTER TABLE players ADD COLUMN watermark REAL NOT NULL DEFAULT 0')
+        self._db.execute('CREATE TABLE IF NOT EXISTS summoners (summoner_id TEXT PRIMARY KEY, puuid TEXT NOT NULL)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS matches (match_id TEXT PRIMARY KEY, region TEXT NOT NULL, status INTEGER NOT NULL DEFAULT 0)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS matches_pending ON matches (region, status)')
+        self._db.execute(f'CREATE TABLE IF NOT EXISTS yields (region TEXT NOT NULL, tier TEXT NOT NULL, '
+                         f'{", ".join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in self.yield_columns)}, PRIMARY KEY (region, tier))')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _insert_new(self, table, key, rows):
+        # Inserts the rows whose key is not in the table yet and returns those keys, in order
+        rows = list({row[0]: row for row in rows}.values())
+        with self._lock:
+            self._db.execute('BEGIN')
+            new = []
+            for row in rows:
+                if self._db.execute(f'INSERT OR IGNORE INTO {table} ({key}, region) VALUES (?, ?)', row).rowcount:
+                    new.append(row[0])
+            self._db.execute('COMMIT')
+        return new
+
+    def _update(self, sql, rows):
+        # Runs an update for many rows in one transaction
+        with self._lock:
+            self._db.execute('BEGIN')
+            self._db.executemany(sql, rows)
+            self._db.execute('COMMIT')
+
+    def add_players(self, puuids, region):
+        """
+        Adds players to crawl.
+
+        Args:
+            puuids (iterable): PUUIDs of the players.
+            region (str): Platform region of the players, e.g. 'NA1'.
+
+        Returns:
+            list: The PUUIDs that were not already in the frontier.
+        """
+
+        return self._insert_new('players', 'puuid', ((puuid, region) for puuid in puuids if puuid))
+
+    def add_matches(self, match_ids, region):
+        """
+        Adds matches to download.
+
+        Args:
+            match_ids (iterable): IDs of the matches.
+            region (str): Platform region the matches were found in, e.g. 'NA1'.
+
+        Returns:
+            list: The match IDs that were not already in the frontier, which are now pending.
+        """
+
+        return self._insert_new('matches', 'match_id', ((match_id, region) for match_id in match_ids))
+
+    def next_players(self, region, limit, before=None):
+        """
+        Gets the players of a region that were crawled longest ago, never-crawled players first.
+
+        Args:
+            region (str): Platform region, e.g. 'NA1'.
+            limit (int): Maximum number of players.
+            before (float, optional): Only players last crawled before this Unix time, e.g. the start of the current run. Defaults to any.
+
+        Returns:
+            list: PUUIDs.
+        """
+
+        before = float('inf') if before is None else before
+        with self._lock:
+            rows = self._db.execute('SELECT puuid FROM players WHERE region = ? AND crawled_at < ? ORDER BY crawled_at LIMIT ?',
+                                    (region, before, limit)).fetchall()
+        return [puuid for puuid, in rows]
+
+    def mark_crawled(self, puuids, crawled_at=None, watermark=None):
+        """
+        Records that the match histories of some players were read.
+
+        Args:
+            puuids (iterable): PUUIDs of the players.
+            crawled_at (float, optional): Unix time of the crawl. Defaults to now.
+            watermark (float, optional): Unix time up to which the histories are now known complete. Defaults to `crawled_at`.
+        """
+
+        crawled_at = time.time() if crawled_at is None else crawled_at
+        watermark = crawled_at if watermark is None else watermark
+        self._update('UPDATE players SET crawled_at = ?, watermark = MAX(watermark, ?) WHERE puuid = ?',
+                     ((crawled_at, watermark, puuid) for puuid in puuids))
+
+    def _lookup(self, sql, keys):
+        # Runs `sql` (with an `IN ({})` placeholder) over the keys in chunks, returning the rows as a dict
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                found.update(self._db.execute(sql.format(','.join('?' * len(chunk))), chunk).fetchall())
+        return found
+
+    def watermarks(self, puuids):
+        """
+        Gets the times up to which the match histories of some players have been read.
+
+        Args:
+            puuids (iterable): PUUIDs of the players.
+
+        Returns:
+            dict: PUUID -> Unix time, for players whose history has been read before.
+        """
+
+        return self._lookup('SELECT puuid, watermark FROM players WHERE watermark > 0 AND puuid IN ({})', puuids)
+
+    def add_summoners(self, puuids):
+        """
+        Caches summoner ID -> PUUID lookups.
+
+        Args:
+            puuids (dict): Summoner ID -> PUUID.
+        """
+
+        self._update('INSERT OR IGNORE INTO summoners (summoner_id, puuid) VALUES (?, ?)', puuids.items())
+
+    def summoner_puuids(self, summoner_ids):
+        """
+        Looks up cached PUUIDs (see `add_summoners`).
+
+        Args:
+            summoner_ids (iterable): Encrypted summoner IDs.
+
+        Returns:
+            dict: Summoner ID -> PUUID, for the summoner IDs that are cached.
+        """
+
+        return self._lookup('SELECT summoner_id, puuid FROM summoners WHERE summoner_id IN ({})', summoner_ids)
+
+    def pending_matches(self, region, limit):
+        """
+        Gets matches of a region that still need to be downloaded.
+
+        Args:
+            region (str): Platform region, e.g. 'NA1'.
+            limit (int): Maximum number of matches.
+
+        Returns:
+            list: Match IDs.
+        """
+
+        with self._lock:
+            rows = self._db.execute('SELECT match_id FROM matches WHERE region = ? AND status = ? LIMIT ?', (region, self.pending, limit)).fetchall()
+        return [match_id for match_id, in rows]
+
+    def mark_matches(self, match_ids, status):
+        """
+        Sets the status of some matches.
+
+        Args:
+            match_ids (iterable): IDs of the matches.
+            status (int): `Frontier.pending`, `Frontier.done` or `Frontier.failed`.
+        """
+
+        self._update('UPDATE matches SET status = ? WHERE match_id = ?', ((status, match_id) for match_id in match_ids))
+
+    def add_yields(self, region, tier, **counts):
+        """
+        Adds to the running totals of crawling a ladder tier.
+
+        Args:
+            region (str): Platform region, e.g. 'NA1'.
+            tier (str): Ladder tier, e.g. 'CHALLENGER'.
+            **counts: Amounts to add, out of `yield_columns`: players whose history was read, history requests,
+                match IDs requested and returned, new match IDs among them, matches downloaded, and valid matches among those.
+        """
+
+        unknown = set(counts) - set(self.yield_columns)
+        if unknown:
+            raise ValueError(f'Unknown yield columns: {sorted(unknown)}. Valid options are {list(self.yield_columns)}.')
+        columns = list(counts)
+        self._update(f'INSERT INTO yields (region, tier, {", ".join(columns)}) VALUES (?, ?, {", ".join("?" * len(columns))}) '
+                     f'ON CONFLICT (region, tier) DO UPDATE SET {", ".join(f"{column} = {column} + excluded.{column}" for column in columns)}',
+                     [(region, tier, *counts.values())])
+
+    def yields(self, region):
+        """
+        Gets the running totals of crawling every ladder tier of a region (see `add_yields`).
+
+        Args:
+            region (str): Platform region, e.g. 'NA1'.
+
+        Returns:
+            dict: tier -> dict of `yield_columns` totals.
+        """
+
+        with self._lock:
+            rows = self._db.execute(f'SELECT tier, {", ".join(self.yield_columns)} FROM yields WHERE region = ?', (region,)).fetchall()
+        return {tier: dict(zip(self.yield_columns, totals)) for tier, *totals in rows}
+
+    def counts(self):
+        """
+        Counts the players and matches of every region.
+
+        Returns:
+            dict: region -> {'players', 'crawled_players', 'pending', 'done', 'failed'}.
+        """
+
+        counts = {}
+        with self._lock:
+            for region, players, crawled in self._db.execute('SELECT region, COUNT(*), SUM(crawled_at > 0) FROM players GROUP BY region'):
+                counts.setdefault(region, {'players': 0, 'crawled_players': 0, 'pending': 0, 'done': 0, 'failed': 0})
+                counts[region].update(players=players, crawled_players=crawled or 0)
+            for region, status, number in self._db.execute('SELECT region, status, COUNT(*) FROM matches GROUP BY region, status'):
+                counts.setdefault(region, {'players': 0, 'crawled_players': 0, 'pending': 0, 'done': 0, 'failed': 0})
+                counts[region][{self.pending: 'pending', self.done: 'done', self.failed: 'failed'}[status]] = number
+        return counts
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._db.close()
@@ -1,17 +1,28 @@
 # Necessary imports
 from dotenv import load_dotenv
+import itertools
 import json
 import os
 import numpy as np
 import pandas as pd
 import requests
 import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-import tkinter as tk
-from tkinter import ttk
+from utils import metrics
+from utils.const import match_columns
+from utils.fetch import engine, riot_url, run
+from utils.formatting import display_most_popular
+from utils.gui import create_recommender
+from utils.sections import count_cells, nest_cells, section_index
+from utils.static import StaticData, encode_ids, id_lookup, patch_of
+
+
+# API key is read from the `.env` file, see `1 - Data Scraping and Cleaning.ipynb`
+load_dotenv()
+api_key = os.environ.get('api_key')
+
+# Static data (rune, item, summoner spell names and champion classes) saved per patch under data/static. Set
+# `static_offline=1` in `.env` (or pass --offline to the scripts) to never download it
+static_data = StaticData()
 
 
 
@@ -55,12 +66,11 @@ def get_ranked_players(tier, region='NA1', div_start=1, div_end=4, page_start=1,
 
     # Handle top 3 tiers with different URL
     if tier.lower() in ['challenger', 'grandmaster', 'master']:
-        url = f'https://{region}.api.riotgames.com/lol/league/v4/{tier.lower()}leagues/by-queue/RANKED_SOLO_5x5?api_key={api_key}'
+        url = riot_url(region, f'/lol/league/v4/{tier.lower()}leagues/by-queue/RANKED_SOLO_5x5', api_key)
         try:
             print(f'Retrieving {tier.capitalize()}')
-            response = requests.get(url)
-            response.raise_for_status()             # Check if the request was successful
-            return [entry['summonerId'] for entry in response.json()['entries']]
+            response = engine.get_json(url, 'league-v4.getLeague')
+            return [entry['summonerId'] for entry in response['entries']]
 
         except requests.exceptions.HTTPError as http_err:
             print(f'HTTP error occurred: {http_err}')
@@ -82,17 +92,11 @@ def get_ranked_players(tier, region='NA1', div_start=1, div_end=4, page_start=1,
     for div in divisions:
         # Loop through selected pages
         for page in range(page_start, page_end + 1):
-            url = f'https://{region}.api.riotgames.com/lol/league/v4/entries/RANKED_SOLO_5x5/{tier.upper()}/{div}?page={page}&api_key={api_key}'
+            url = riot_url(region, f'/lol/league/v4/entries/RANKED_SOLO_5x5/{tier.upper()}/{div}?page={page}', api_key)
             try:
                 print(f'Retrieving {tier.capitalize()} {div} page {page}')
-                api_response = requests.get(url)
-                api_response.raise_for_status()     # Check if the request was successful
-                data = api_response.json()
+                data = engine.get_json(url, 'league-v4.getLeagueEntries')     # Waits for the rate limits
                 summoner_ids.extend(entry['summonerId'] for entry in data)
-                
-                # To avoid hitting API limits. Do not run on final loop
-                if not (div == divisions[-1] and page == page_end):
-                    time.sleep(1.25)
 
             except requests.exceptions.HTTPError as http_err:
                 print(f'HTTP error occurred: {http_err}')
@@ -106,6 +110,12 @@ def get_ranked_players(tier, region='NA1', div_start=1, div_end=4, page_start=1,
 
 
 def scrape_opgg():
+    # Selenium is only needed here, so it is not imported with the rest of the module
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+
     # YOU WILL NEED TO SPECIFY YOUR OWN CHROME EXECUTABLE PATH
     chrome_options = Options()
     chrome_options.binary_location = r'C:\Program Files\BraveSoftware\Brave-Browser\Application\brave.exe'
@@ -161,11 +171,9 @@ def get_puuid(summonerId, region='NA1'):
     if summonerId is None:
         raise ValueError('Empty summoner ID.')
 
-    url = f'https://{region}.api.riotgames.com/lol/summoner/v4/summoners/{summonerId}?api_key={api_key}'
+    url = riot_url(region, f'/lol/summoner/v4/summoners/{summonerId}', api_key)
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()['puuid']
+        return engine.get_json(url, 'summoner-v4.getBySummonerId')['puuid']
 
     except requests.exceptions.HTTPError as http_err:
         print(f'HTTP error occurred: {http_err}')
@@ -176,7 +184,7 @@ def get_puuid(summonerId, region='NA1'):
 
 
 
-def get_match_history(puuid, region='americas', start=0, count=20):
+def get_match_history(puuid, region='americas', start=0, count=20, start_time=None):
     """
     Gets the match history of player from their PUUID.
 
@@ -185,6 +193,7 @@ def get_match_history(puuid, region='americas', start=0, count=20):
         region (str, optional): Region. Defaults to 'americas'.
         start (int, optional): Start index of matches. Defaults to 0
         count (int, optional): Number of match IDs to return. Max 100. Defaults to 20.
+        start_time (float, optional): Only matches started after this Unix time, e.g. the last refresh. Defaults to any.
 
     Returns:
         list: match IDs.
@@ -198,12 +207,12 @@ def get_match_history(puuid, region='americas', start=0, count=20):
     if puuid is None:
         raise ValueError('Empty PUUID.')
 
-    url = f'https://{region}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids?start={start}&count={count}&api_key={api_key}'
+    url = riot_url(region, f'/lol/match/v5/matches/by-puuid/{puuid}/ids?start={start}&count={count}', api_key)
+    if start_time is not None:
+        url += f'&startTime={int(start_time)}'
     try:
         print(f'Retrieving last {count} matches for {puuid}')
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return engine.get_json(url, 'match-v5.getMatchIdsByPUUID')
 
     except requests.exceptions.HTTPError as http_err:
         print(f'HTTP error occurred: {http_err}')
@@ -234,11 +243,9 @@ def get_match_details(matchId, region='americas'):
     if matchId is None:
         raise ValueError('Empty matchId.')
 
-    url = f'https://{region}.api.riotgames.com/lol/match/v5/matches/{matchId}?api_key={api_key}'
+    url = riot_url(region, f'/lol/match/v5/matches/{matchId}', api_key)
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return engine.get_json(url, 'match-v5.getMatch')
 
     except requests.exceptions.HTTPError as http_err:
         print(f'HTTP error occurred: {http_err}')
@@ -249,6 +256,101 @@ def get_match_details(matchId, region='americas'):
 
 
 
+def get_puuids(summonerIds, region='NA1', frontier=None):
+    """
+    Gets the PUUIDs of many encrypted summoner IDs concurrently, as fast as the rate limits allow.
+
+    Args:
+        summonerIds (list): Encrypted summoner IDs.
+        region (str, optional): Region. Defaults to 'NA1'.
+        frontier (Frontier, optional): Cache of earlier lookups. Only uncached IDs are requested, and their PUUIDs are added to it. Defaults to None.
+
+    Returns:
+        list: PUUIDs in the same order as `summonerIds`. None for IDs whose request failed.
+    """
+
+    cached = frontier.summoner_puuids(summonerIds) if frontier is not None else {}
+    missing = [summonerId for summonerId in dict.fromkeys(summonerIds) if summonerId not in cached]
+
+    urls = [riot_url(region, f'/lol/summoner/v4/summoners/{summonerId}', api_key) for summonerId in missing]
+    results = run(engine.fetch_all(urls, 'summoner-v4.getBySummonerId'))
+    resolved = {summonerId: result['puuid'] for summonerId, result in zip(missing, results) if not isinstance(result, Exception)}
+    if frontier is not None:
+        frontier.add_summoners(resolved)
+
+    puuids = {**cached, **resolved}
+    return [puuids.get(summonerId) for summonerId in summonerIds]
+
+
+
+def get_match_histories(puuids, region='americas', start=0, count=20, start_time=None):
+    """
+    Gets the match histories of many PUUIDs concurrently, as fast as the rate limits allow.
+
+    Args:
+        puuids (list): PUUIDs of players.
+        region (str, optional): Region. Defaults to 'americas'.
+        start (int, optional): Start index of matches. Defaults to 0
+        count (int, optional): Number of match IDs to return per player. Max 100. Defaults to 20.
+        start_time (float, optional): Only matches started after this Unix time. Defaults to any.
+
+    Returns:
+        list: Lists of match IDs in the same order as `puuids`. Empty for PUUIDs whose request failed.
+    """
+
+    since = '' if start_time is None else f'&startTime={int(start_time)}'
+    urls = [riot_url(region, f'/lol/match/v5/matches/by-puuid/{puuid}/ids?start={start}&count={count}{since}', api_key) for puuid in puuids]
+    results = run(engine.fetch_all(urls, 'match-v5.getMatchIdsByPUUID'))
+    return [[] if isinstance(result, Exception) else result for result in results]
+
+
+
+def get_matches_details(matchIds, region='americas', on_result=None):
+    """
+    Gets the details of many matches concurrently, as fast as the rate limits allow.
+
+    Args:
+        matchIds (list): IDs of the matches.
+        region (str, optional): Region. Defaults to 'americas'.
+        on_result (callable, optional): Called as `on_result(matchId, details)` as each match arrives, e.g. to save it.
+
+    Returns:
+        list: Match details in the same order as `matchIds`. None for matches whose request failed (e.g. purged matches).
+    """
+
+    urls = [riot_url(region, f'/lol/match/v5/matches/{matchId}', api_key) for matchId in matchIds]
+    callback = None
+    if on_result is not None:
+        callback = lambda i, result: None if isinstance(result, Exception) else on_result(matchIds[i], result)
+    results = run(engine.fetch_all(urls, 'match-v5.getMatch', on_result=callback))
+    return [None if isinstance(result, Exception) else result for result in results]
+
+
+
+def save_matches_details(matchIds, store, region='americas'):
+    """
+    Downloads the details of every match not already in the store, saving each one as soon as it arrives.
+    Safe to re-run after a crash or an expired API key: only the missing matches are requested.
+
+    Args:
+        matchIds (list): IDs of the matches.
+        store (MatchStore): Store to save the match details in.
+        region (str, optional): Region. Defaults to 'americas'.
+
+    Returns:
+        list: IDs of the matches whose request failed (e.g. purged matches).
+    """
+
+    missing = store.missing(matchIds)
+    print(f'Retrieving details for {len(missing)} of {len(set(matchIds))} matches.')
+
+    urls = [riot_url(region, f'/lol/match/v5/matches/{matchId}', api_key) for matchId in missing]
+    save = lambda i, result: None if isinstance(result, Exception) else store.put(result)
+    results = run(engine.fetch_all(urls, 'match-v5.getMatch', on_result=save, keep=False))
+    return [matchId for matchId, result in zip(missing, results) if isinstance(result, Exception)]
+
+
+
 def json_extract(obj, key):
     def extract(obj, key):
         values = []
@@ -268,22 +370,21 @@ def json_extract(obj, key):
 
 
 
-def process_match(match_json):
+def match_rows(match_json):
     """
-    Processes the match via its JSON into a pandas DataFrame with the most relevant information.
+    Extracts the most relevant information of every player in a match, one tuple per player.
 
     Args:
         match_json (dict): The JSON of match details.
 
     Returns:
-        pd.DataFrame: A Dataframe containing the relevant match information.
+        list: Tuples of values in the order of `match_columns`.
 
     Raises:
         ValueError: If the match is not a ranked game or the game duration is less than 15 minutes.
     """
 
     info = match_json['info']
-    players = info['participants']
 
     # Filter out non-ranked games and remakes
     if info['queueId'] != 420:
@@ -291,131 +392,223 @@ def process_match(match_json):
     if info['gameDuration'] < 900:
         raise ValueError('Game too short.')
 
-    # Define columns of DataFrame
-    match_data = {
-        'Match ID': [match_json['metadata']['matchId']] * 10,
-        'Game Duration': [info['gameDuration']] * 10,
-        'Game Version': [info['gameVersion']] * 10,
-        'Summoner Name': [player['riotIdGameName'] if 'riotIdGameName' in player else player['riotIdName'] for player in players],
-        'Summoner Tag': [player['riotIdTagline'] for player in players],
-        'Champion ID': [player['championId'] for player in players],
-        'Champion Name': [player['championName'] for player in players],
-        'Champion Level': [player['champLevel'] for player in players],
-        'Team': [player['teamId'] for player in players],
-        'Role': [player['teamPosition'] for player in players],
-        'Kills': [player['kills'] for player in players],
-        'Deaths': [player['challenges']['deathsByEnemyChamps'] for player in players],
-        'Assists': [player['assists'] for player in players],
-        'CS': [player['totalMinionsKilled']for player in players],
-        'CS (Jungle)': [(player['totalAllyJungleMinionsKilled'] + player['totalEnemyJungleMinionsKilled']) for player in players],
-        'First Blood': [player['firstBloodKill'] for player in players],
-        'First Tower': [player['firstTowerKill'] for player in players],
-        'Objective Stolen': [player['objectivesStolen'] for player in players],
-        'Total Gold Earned': [player['goldEarned'] for player in players],
-        'Gold Spent': [player['goldSpent'] for player in players],
-        'Gold/Minute': [player['challenges']['goldPerMinute'] for player in players],
-        'Damage Dealt': [player['totalDamageDealtToChampions'] for player in players],
-        '% of Team\'s Damage': [player['challenges']['teamDamagePercentage'] for player in players],
-        'Damage Taken': [player['totalDamageTaken'] for player in players],
-        'Damage Mitigated': [player['damageSelfMitigated'] for player in players],
-        'Heal and Shielding': [player['challenges']['effectiveHealAndShielding'] for player in players],
-        'CC Time Dealt': [player['totalTimeCCDealt'] for player in players],
-        'Turret Plates Taken': [player['challenges']['turretPlatesTaken'] for player in players],
-        'Turret Takedowns': [player['turretTakedowns'] for player in players],
-        'Vision Score': [player['visionScore'] for player in players],
-        'Rune 1': [player['perks']['styles'][0]['selections'][0]['perk'] for player in players],
-        'Rune 2': [player['perks']['styles'][0]['selections'][1]['perk'] for player in players],
-        'Rune 3': [player['perks']['styles'][0]['selections'][2]['perk'] for player in players],
-        'Rune 4': [player['perks']['styles'][0]['selections'][3]['perk'] for player in players],
-        'Sec Rune 1': [player['perks']['styles'][1]['selections'][0]['perk'] for player in players],
-        'Sec Rune 2': [player['perks']['styles'][1]['selections'][1]['perk'] for player in players],
-        'Stat 1': [player['perks']['statPerks']['offense'] for player in players],
-        'Stat 2': [player['perks']['statPerks']['flex'] for player in players],
-        'Stat 3': [player['perks']['statPerks']['defense'] for player in players],
-        'Summ 1': [player['summoner1Id'] for player in players],
-        'Summ 2': [player['summoner2Id'] for player in players],
-        'Item 1': [player['item0'] for player in players],
-        'Item 2': [player['item1'] for player in players],
-        'Item 3': [player['item2'] for player in players],
-        'Item 4': [player['item3'] for player in players],
-        'Item 5': [player['item4'] for player in players],
-        'Item 6': [player['item5'] for player in players],
-        #'Ward': [player['item6'] for player in players],
-        'Triplekills': [player['tripleKills'] for player in players],
-        'Quadrakills': [player['quadraKills'] for player in players],
-        'Pentakills': [player['pentaKills'] for player in players],
-        'Grubs Taken (Team)': [info['teams'][0]['objectives']['horde']['kills'] if player['teamId'] == 100
-                          else info['teams'][1]['objectives']['horde']['kills'] for player in players],
-        'Heralds Taken (Team)': [info['teams'][0]['objectives']['riftHerald']['kills'] if player['teamId'] == 100
-                            else info['teams'][1]['objectives']['riftHerald']['kills'] for player in players],
-        'Barons Taken (Team)': [info['teams'][0]['objectives']['baron']['kills'] if player['teamId'] == 100
-                           else info['teams'][1]['objectives']['baron']['kills'] for player in players],
-        'Dragons Taken (Team)': [info['teams'][0]['objectives']['dragon']['kills'] if player['teamId'] == 100
-                            else info['teams'][1]['objectives']['dragon']['kills'] for player in players],
-        'Game Ended in Surrender': [player['gameEndedInSurrender'] for player in players],
-        'Win': [player['win'] for player in players]
-    }
+    match_id = match_json['metadata']['matchId']
+    duration = info['gameDuration']
+    version = info['gameVersion']
+    blue_objectives = info['teams'][0]['objectives']
+    red_objectives = info['teams'][1]['objectives']
+
+    rows = []
+    for player in info['participants']:
+        challenges = player['challenges']
+        primary = player['perks']['styles'][0]['selections']
+        secondary = player['perks']['styles'][1]['selections']
+        stats = player['perks']['statPerks']
+        objectives = blue_objectives if player['teamId'] == 100 else red_objectives
+
+        rows.append((
+            match_id, duration, version,
+            player['riotIdGameName'] if 'riotIdGameName' in player else player['riotIdName'], player['riotIdTagline'],
+            player['championId'], player['championName'], player['champLevel'], player['teamId'], player['teamPosition'],
+            player['kills'], challenges['deathsByEnemyChamps'], player['assists'], player['totalMinionsKilled'],
+            player['totalAllyJungleMinionsKilled'] + player['totalEnemyJungleMinionsKilled'],
+            player['firstBloodKill'], player['firstTowerKill'], player['objectivesStolen'],
+            player['goldEarned'], player['goldSpent'], challenges['goldPerMinute'],
+            player['totalDamageDealtToChampions'], challenges['teamDamagePercentage'], player['totalDamageTaken'], player['damageSelfMitigated'],
+            challenges['effectiveHealAndShielding'], player['totalTimeCCDealt'], challenges['turretPlatesTaken'], player['turretTakedowns'],
+            player['visionScore'],
+            primary[0]['perk'], primary[1]['perk'], primary[2]['perk'], primary[3]['perk'], secondary[0]['perk'], secondary[1]['perk'],
+            stats['offense'], stats['flex'], stats['defense'],
+            player['summoner1Id'], player['summoner2Id'],
+            player['item0'], player['item1'], player['item2'], player['item3'], player['item4'], player['item5'],
+            player['tripleKills'], player['quadraKills'], player['pentaKills'],
+            objectives['horde']['kills'], objectives['riftHerald']['kills'], objectives['baron']['kills'], objectives['dragon']['kills'],
+            player['gameEndedInSurrender'], player['win']
+        ))
+
+    return rows
+
+
+
+def process_match(match_json):
+    """
+    Processes the match via its JSON into a pandas DataFrame with the most relevant information.
+
+    Args:
+        match_json (dict): The JSON of match details.
+
+    Returns:
+        pd.DataFrame: A Dataframe containing the relevant match information.
+
+    Raises:
+        ValueError: If the match is not a ranked game or the game duration is less than 15 minutes.
+    """
+
+    start = time.perf_counter()
+    df = pd.DataFrame(match_rows(match_json), columns=list(match_columns))
+    metrics.record_rows('process_match', len(df), time.perf_counter() - start)
+    return df
 
-    match_df = pd.DataFrame(match_data)
 
-    return match_df
 
+def process_matches(matches, as_arrow=False, block_size=1024):
+    """
+    Processes many matches at once into a single table with the most relevant information.
+
+    Rows are extracted a block of matches at a time and copied column by column into preallocated
+    typed buffers (see `match_columns`), so the cost is linear in the number of matches and only one
+    DataFrame is built at the end.
 
+    Args:
+        matches (iterable): JSONs of match details, e.g. from `utils.store.iter_matches`.
+        as_arrow (bool, optional): Return a `pyarrow.Table` instead of a DataFrame. Defaults to False.
+        block_size (int, optional): Number of matches extracted before copying into the buffers. Defaults to 1024.
+
+    Returns:
+        tuple: The table (pd.DataFrame or pyarrow.Table) and a dict counting the skipped matches by reason.
+    """
 
-def name_replace(df):
-    # Lists of rune, summoner spell, and item IDs and names
-    runes = 'https://raw.communitydragon.org/latest/plugins/rcp-be-lol-game-data/global/default/v1/perks.json'
-    summs = 'https://raw.communitydragon.org/latest/plugins/rcp-be-lol-game-data/global/default/v1/summoner-spells.json'
-    items = 'https://raw.communitydragon.org/latest/plugins/rcp-be-lol-game-data/global/default/v1/items.json'
+    start = time.perf_counter()
+    names = list(match_columns)
+    dtypes = [object if dtype == 'str' else np.dtype(dtype) for dtype in match_columns.values()]
+    capacity = 10 * len(matches) if hasattr(matches, '__len__') else 10 * block_size
+    buffers = [np.empty(capacity, dtype) for dtype in dtypes]
+    num_rows = 0
+    skipped = {'Not a ranked game.': 0, 'Game too short.': 0}
+
+    def flush(block):
+        nonlocal buffers, capacity, num_rows
+        if num_rows + len(block) > capacity:
+            capacity = max(2 * capacity, num_rows + len(block))
+            buffers = [np.concatenate([buffer[:num_rows], np.empty(capacity - num_rows, buffer.dtype)]) for buffer in buffers]
+        for buffer, values in zip(buffers, zip(*block)):
+            buffer[num_rows:num_rows + len(block)] = values
+        num_rows += len(block)
+
+    block = []
+    num_block_matches = 0
+    for match_json in matches:
+        try:
+            block.extend(match_rows(match_json))
+        except ValueError as e:
+            skipped[str(e)] += 1
+            continue
+        num_block_matches += 1
+        if num_block_matches == block_size:
+            flush(block)
+            block = []
+            num_block_matches = 0
+    if block:
+        flush(block)
+
+    columns = {name: buffer[:num_rows] for name, buffer in zip(names, buffers)}
+    metrics.record_rows('process_matches', num_rows, time.perf_counter() - start)
+    if as_arrow:
+        import pyarrow as pa
+        return pa.table(columns), skipped
+    return pd.DataFrame(columns, copy=False), skipped
+
+
+
+def process_match_batches(matches, batch_size=1000, skipped=None):
+    """
+    Processes a stream of matches into DataFrames of at most `batch_size` matches each,
+    so memory stays flat no matter how many matches there are.
 
-    # Getting the JSON data
-    runes_json = requests.get(runes).json()
-    summs_json = requests.get(summs).json()
-    items_json = requests.get(items).json()
+    Args:
+        matches (iterable): JSONs of match details, e.g. from `utils.store.iter_matches`.
+        batch_size (int, optional): Maximum number of matches per DataFrame. Defaults to 1000.
+        skipped (dict, optional): Updated in place with the number of skipped matches by reason.
 
-    # Extracting the IDs and names
-    runes_id = json_extract(runes_json, 'id')
-    runes_name = json_extract(runes_json, 'name')
-    summs_id = json_extract(summs_json, 'id')
-    summs_name = json_extract(summs_json, 'name')
-    items_id = json_extract(items_json, 'id')
-    items_name = json_extract(items_json, 'name')
+    Yields:
+        pd.DataFrame: The relevant match information of up to `batch_size` matches.
+    """
 
-    # Create dictionaries of IDs and names
-    runes_dict = dict(map(lambda i, j: (i, j), runes_id, runes_name))
-    summs_dict = dict(map(lambda i, j: (i, j), summs_id, summs_name))
-    items_dict = dict(map(lambda i, j: (int(i), j), items_id, items_name))
-    teams_dict = {100: 'Blue', 200: 'Red'}
+    matches = iter(matches)
+    while True:
+        batch = list(itertools.islice(matches, batch_size))
+        if not batch:
+            return
 
-    # Replace IDs with names in the DataFrame
+        batch_df, batch_skipped = process_matches(batch)
+        if skipped is not None:
+            for reason, count in batch_skipped.items():
+                skipped[reason] = skipped.get(reason, 0) + count
+        if len(batch_df):
+            yield batch_df
+
+
+
+def save_matches_data(matches, path=os.path.join('data', 'matches_data.csv'), batch_size=1000):
+    """
+    Processes a stream of matches and writes them to a CSV one batch at a time.
+
+    Args:
+        matches (iterable): JSONs of match details, e.g. from `utils.store.iter_matches`.
+        path (str, optional): CSV to write. Defaults to 'data/matches_data.csv'.
+        batch_size (int, optional): Maximum number of matches held in memory at once. Defaults to 1000.
+
+    Returns:
+        int: Number of rows written.
+    """
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    num_rows = 0
+    skipped = {}
+    for i, batch_df in enumerate(process_match_batches(matches, batch_size, skipped)):
+        batch_df.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        num_rows += len(batch_df)
+
+    print(f'Wrote {num_rows} rows. Skipped: {skipped}')
+    return num_rows
+
+
+
+def name_replace(df, static=None):
+    """
+    Replaces rune, stat shard, summoner spell, item and team IDs with their names, as categoricals.
+    Each row is named with the static data of its own patch when the `Game Version` column is present.
+
+    Args:
+        df (pd.DataFrame): Match data with integer ID columns.
+        static (StaticData, optional): Static data store. Defaults to the shared `static_data`.
+
+    Returns:
+        pd.DataFrame: The same DataFrame with names instead of IDs.
+    """
+
+    static = static or static_data
+
+    # Dense ID -> name lookups of every patch in the data
+    if 'Game Version' in df.columns:
+        patches = df['Game Version'].map(patch_of).to_numpy(dtype=object)
+        lookups = {patch: static.lookups(patch) for patch in pd.unique(patches)}
+    else:
+        patches = None
+        lookups = {None: static.lookups('latest')}
+    teams_lookup = id_lookup([100, 200], ['Blue', 'Red'])
+
+    # Replace IDs with names in the DataFrame, as categoricals sharing one set of names per kind of ID
     rune_columns = ['Rune 1', 'Rune 2', 'Rune 3', 'Rune 4', 'Sec Rune 1', 'Sec Rune 2', 'Stat 1', 'Stat 2', 'Stat 3']
     summ_columns = ['Summ 1', 'Summ 2']
     item_columns = ['Item 1', 'Item 2', 'Item 3', 'Item 4', 'Item 5', 'Item 6']
-    df[rune_columns] = df[rune_columns].replace(runes_dict)
-    df[summ_columns] = df[summ_columns].replace(summs_dict)
-    df[item_columns] = df[item_columns].replace(items_dict)
-    df['Team'] = df['Team'].replace(teams_dict)
+    encode_ids(df, rune_columns, {patch: lookup['runes'] for patch, lookup in lookups.items()}, patches)
+    encode_ids(df, summ_columns, {patch: lookup['summoner_spells'] for patch, lookup in lookups.items()}, patches)
+    encode_ids(df, item_columns, {patch: lookup['items'] for patch, lookup in lookups.items()}, patches)
+    if 'Team' in df.columns:
+        encode_ids(df, ['Team'], teams_lookup)
 
     return df
 
 
 
 def classify_champions(version):
-    # Fetch champion data from Riot's Data Dragon
-    champion_url = f'https://ddragon.leagueoflegends.com/cdn/{version}/data/en_US/champion.json'
-    response = requests.get(champion_url)
-
-    if response.status_code != 200:
-        raise Exception(f'Failed to fetch champion data: {response.status_code}')
-
-    champion_data = response.json()
     champion_classes = {}
 
-    for champ_name, champ_info in champion_data.get('data', {}).items():
-        classes = champ_info.get('tags', [])      # Champion class (Mage, Support, Tank, etc.)
-
+    # Champion classes from Riot's Data Dragon, downloaded once per patch
+    for champ_name, classes in static_data.champion_classes(patch_of(version)).items():
         champion_classes[champ_name] = {
-            'classes': classes
+            'classes': classes      # Champion class (Mage, Support, Tank, etc.)
         }
 
     return champion_classes
@@ -423,8 +616,15 @@ def classify_champions(version):
 
 
 def filter_items(df, item_columns, finished_items):
+    finished = set(finished_items)
     for col in item_columns:
-        df[col] = df[col].apply(lambda x: x if x in finished_items else np.nan)
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Boolean lookup table by category code. The extra False at the end is hit by code -1 (NaN)
+            keep = np.array([category in finished for category in df[col].cat.categories] + [False])
+            codes = df[col].cat.codes.to_numpy()
+            df[col] = pd.Categorical.from_codes(np.where(keep[codes], codes, -1), dtype=df[col].dtype)
+        else:
+            df[col] = df[col].where(df[col].isin(finished))
     return df
 
 
@@ -435,17 +635,23 @@ def filter_columns(df, columns_to_keep):
 
 
 def champ_name_upper(df):
-    df['Champion Name'] = df['Champion Name'].str.upper()
+    df['Champion Name'] = df['Champion Name'].astype('category').cat.rename_categories(str.upper)
     return df
 
 
 
-def prep_for_rec(df, item_columns, finished_items, columns_to_keep):
-    df_copy = df.copy()
-    df_copy = name_replace(df_copy)
+def prep_for_rec(df, item_columns, finished_items, columns_to_keep, static=None):
+    start = time.perf_counter()
+
+    # Only copy the columns that are kept, plus the game version to name each row with its own patch
+    version_column = ['Game Version'] if 'Game Version' in df.columns and 'Game Version' not in columns_to_keep else []
+    df_copy = filter_columns(df, columns_to_keep + version_column).copy()
+    df_copy = name_replace(df_copy, static)
     df_copy = filter_items(df_copy, item_columns, finished_items)
     df_copy = filter_columns(df_copy, columns_to_keep)
     df_copy = champ_name_upper(df_copy)
+    df_copy['Role'] = df_copy['Role'].astype('category')
+    metrics.record_rows('prep_for_rec', len(df_copy), time.perf_counter() - start)
     return df_copy
 
 
@@ -453,55 +659,60 @@ def prep_for_rec(df, item_columns, finished_items, columns_to_keep):
 def aggregate_frequencies(df, column_list):
     combined_series = pd.concat([df[col] for col in column_list], ignore_index=True)
     frequencies = combined_series.dropna().value_counts()       # Drop NaN values before counting
-    return frequencies
+    return frequencies[frequencies > 0]                         # Categoricals also count unused categories
 
 
 
-def aggregate_runes(df, primary_rune_columns, secondary_rune_columns, rune_section_map, sec_rune_section_map):
-    # Initialize dictionaries to store rune counts
-    rune_sections = {section: {slot: {rune: 0 for rune in runes} for slot, runes in slots.items()}
-                     for section, slots in rune_section_map.items()}
-    sec_rune_sections = {section: {slot: {rune: 0 for rune in runes} for slot, runes in slots.items()}
-                         for section, slots in sec_rune_section_map.items()}
+def aggregate_runes(df, primary_rune_columns, secondary_rune_columns, rune_section_map, sec_rune_section_map, return_unknown=False):
+    """
+    Counts the primary and secondary runes into the shape of the rune section maps.
 
-    # Count primary runes
-    for column, slot in zip(primary_rune_columns, ['Keystone', 'Slot 1', 'Slot 2', 'Slot 3']):
-        rune_counts = df[column].value_counts()
+    Args:
+        df (pd.DataFrame): Prepped match data.
+        primary_rune_columns (list): Columns of the keystone and the three primary slots, in that order.
+        secondary_rune_columns (list): Columns of the secondary runes.
+        rune_section_map (dict): Runes of each tree and slot.
+        sec_rune_section_map (dict): Secondary runes of each tree and slot.
+        return_unknown (bool, optional): Also return a dict counting the runes that are in neither map (e.g. added in a new patch). Defaults to False.
 
-        for rune, count in rune_counts.items():
-            for section, slots in rune_section_map.items():
-                if rune in rune_sections[section][slot]:
-                    rune_sections[section][slot][rune] += count
-    
-    # Combine counts from Sec Rune 1 and Sec Rune 2 for secondary runes
-    combined_sec_runes = pd.concat([df['Sec Rune 1'], df['Sec Rune 2']])
-    combined_sec_rune_counts = combined_sec_runes.value_counts()
-
-    # Count secondary runes (excluding keystones) using combined counts
-    for rune, count in combined_sec_rune_counts.items():
-        for section, slots in sec_rune_section_map.items():
-            for slot, runes in slots.items():
-                if rune in runes:
-                    sec_rune_sections[section][slot][rune] += count
-    
-    return rune_sections, sec_rune_sections
+    Returns:
+        tuple: Primary and secondary counts as {section: {slot: {rune: count}}}, followed by the unknown rune counts if `return_unknown`.
+    """
+
+    # Primary runes are looked up in the slot of their column, secondary runes in any slot
+    rune_paths, rune_lookup = section_index(rune_section_map, group_level=1)
+    rune_counts, unknown = count_cells(df, primary_rune_columns, (rune_paths, rune_lookup), ['Keystone', 'Slot 1', 'Slot 2', 'Slot 3'])
+    sec_rune_paths, sec_rune_lookup = section_index(sec_rune_section_map)
+    sec_rune_counts, sec_unknown = count_cells(df, secondary_rune_columns, (sec_rune_paths, sec_rune_lookup))
+
+    if not return_unknown:
+        return nest_cells(rune_paths, rune_counts), nest_cells(sec_rune_paths, sec_rune_counts)
+
+    for rune, count in sec_unknown.items():
+        unknown[rune] = unknown.get(rune, 0) + count
+    return nest_cells(rune_paths, rune_counts), nest_cells(sec_rune_paths, sec_rune_counts), unknown
 
 
 
 def aggregate_stats(df, stat_section_map):
-    stat_sections = {category: {stat: 0 for stat in stats} for category, stats in stat_section_map.items()}
+    """
+    Counts the stat shards into the shape of the stat section map.
 
-    for stat_column, category in zip(['Stat 1', 'Stat 2', 'Stat 3'], ['Offense', 'Flex', 'Defense']):
-        stat_counts = df[stat_column].value_counts()
+    Args:
+        df (pd.DataFrame): Prepped match data.
+        stat_section_map (dict): Stat shards of each category.
 
-        for stat, count in stat_counts.items():
-            if stat in stat_sections[category]:
-                stat_sections[category][stat] += count
-    
-    return stat_sections
+    Returns:
+        dict: Counts as {category: {stat: count}}.
+    """
+
+    stat_paths, stat_lookup = section_index(stat_section_map, group_level=0)
+    stat_counts, _ = count_cells(df, ['Stat 1', 'Stat 2', 'Stat 3'], (stat_paths, stat_lookup), ['Offense', 'Flex', 'Defense'])
+    return nest_cells(stat_paths, stat_counts)
 
 
 
+@metrics.timed('query_seconds', path='dataframe')
 def recommend_based_on_champion(df, champion_name, role, rune_section_map, sec_rune_section_map, stat_section_map):
     # Filter data by role and champion
     df_filtered = df[(df['Champion Name'] == champion_name) & (df['Role'] == role)]
@@ -517,7 +728,7 @@ def recommend_based_on_champion(df, champion_name, role, rune_section_map, sec_r
     
     # Aggregating different data types
     item_frequencies = aggregate_frequencies(df_filtered, item_columns)
-    rune_frequencies, sec_rune_frequencies = aggregate_runes(df_filtered, rune_columns, sec_rune_columns, rune_section_map, sec_rune_section_map)
+    rune_frequencies, sec_rune_frequencies, unknown_runes = aggregate_runes(df_filtered, rune_columns, sec_rune_columns, rune_section_map, sec_rune_section_map, return_unknown=True)
     stat_frequencies = aggregate_stats(df_filtered, stat_section_map)
     summoner_spell_frequencies = aggregate_frequencies(df_filtered, summoner_spell_columns)
     
@@ -526,124 +737,6 @@ def recommend_based_on_champion(df, champion_name, role, rune_section_map, sec_r
         'Runes': rune_frequencies,
         'Secondary Runes': sec_rune_frequencies,
         'Stats': stat_frequencies,
-        'Summoner Spells': summoner_spell_frequencies
+        'Summoner Spells': summoner_spell_frequencies,
+        'Unknown Runes': unknown_runes
     }
-
-
-
-def display_most_popular(recommendations, num_items=10):
-
-    if type(recommendations) == str:
-        return recommendations
-
-    def get_most_popular_runes(rune_sections):
-        most_popular = {}
-        max_count = 0
-        for section, slots in rune_sections.items():
-            section_count = sum(max(runes.values()) for slot, runes in slots.items())
-            if section_count > max_count:
-                max_count = section_count
-                most_popular = {section: slots}
-        return most_popular
-
-    res = ''
-
-    res += 'Most Popular Items:'
-    res += f'\n{'-' * 20}'
-    res += f'\n{recommendations['Items'].head(num_items).to_string()}'
-
-    res += '\n\n\nMost Popular Runes:'
-    res += f'\n{'-' * 20}'
-    most_popular_runes = get_most_popular_runes(recommendations.get('Runes', {}))
-    for section, slots in most_popular_runes.items():
-        res += f'\n{section}:'
-        for slot, runes in slots.items():
-            res += f'\n  {slot}:'
-            for rune, count in runes.items():
-                res += f'\n    {rune}: {count}'
-
-    res += '\n\n\nMost Popular Secondary Runes:'
-    res += f'\n{'-' * 20}'
-    most_popular_sec_runes = get_most_popular_runes(recommendations.get('Secondary Runes', {}))
-    for section, slots in most_popular_sec_runes.items():
-        res += f'\n{section}:'
-        for slot, runes in slots.items():
-            res += f'\n  {slot}:'
-            for rune, count in runes.items():
-                res += f'\n    {rune}: {count}'
-
-    res += '\n\n\nMost Popular Stats:'
-    res += f'\n{'-' * 20}'
-    stat_sections = recommendations.get('Stats', {})
-    for category, stats in stat_sections.items():
-        res += f'\n{category}:'
-        for stat, count in stats.items():
-            res += f'\n  {stat}: {count}'
-
-    res += '\n\n\nMost Popular Summoner Spells:'
-    res += f'\n{'-' * 20}'
-    res += f'\n{recommendations['Summoner Spells'].to_string()}'
-
-    return res
-
-
-
-def create_recommender(df, champion_names, roles, rune_section_map, sec_rune_section_map, stat_section_map, num_items=10):
-    def on_button_click(event=None):
-        champion = champion_combobox.get().upper()
-        role = role_combobox.get().upper()
-        recommendations = recommend_based_on_champion(df, champion, role, rune_section_map, sec_rune_section_map, stat_section_map)
-        result = display_most_popular(recommendations, num_items)
-        text_window.delete(1.0, tk.END)     # Clear previous text
-        text_window.insert(tk.END, result)
-
-    # Create the main window
-    root = tk.Tk()
-    root.title('Build Recommendation')
-
-    # Create and place the Champion Name dropdown
-    champion_label = tk.Label(root, text='Champion Name:')
-    champion_label.grid(row=0, column=0, padx=10, pady=10, sticky='e')
-
-    champion_combobox = ttk.Combobox(root, values=champion_names)
-    champion_combobox.grid(row=0, column=1, padx=10, pady=10, sticky='w')
-
-    # Create and place the Role dropdown
-    role_label = tk.Label(root, text='Role:')
-    role_label.grid(row=1, column=0, padx=10, pady=10, sticky='e')
-
-    role_combobox = ttk.Combobox(root, values=roles)
-    role_combobox.grid(row=1, column=1, padx=10, pady=10, sticky='w')
-    role_combobox.set(roles[0])
-
-    # Create and place the button
-    recommendations_button = tk.Button(root, text='Get Recommendations', command=on_button_click)
-    recommendations_button.grid(row=2, column=0, columnspan=2, padx=10, pady=10)
-
-    # Bind Enter key to the button click event
-    root.bind('<Return>', on_button_click)
-
-    # Escape to close application
-    root.bind('<Escape>', lambda event: root.destroy())
-
-    # Create a frame to hold the text window and scrollbar
-    text_frame = tk.Frame(root)
-    text_frame.grid(row=3, column=0, columnspan=2, padx=10, pady=10)
-
-    # Create and place the text window
-    text_window = tk.Text(text_frame, wrap=tk.WORD, height=50, width=50)
-    text_window.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-    # Create and place the scrollbar
-    scrollbar = tk.Scrollbar(text_frame, command=text_window.yview)
-    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-    # Configure the text window to use the scrollbar
-    text_window.config(yscrollcommand=scrollbar.set)
-
-    # Focus the main window
-    root.after(50, root.focus_force())
-    root.after(50, lambda: champion_combobox.focus_set())
-
-    # Run the application
-    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,266 @@
+# Necessary imports
+import bisect
+import difflib
+import itertools
+import queue
+import re
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+from utils.formatting import display_most_popular
+
+
+
+class ChampionSearch:
+    """
+    Prefix and fuzzy search over champion names, fast enough to run on every keystroke.
+
+    Names are matched ignoring case, spaces and punctuation, so 'kais' finds "KAI'SA". Results are ranked:
+        1. Names starting with the query, found by bisecting the sorted names.
+        2. Names with a later word starting with the query ('mundo' -> 'DR. MUNDO').
+        3. Names containing the query's letters in order ('tf' -> 'TWISTED FATE'). While the user keeps
+           typing, only the previous query's matches are scanned again.
+        4. Close spellings, for typos ('yasou' -> 'YASUO').
+
+    Example:
+        search = ChampionSearch(champion_names)
+        search.search('tw')                             # ['TWISTED FATE', 'TWITCH', ...]
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self._keys = sorted((self.normalize(name), name) for name in self.names)
+        self._words = sorted((self.normalize(word), name) for name in self.names for word in re.split(r'[\s.\'&]+', name)[1:] if word)
+        self._last = ('', self._keys)     # query and the names containing its letters in order
+
+    @staticmethod
+    def normalize(text):
+        return re.sub(r'[^0-9A-Z]', '', text.upper())
+
+    @staticmethod
+    def _prefixed(pairs, query):
+        start = bisect.bisect_left(pairs, (query,))
+        end = bisect.bisect_left(pairs, (query + '\x7f',))
+        return [name for _, name in pairs[start:end]]
+
+    def _in_order(self, query):
+        # Reuse the last query's matches when the user has only typed more letters
+        last_query, last_matches = self._last
+        candidates = last_matches if query.startswith(last_query) else self._keys
+        pattern = re.compile('.*?'.join(map(re.escape, query)))
+        matches = [(key, name) for key, name in candidates if pattern.search(key)]
+        self._last = (query, matches)
+        return [name for _, name in matches]
+
+    def search(self, query, limit=None):
+        """
+        Finds the champion names matching what the user typed.
+
+        Args:
+            query (str): Text typed so far.
+            limit (int, optional): Maximum number of names. Defaults to all matches.
+
+        Returns:
+            list: Matching names, best first. Every name for an empty query.
+        """
+
+        query = self.normalize(query)
+        if not query:
+            return self.names[:limit]
+
+        ranked = self._prefixed(self._keys, query) + self._prefixed(self._words, query) + self._in_order(query)
+        if len(ranked) < (limit or 5):
+            keys = {key: name for key, name in self._keys}
+            ranked += [keys[key] for key in difflib.get_close_matches(query, keys, n=limit or 5, cutoff=0.6)]
+        return list(dict.fromkeys(ranked))[:limit]
+
+
+
+class QueryWorker:
+    """
+    Runs recommendation queries on a background thread so the Tk window never freezes.
+
+    Only the latest request is shown: requests still queued when a newer one arrives are skipped, and
+    results of older requests that were already running are dropped. Results are handed back to the
+    Tk main loop by polling a queue with `root.after`, since Tk may only be touched from its own thread.
+    Finished results are kept in a small LRU cache, and `prefetch` fills it ahead of time at a lower
+    priority than user requests.
+    """
+
+    def __init__(self, root, compute, cache_size=64, poll_ms=20):
+        self.root = root
+        self.compute = compute
+        self.cache_size = cache_size
+        self.poll_ms = poll_ms
+        self._jobs = queue.PriorityQueue()      # (priority, order, generation, key, callback)
+        self._results = queue.Queue()           # (generation, callback, result)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._order = itertools.count()
+        self._generation = 0
+        threading.Thread(target=self._run, daemon=True).start()
+        root.after(poll_ms, self._poll)
+
+    def _cached(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def request(self, key, callback):
+        """
+        Computes `key` for display, replacing any request still in progress.
+
+        Args:
+            key (tuple): Arguments of `compute`, e.g. (champion, role).
+            callback (callable): Called on the Tk thread with the result.
+        """
+
+        self._generation += 1
+        result = self._cached(key)
+        if result is not None:
+            callback(result)
+            return
+        self._jobs.put((0, next(self._order), self._generation, key, callback))
+
+    def prefetch(self, keys):
+        """
+        Computes results in the background, after any waiting requests, so they are cached when asked for.
+
+        Args:
+            keys (iterable): Arguments of `compute` to prepare.
+        """
+
+        for key in keys:
+            if self._cached(key) is None:
+                self._jobs.put((1, next(self._order), None, key, None))
+
+    def _run(self):
+        while True:
+            _, _, generation, key, callback = self._jobs.get()
+            if callback is not None and generation != self._generation:
+                continue                        # A newer request replaced this one before it started
+            result = self._cached(key)
+            if result is None:
+                try:
+                    result = self.compute(*key)
+                except Exception as err:
+                    result = f'Error: {err}'
+                with self._lock:
+                    self._cache[key] = result
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+            if callback is not None:
+                self._results.put((generation, callback, result))
+
+    def _poll(self):
+        try:
+            while True:
+                generation, callback, result = self._results.get_nowait()
+                if generation == self._generation:
+                    callback(result)
+        except queue.Empty:
+            pass
+        self.root.after(self.poll_ms, self._poll)
+
+
+
+def create_recommender(df, champion_names, roles, rune_section_map, sec_rune_section_map, stat_section_map, num_items=10, cube=None):
+    def compute(champion, role):
+        # Runs on the worker thread
+        if cube is not None:
+            recommendations = cube.recommend(champion, role, rune_section_map, sec_rune_section_map, stat_section_map, as_series=False)
+        else:
+            from utils.func import recommend_based_on_champion
+            recommendations = recommend_based_on_champion(df, champion, role, rune_section_map, sec_rune_section_map, stat_section_map)
+        return display_most_popular(recommendations, num_items)
+
+    def likely_roles(champion):
+        # Roles the champion has data for, most played first
+        if cube is None:
+            return list(roles)
+        played = [role for role in roles if (champion, role) in games]
+        return sorted(played, key=lambda role: -games[(champion, role)])
+
+    def show(result):
+        text_window.delete(1.0, tk.END)     # Clear previous text
+        text_window.insert(tk.END, result)
+
+    def on_button_click(event=None):
+        champion = champion_combobox.get().upper()
+        if champion and champion not in search.names:
+            # Take the best match for a partly typed or misspelled name
+            matches = search.search(champion, limit=1)
+            if matches:
+                champion = matches[0]
+                champion_combobox.set(champion)
+        role = role_combobox.get().upper()
+        worker.request((champion, role), show)
+        worker.prefetch((champion, other) for other in likely_roles(champion) if other != role)
+
+    def on_type(event=None):
+        if event is not None and event.keysym in ('Return', 'Escape', 'Up', 'Down'):
+            return
+        matches = search.search(champion_combobox.get())
+        champion_combobox['values'] = matches
+        if 0 < len(matches) <= 3:
+            worker.prefetch((matches[0], role) for role in likely_roles(matches[0])[:1] + [role_combobox.get().upper()])
+
+    # Create the main window
+    root = tk.Tk()
+    root.title('Build Recommendation')
+    search = ChampionSearch(champion_names)
+    worker = QueryWorker(root, compute)
+    games = dict(zip(cube.keys, cube.games.tolist())) if cube is not None else {}
+
+    # Create and place the Champion Name dropdown
+    champion_label = tk.Label(root, text='Champion Name:')
+    champion_label.grid(row=0, column=0, padx=10, pady=10, sticky='e')
+
+    champion_combobox = ttk.Combobox(root, values=champion_names)
+    champion_combobox.grid(row=0, column=1, padx=10, pady=10, sticky='w')
+    champion_combobox.bind('<KeyRelease>', on_type)
+    champion_combobox.bind('<<ComboboxSelected>>', on_button_click)
+
+    # Create and place the Role dropdown
+    role_label = tk.Label(root, text='Role:')
+    role_label.grid(row=1, column=0, padx=10, pady=10, sticky='e')
+
+    role_combobox = ttk.Combobox(root, values=roles)
+    role_combobox.grid(row=1, column=1, padx=10, pady=10, sticky='w')
+    role_combobox.set(roles[0])
+    role_combobox.bind('<<ComboboxSelected>>', on_button_click)
+
+    # Create and place the button
+    recommendations_button = tk.Button(root, text='Get Recommendations', command=on_button_click)
+    recommendations_button.grid(row=2, column=0, columnspan=2, padx=10, pady=10)
+
+    # Bind Enter key to the button click event
+    root.bind('<Return>', on_button_click)
+
+    # Escape to close application
+    root.bind('<Escape>', lambda event: root.destroy())
+
+    # Create a frame to hold the text window and scrollbar
+    text_frame = tk.Frame(root)
+    text_frame.grid(row=3, column=0, columnspan=2, padx=10, pady=10)
+
+    # Create and place the text window
+    text_window = tk.Text(text_frame, wrap=tk.WORD, height=50, width=50)
+    text_window.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    # Create and place the scrollbar
+    scrollbar = tk.Scrollbar(text_frame, command=text_window.yview)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    # Configure the text window to use the scrollbar
+    text_window.config(yscrollcommand=scrollbar.set)
+
+    # Focus the main window
+    root.after(50, root.focus_force())
+    root.after(50, lambda: champion_combobox.focus_set())
+
+    # Run the application
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,107 @@
+# Necessary imports
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils.func import process_matches
+from utils.store import MatchStore
+
+
+
+def ingest_shard(store_path, shard, out_path):
+    """
+    Parses and flattens one shard of a `MatchStore` and writes it to a Parquet dataset
+    partitioned by patch and region.
+
+    Args:
+        store_path (str): Directory of the match store.
+        shard (int): Shard number to ingest.
+        out_path (str): Root directory of the Parquet dataset.
+
+    Returns:
+        tuple: Number of rows written and a dict counting the skipped matches by reason.
+    """
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    with MatchStore(store_path) as store:
+        table, skipped = process_matches(store.iter_matches(shards=[shard]), as_arrow=True)
+    if table.num_rows == 0:
+        return 0, skipped
+
+    # Patch is the first two parts of the game version (14.17.615.7524 -> 14.17), region the match ID prefix (NA1_...)
+    patch = pc.binary_join_element_wise(*[pc.list_element(pc.split_pattern(table['Game Version'], '.'), i) for i in range(2)], '.')
+    region = pc.list_element(pc.split_pattern(table['Match ID'], '_'), 0)
+    table = table.append_column('Patch', patch).append_column('Region', region)
+
+    pq.write_to_dataset(table, out_path, partition_cols=['Patch', 'Region'],
+                        basename_template=f'shard-{shard:04d}-{{i}}.parquet', existing_data_behavior='overwrite_or_ignore')
+    return table.num_rows, skipped
+
+
+
+def ingest_store(store_path=os.path.join('data', 'matches_raw'), out_path=os.path.join('data', 'matches_parquet'), workers=None):
+    """
+    Ingests every shard of a `MatchStore` into a Parquet dataset partitioned by patch and region,
+    spreading the shards across a pool of processes. Replaces any existing dataset at `out_path`.
+
+    Args:
+        store_path (str, optional): Directory of the match store. Defaults to 'data/matches_raw'.
+        out_path (str, optional): Root directory of the Parquet dataset. Defaults to 'data/matches_parquet'.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        dict: Number of 'rows' written, 'skipped' matches by reason, and 'seconds' taken.
+    """
+
+    start = time.perf_counter()
+    with MatchStore(store_path) as store:
+        shards = sorted(set(store.shard_of(match_id) for match_id in store.ids()))
+
+    if os.path.exists(out_path):
+        shutil.rmtree(out_path)
+    os.makedirs(out_path)
+
+    num_rows = 0
+    skipped = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(ingest_shard, store_path, shard, out_path) for shard in shards]
+        for future in futures:
+            shard_rows, shard_skipped = future.result()
+            num_rows += shard_rows
+            for reason, count in shard_skipped.items():
+                skipped[reason] = skipped.get(reason, 0) + count
+
+    return {'rows': num_rows, 'skipped': skipped, 'seconds': time.perf_counter() - start}
+
+
+
+def benchmark_ingest(store_path=os.path.join('data', 'matches_raw'), max_workers=None):
+    """
+    Measures ingestion throughput with 1, 2, 4, ... worker processes up to `max_workers`.
+
+    Args:
+        store_path (str, optional): Directory of the match store. Defaults to 'data/matches_raw'.
+        max_workers (int, optional): Largest number of workers to try. Defaults to the number of CPUs.
+
+    Returns:
+        list: One dict per run with 'workers', 'rows', 'seconds', 'rows_per_second' and 'speedup' over 1 worker.
+    """
+
+    import tempfile
+
+    max_workers = max_workers or os.cpu_count()
+    counts = sorted(set([2 ** i for i in range(max_workers.bit_length()) if 2 ** i <= max_workers] + [max_workers]))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in counts:
+            run = ingest_store(store_path, os.path.join(tmp, f'workers-{workers}'), workers)
+            results.append({'workers': workers,
+                            'rows': run['rows'],
+                            'seconds': run['seconds'],
+                            'rows_per_second': run['rows'] / run['seconds'],
+                            'speedup': results[0]['seconds'] / run['seconds'] if results else 1.0})
+    return results
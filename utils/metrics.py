@@ -0,0 +1,302 @@
+# Necessary imports
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+
+
+# Every recording function returns straight away while this is False, so instrumented code costs one attribute check
+enabled = False
+
+# Upper bounds of the latency histogram buckets, in seconds
+buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+_lock = threading.Lock()
+_counters = {}                                  # (name, labels) -> value
+_gauges = {}                                    # (name, labels) -> value
+_histograms = {}                                # (name, labels) -> [bucket counts, sum, count]
+_writer = None
+
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+
+def enable(path=None, interval=10.0):
+    """
+    Turns metrics on, optionally writing a snapshot to a file every `interval` seconds and on exit.
+
+    Args:
+        path (str, optional): JSON file to write snapshots to (see `write`). Defaults to None.
+        interval (float, optional): Seconds between snapshots. Defaults to 10.
+    """
+
+    global enabled, _writer
+    enabled = True
+    if path is None or _writer is not None:
+        return
+
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            write(path)
+
+    _writer = (threading.Thread(target=loop, daemon=True), stop)
+    _writer[0].start()
+    atexit.register(write, path)
+
+
+
+def disable():
+    """Turns metrics off and stops writing snapshots. Recorded values are kept until `reset`."""
+    global enabled, _writer
+    enabled = False
+    if _writer is not None:
+        _writer[1].set()
+        _writer = None
+
+
+
+def reset():
+    """Clears every recorded value."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+
+def count(name, value=1, **labels):
+    """
+    Adds to a counter.
+
+    Args:
+        name (str): Counter name, e.g. 'api_responses_total'.
+        value (float, optional): Amount to add. Defaults to 1.
+        **labels: Label values, e.g. host='na1'.
+    """
+
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+
+def set_gauge(name, value, **labels):
+    """
+    Sets a gauge to its latest value.
+
+    Args:
+        name (str): Gauge name, e.g. 'api_quota_headroom'.
+        value (float): Value.
+        **labels: Label values.
+    """
+
+    if not enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+
+def observe(name, seconds, **labels):
+    """
+    Records a duration in a histogram.
+
+    Args:
+        name (str): Histogram name, e.g. 'api_request_seconds'.
+        seconds (float): Duration.
+        **labels: Label values.
+    """
+
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * len(buckets), 0.0, 0]
+        for i, bound in enumerate(buckets):
+            if seconds <= bound:
+                histogram[0][i] += 1
+                break
+        histogram[1] += seconds
+        histogram[2] += 1
+
+
+
+def record_rows(stage, rows, seconds):
+    """
+    Records the throughput of a pipeline stage.
+
+    Args:
+        stage (str): Stage name, e.g. 'prep_for_rec'.
+        rows (int): Number of rows handled.
+        seconds (float): Time taken.
+    """
+
+    if not enabled:
+        return
+    count('pipeline_rows_total', rows, stage=stage)
+    count('pipeline_seconds_total', seconds, stage=stage)
+    if seconds > 0:
+        set_gauge('pipeline_rows_per_second', rows / seconds, stage=stage)
+
+
+
+def timed(name, **labels):
+    """
+    Decorator recording the duration of every call in a histogram while metrics are on.
+
+    Args:
+        name (str): Histogram name.
+        **labels: Label values.
+
+    Returns:
+        callable: The decorator.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+
+def _quantile(histogram, q):
+    # Upper bound of the bucket holding the q-th quantile
+    target = q * histogram[2]
+    seen = 0
+    for bound, bucket_count in zip(buckets, histogram[0]):
+        seen += bucket_count
+        if seen >= target:
+            return bound
+    return buckets[-1]
+
+
+
+def snapshot():
+    """
+    Gets every recorded value.
+
+    Returns:
+        dict: 'counters' and 'gauges' as lists of {'name', 'labels', 'value'}, and 'histograms' as lists of
+            {'name', 'labels', 'count', 'sum', 'mean', 'p50', 'p90', 'p99', 'buckets'}.
+    """
+
+    with _lock:
+        counters = [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in _counters.items()]
+        gauges = [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in _gauges.items()]
+        histograms = []
+        for (name, labels), histogram in _histograms.items():
+            bucket_counts, seconds, total = histogram
+            histograms.append({'name': name, 'labels': dict(labels), 'count': total, 'sum': seconds, 'mean': seconds / total if total else 0.0,
+                               'p50': _quantile(histogram, 0.5), 'p90': _quantile(histogram, 0.9), 'p99': _quantile(histogram, 0.99),
+                               'buckets': dict(zip(map(str, buckets), bucket_counts))})
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'pid': os.getpid(), 'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+
+
+def write(path):
+    """
+    Writes a snapshot (see `snapshot`) to a JSON file, replacing it in one step so readers never see half a file.
+
+    Args:
+        path (str): File to write.
+    """
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump(snapshot(), file, indent=1)
+    os.replace(f'{path}.tmp', path)
+
+
+
+def render():
+    """
+    Formats every recorded value in the Prometheus text format.
+
+    Returns:
+        str: The metrics page.
+    """
+
+    def labels_text(labels, extra=()):
+        pairs = list(labels.items()) + list(extra)
+        return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}' if pairs else ''
+
+    current = snapshot()
+    lines = []
+    for kind in ('counters', 'gauges'):
+        for metric in current[kind]:
+            lines.append(f'{metric["name"]}{labels_text(metric["labels"])} {metric["value"]}')
+    for metric in current['histograms']:
+        cumulative = 0
+        for bound, bucket_count in metric['buckets'].items():
+            cumulative += bucket_count
+            le = '+Inf' if bound == 'inf' else bound
+            lines.append(f'{metric["name"]}_bucket{labels_text(metric["labels"], [("le", le)])} {cumulative}')
+        lines.append(f'{metric["name"]}_sum{labels_text(metric["labels"])} {metric["sum"]}')
+        lines.append(f'{metric["name"]}_count{labels_text(metric["labels"])} {metric["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+
+def serve(host='127.0.0.1', port=9100):
+    """
+    Serves the metrics page at `/metrics` (Prometheus text) and `/metrics.json` on a background thread.
+
+    Args:
+        host (str, optional): Address to listen on. Defaults to '127.0.0.1'.
+        port (int, optional): Port to listen on. Defaults to 9100.
+
+    Returns:
+        ThreadingHTTPServer: The running server. Call `shutdown` to stop it.
+    """
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, content_type = render().encode(), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body, content_type = json.dumps(snapshot()).encode(), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+
+# Metrics can be turned on without code changes, e.g. LEAGUE_METRICS=data/metrics-{pid}.json python ingest.py.
+# Worker processes inherit the variable, so {pid} gives each process its own file
+if os.environ.get('LEAGUE_METRICS'):
+    enable(None if os.environ['LEAGUE_METRICS'] == '1' else os.environ['LEAGUE_METRICS'].format(pid=os.getpid()))
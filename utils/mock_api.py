@@ -0,0 +1,418 @@
+# Necessary imports
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from utils.const import app_rate_limits, ladder_sizes, method_rate_limits, region_routing
+from utils.fetch import parse_rate_limits
+
+
+
+# Endpoints served, as (method, host kind, path pattern)
+mock_routes = [
+    ('league-v4.getChallengerLeague', 'platform', re.compile(r'/lol/league/v4/challengerleagues/by-queue/RANKED_SOLO_5x5')),
+    ('league-v4.getGrandmasterLeague', 'platform', re.compile(r'/lol/league/v4/grandmasterleagues/by-queue/RANKED_SOLO_5x5')),
+    ('league-v4.getMasterLeague', 'platform', re.compile(r'/lol/league/v4/masterleagues/by-queue/RANKED_SOLO_5x5')),
+    ('league-v4.getLeagueEntries', 'platform', re.compile(r'/lol/league/v4/entries/RANKED_SOLO_5x5/(?P<tier>[A-Z]+)/(?P<division>I{1,3}|IV)')),
+    ('summoner-v4.getByPUUID', 'platform', re.compile(r'/lol/summoner/v4/summoners/by-puuid/(?P<puuid>[^/]+)')),
+    ('summoner-v4.getBySummonerId', 'platform', re.compile(r'/lol/summoner/v4/summoners/(?P<summoner_id>[^/]+)')),
+    ('match-v5.getMatchIdsByPUUID', 'routing', re.compile(r'/lol/match/v5/matches/by-puuid/(?P<puuid>[^/]+)/ids')),
+    ('match-v5.getMatch', 'routing', re.compile(r'/lol/match/v5/matches/(?P<match_id>[^/]+)'))
+]
+
+
+
+class MockRiotAPI:
+    """
+    Stand-in for the league-v4, summoner-v4 and match-v5 endpoints of the Riot API, for load-testing the crawler offline.
+
+    The players of every region are ranked and fill the ladder tiers best first, `ladder_sizes` players each, and every
+    match is played by ten players of similar rank, so histories overlap the most at the top, as on the real ladder.
+    Matches are `synthetic_match`es, or recorded ones from a `MatchStore` (see `from_store`).
+
+    Every request is counted against an application limit per host and a method limit per (host, method), with the
+    real windows (`app_rate_limits`, `method_rate_limits`) unless others are given. Responses carry the `X-App-Rate-Limit`
+    and `X-Method-Rate-Limit` headers and their counts, and a request over a limit gets a 429 with `Retry-After` and
+    `X-Rate-Limit-Type`. Latency, 503 errors and dropped connections can be injected. Whether the n-th attempt at a
+    path fails, and how long it takes, only depends on `seed`, the path and n, so runs are reproducible.
+
+    Example:
+        server = create_mock_server(MockRiotAPI(['NA1'], players=2000, matches=20000, latency=0.05, error_rate=0.01))
+        # In another process: api_base_url=http://127.0.0.1:8080/{host} python crawl.py --regions NA1
+    """
+
+    divisions = ('I', 'II', 'III', 'IV')
+    page_size = 205
+
+    def __init__(self, regions=('NA1',), players=2000, matches=20000, patches=('14.17',), app_limits=app_rate_limits,
+                 method_limits=None, latency=0.0, error_rate=0.0, drop_rate=0.0, seed=0, ladder_puuids=True):
+        unknown = [region for region in regions if region not in region_routing]
+        if unknown:
+            raise ValueError(f'Unknown regions: {unknown}. Valid options are {list(region_routing)}.')
+
+        self.patches = patches
+        self.app_limits = parse_rate_limits(app_limits)
+        self.method_limits = {method: parse_rate_limits(limits) for method, limits in {**method_rate_limits, **(method_limits or {})}.items()}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.seed = seed
+        self.ladder_puuids = ladder_puuids
+        self.stats = Counter()                  # (method, status) -> responses, status 'dropped' for dropped connections
+        self._lock = threading.Lock()
+        self._windows = {}                      # (key, seconds) -> deque of request times
+        self._attempts = Counter()              # path -> attempts so far
+
+        self.players = {}                       # PUUID -> {'region', 'summoner_id', 'tier', 'rank'}
+        self.summoners = {}                     # Summoner ID -> PUUID
+        self.ladders = {}                       # region -> tier -> PUUIDs, best first
+        self.histories = {}                     # PUUID -> [(start time in ms, match ID), ...], newest first
+        self._matches = {}                      # Match ID -> (region, match number, PUUIDs, start time in ms)
+        self._store = None
+
+        # Ten players of close rank per match, so the best players keep meeting each other
+        now = int(time.time() * 1000)
+        for region in regions:
+            rng = random.Random(f'{seed}-{region}')
+            ranked = [f'mock-{region}-{rank}' for rank in range(players)]
+            self._add_players(region, ranked)
+            spread = max(5.0, players * 0.01)
+            for number in range(matches):
+                center = rng.randrange(players)
+                match_players = set()
+                while len(match_players) < min(10, players):
+                    match_players.add(min(players - 1, max(0, round(rng.gauss(center, spread)))))
+                start = now - (matches - number) * 60000 // max(1, len(regions))
+                self._add_match(f'{region}_{6000000000 + number}', region, number, [ranked[rank] for rank in match_players], start)
+        self._sort_histories()
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        """
+        Serves recorded matches. Players are ranked by how many of the matches they played.
+
+        Args:
+            store (MatchStore): Store of recorded match details, kept open while serving.
+            **kwargs: Passed on to `MockRiotAPI`, except `regions`, `players`, `matches` and `patches`.
+
+        Returns:
+            MockRiotAPI: The API.
+        """
+
+        api = cls(regions=(), players=0, matches=0, **kwargs)
+        api._store = store
+        games = {}
+        for match_json in store.iter_matches():
+            match_id = match_json['metadata']['matchId']
+            region = match_id.split('_')[0]
+            info = match_json.get('info', {})
+            puuids = list(match_json['metadata'].get('participants', []))
+            api._add_match(match_id, region, None, puuids, info.get('gameStartTimestamp', info.get('gameCreation', 0)))
+            for puuid in puuids:
+                games.setdefault(region, Counter())[puuid] += 1
+        for region, counts in games.items():
+            api._add_players(region, [puuid for puuid, _ in counts.most_common()])
+        api._sort_histories()
+        return api
+
+    def _add_players(self, region, ranked):
+        # Fills the tiers with players, best first, `ladder_sizes` players each
+        ladder = self.ladders.setdefault(region, {})
+        start = 0
+        for tier, size in ladder_sizes.items():
+            stop = min(len(ranked), start + size)
+            ladder[tier] = ranked[start:stop]
+            for rank, puuid in enumerate(ladder[tier], start):
+                summoner_id = f'summoner-{puuid}'
+                self.players[puuid] = {'region': region, 'summoner_id': summoner_id, 'tier': tier, 'rank': rank}
+                self.summoners[summoner_id] = puuid
+            start = stop
+
+    def _add_match(self, match_id, region, number, puuids, start):
+        self._matches[match_id] = (region, number, puuids, start)
+        for puuid in puuids:
+            self.histories.setdefault(puuid, []).append((start, match_id))
+
+    def _sort_histories(self):
+        for history in self.histories.values():
+            history.sort(reverse=True)
+
+    def _uniform(self, path, attempt, kind):
+        # Uniform number in [0, 1) fixed by the seed, path, attempt and kind of fault
+        digest = hashlib.blake2b(f'{self.seed}|{path}|{attempt}|{kind}'.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') / 2 ** 64
+
+    def _admit(self, host, method):
+        # Counts the request against the limits of the host and method, or returns the limit it is over
+        now = time.monotonic()
+        limits = [('application', host, self.app_limits), ('method', (host, method), self.method_limits.get(method, []))]
+        with self._lock:
+            for limit_type, key, windows in limits:
+                for count, seconds in windows:
+                    times = self._windows.setdefault((key, seconds), deque())
+                    while times and times[0] <= now - seconds:
+                        times.popleft()
+                    if len(times) >= count:
+                        return limit_type, max(1, math.ceil(times[0] + seconds - now)), self._counts(limits)
+            for _, key, windows in limits:
+                for count, seconds in windows:
+                    self._windows[(key, seconds)].append(now)
+            return None, 0, self._counts(limits)
+
+    def _counts(self, limits):
+        # Rate limit headers of a response
+        headers = {}
+        for (_, key, windows), name in zip(limits, ('App', 'Method')):
+            headers[f'X-{name}-Rate-Limit'] = ','.join(f'{count}:{seconds}' for count, seconds in windows)
+            headers[f'X-{name}-Rate-Limit-Count'] = ','.join(f'{len(self._windows.get((key, seconds), ()))}:{seconds}' for count, seconds in windows)
+        return headers
+
+    def match(self, match_id):
+        """
+        Gets the match-v5 JSON of a match.
+
+        Args:
+            match_id (str): ID of the match.
+
+        Returns:
+            dict: Match details, or None if there is no such match.
+        """
+
+        if match_id not in self._matches:
+            return None
+        if self._store is not None:
+            return self._store.get(match_id)
+
+        from utils.synthetic import synthetic_match
+        region, number, puuids, start = self._matches[match_id]
+        match_json = synthetic_match(number, self.patches, region=region)
+        match_json['metadata'].update(matchId=match_id, participants=puuids)
+        for participant, puuid in zip(match_json['info']['participants'], puuids):
+            participant['puuid'] = puuid
+        match_json['info'].update(gameCreation=start - 60000, gameStartTimestamp=start,
+                                  gameEndTimestamp=start + match_json['info']['gameDuration'] * 1000, platformId=region)
+        return match_json
+
+    def _entry(self, puuid):
+        player = self.players[puuid]
+        rng = random.Random(puuid)
+        entry = {'summonerId': player['summoner_id'], 'leaguePoints': max(0, 2000 - player['rank']),
+                 'rank': 'I', 'wins': rng.randint(50, 400), 'losses': rng.randint(50, 400)}
+        return {'puuid': puuid, **entry} if self.ladder_puuids else entry
+
+    def _summoner(self, puuid):
+        player = self.players[puuid]
+        return {'id': player['summoner_id'], 'puuid': puuid, 'profileIconId': 1, 'summonerLevel': 300}
+
+    def respond(self, host, method, params, query):
+        """
+        Answers a request that passed the rate limits and fault injection.
+
+        Args:
+            host (str): Platform or routing host, e.g. 'na1' or 'americas'.
+            method (str): Method of the route, e.g. 'match-v5.getMatch'.
+            params (dict): Named groups of the route's path pattern.
+            query (dict): Query parameters.
+
+        Returns:
+            tuple: HTTP status code and JSON body.
+        """
+
+        if method.startswith(('league-v4', 'summoner-v4')):
+            region = next((region for region in self.ladders if region.lower() == host), None)
+            if region is None:
+                return 404, {'status': {'message': 'Data not found', 'status_code': 404}}
+            ladder = self.ladders[region]
+
+            if method == 'league-v4.getLeagueEntries':
+                tier = params['tier']
+                if tier not in ladder:
+                    return 400, {'status': {'message': 'Bad request', 'status_code': 400}}
+                if tier in ('CHALLENGER', 'GRANDMASTER', 'MASTER'):
+                    # Apex tiers have a single division
+                    division = ladder[tier] if params['division'] == 'I' else []
+                else:
+                    division = ladder[tier][self.divisions.index(params['division'])::len(self.divisions)]
+                page = int(query.get('page', 1))
+                return 200, [{**self._entry(puuid), 'tier': tier, 'rank': params['division']}
+                             for puuid in division[(page - 1) * self.page_size:page * self.page_size]]
+            if method.startswith('league-v4'):
+                tier = method[len('league-v4.get'):-len('League')].upper()
+                return 200, {'tier': tier, 'leagueId': f'mock-{region}-{tier}', 'queue': 'RANKED_SOLO_5x5', 'name': 'Mock League',
+                             'entries': [self._entry(puuid) for puuid in ladder.get(tier, [])]}
+
+            puuid = params.get('puuid') or self.summoners.get(params.get('summoner_id'))
+            if puuid not in self.players or self.players[puuid]['region'] != region:
+                return 404, {'status': {'message': 'Data not found - summoner not found', 'status_code': 404}}
+            return 200, self._summoner(puuid)
+
+        if method == 'match-v5.getMatchIdsByPUUID':
+            puuid = params['puuid']
+            if puuid not in self.players or region_routing[self.players[puuid]['region']] != host:
+                return 400, {'status': {'message': 'Bad request - Exception decrypting', 'status_code': 400}}
+            since = int(query['startTime']) * 1000 if 'startTime' in query else None
+            start, count = int(query.get('start', 0)), min(int(query.get('count', 20)), 100)
+            queue = int(query.get('queue', 420))
+            match_ids = [match_id for started, match_id in self.histories.get(puuid, [])
+                         if (since is None or started >= since) and queue == 420]
+            return 200, match_ids[start:start + count]
+
+        match_id = params['match_id']
+        if match_id not in self._matches or region_routing.get(self._matches[match_id][0]) != host:
+            return 404, {'status': {'message': 'Data not found - match file not found', 'status_code': 404}}
+        return 200, self.match(match_id)
+
+
+
+def create_mock_server(api, host='127.0.0.1', port=8080):
+    """
+    Creates a threaded HTTP server for a `MockRiotAPI`. Point the crawler at it by setting `api_base_url` to
+    `http://<host>:<port>/{host}`, the first part of the path standing for the platform or routing host.
+
+    Endpoints:
+        GET /<host>/lol/league/v4/..., /<host>/lol/summoner/v4/..., /<host>/lol/match/v5/... -> as the Riot API.
+            A key is required, as the `api_key` query parameter or the `X-Riot-Token` header.
+        GET /mock/stats -> responses so far, keyed by "<method> <status>"
+
+    Args:
+        api (MockRiotAPI): API answering the requests.
+        host (str, optional): Address to listen on. Defaults to '127.0.0.1'.
+        port (int, optional): Port to listen on, 0 for any free port. Defaults to 8080.
+
+    Returns:
+        ThreadingHTTPServer: The server. Call `serve_forever` to start it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True          # Headers and body go out as separate writes
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json;charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/mock/stats':
+                with api._lock:
+                    self._send(200, {f'{method} {status}': count for (method, status), count in sorted(api.stats.items(), key=str)})
+                return
+
+            riot_host, _, path = url.path.lstrip('/').partition('/')
+            riot_host, path = riot_host.lower(), '/' + path
+            route = next(((method, kind, pattern.fullmatch(path)) for method, kind, pattern in mock_routes if pattern.fullmatch(path)), None)
+            platforms = [region.lower() for region in region_routing]
+            if route is None or riot_host not in (platforms if route[1] == 'platform' else set(region_routing.values())):
+                self._send(404, {'status': {'message': 'Not found', 'status_code': 404}})
+                return
+            method, _, match = route
+            query = {name: values[0] for name, values in parse_qs(url.query).items()}
+            if 'api_key' not in query and 'X-Riot-Token' not in self.headers:
+                self._send(401, {'status': {'message': 'Unauthorized', 'status_code': 401}})
+                return
+
+            with api._lock:
+                api._attempts[self.path] += 1
+                attempt = api._attempts[self.path]
+            if api.latency:
+                time.sleep(api.latency * (0.5 + api._uniform(self.path, attempt, 'latency')))
+
+            limit_type, retry_after, headers = api._admit(riot_host, method)
+            if limit_type is not None:
+                status, body = 429, {'status': {'message': 'Rate limit exceeded', 'status_code': 429}}
+                headers.update({'Retry-After': str(retry_after), 'X-Rate-Limit-Type': limit_type})
+            elif api._uniform(self.path, attempt, 'drop') < api.drop_rate:
+                with api._lock:
+                    api.stats[(method, 'dropped')] += 1
+                self.close_connection = True
+                return
+            elif api._uniform(self.path, attempt, 'error') < api.error_rate:
+                status, body = 503, {'status': {'message': 'Service unavailable', 'status_code': 503}}
+            else:
+                status, body = api.respond(riot_host, method, match.groupdict(), query)
+
+            with api._lock:
+                api.stats[(method, status)] += 1
+            self._send(status, body, headers)
+
+        def log_message(self, format, *args):
+            # Logging every request would cost more than answering it
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+
+def benchmark_crawl(api, regions=('NA1',), max_matches=1000, pipeline=True, fetch_engine=None, **kwargs):
+    """
+    Measures crawler throughput against a `MockRiotAPI` served on a free local port, into a temporary frontier and store.
+
+    Args:
+        api (MockRiotAPI): API to crawl.
+        regions (tuple, optional): Platform regions to crawl. Defaults to ('NA1',).
+        max_matches (int, optional): Matches to save per region. Defaults to 1000.
+        pipeline (bool, optional): Crawl with `CrawlPipeline` rather than `CrawlScheduler`. Defaults to True.
+        fetch_engine (FetchEngine, optional): Engine to crawl with. Defaults to a new one with the mock's application limits.
+        **kwargs: Passed on to `CrawlPipeline` or `CrawlScheduler`.
+
+    Returns:
+        dict: Matches 'saved', 'seconds' taken, 'matches_per_second', the mock's 'responses' per method and status,
+            and the engine's 'requests' per host (see `RequestStats.summary`).
+    """
+
+    import asyncio
+    from utils import func
+    from utils.crawl import CrawlPipeline, CrawlScheduler
+    from utils.fetch import FetchEngine, run
+    from utils.frontier import Frontier
+    from utils.store import MatchStore
+
+    server = create_mock_server(api, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url, api_key = os.environ.get('api_base_url'), func.api_key
+    os.environ['api_base_url'] = f'http://127.0.0.1:{server.server_address[1]}/{{host}}'
+    func.api_key = api_key or 'mock'            # Any key will do
+    fetch_engine = fetch_engine or FetchEngine(app_limits=','.join(f'{count}:{seconds}' for count, seconds in api.app_limits))
+    path = tempfile.mkdtemp()
+    try:
+        with Frontier(os.path.join(path, 'frontier.sqlite')) as frontier, MatchStore(os.path.join(path, 'matches')) as store:
+            start = time.perf_counter()
+            if pipeline:
+                async def crawl_all():
+                    crawlers = [CrawlPipeline(region, store, frontier, fetch_engine=fetch_engine, **kwargs) for region in regions]
+                    return await asyncio.gather(*(crawler.crawl_async(max_matches) for crawler in crawlers))
+                saved = sum(result['saved'] for result in run(crawl_all()))
+            else:
+                saved = sum(CrawlScheduler(regions, frontier, store, fetch_engine=fetch_engine, **kwargs).crawl(max_matches).values())
+            seconds = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+        func.api_key = api_key
+        if base_url is None:
+            del os.environ['api_base_url']
+        else:
+            os.environ['api_base_url'] = base_url
+        shutil.rmtree(path, ignore_errors=True)
+
+    return {'saved': saved, 'seconds': seconds, 'matches_per_second': saved / seconds,
+            'responses': {f'{method} {status}': count for (method, status), count in sorted(api.stats.items(), key=str)},
+            'requests': fetch_engine.stats.summary()}
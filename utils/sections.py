@@ -0,0 +1,127 @@
+# Necessary imports
+import numpy as np
+
+
+
+# Indexes built so far, by id of the section map they were built from
+_indexes = {}
+
+
+
+def section_index(section_map, group_level=None):
+    """
+    Flattens a rune or stat section map into a list of cells, so counting runes or stats is a single
+    bincount over cell positions and the nested dicts are only built at the end (see `nest_cells`).
+    The index of each map is only built once.
+
+    Args:
+        section_map (dict): {section: {slot: [runes]}} or {category: [stats]}, e.g. `utils.const.rune_section_map`.
+        group_level (int, optional): Level of the key a column's values are looked up under: 1 for the slot of a rune map,
+            0 for the category of a stat map. Defaults to None, looking values up across every cell.
+
+    Returns:
+        tuple: List of the key path of every cell, in display order, and a dict of group -> value -> cell position.
+
+    Raises:
+        ValueError: If a value appears twice in the same group.
+    """
+
+    key = (id(section_map), group_level)
+    if key in _indexes and _indexes[key][0] is section_map:
+        return _indexes[key][1]
+
+    def walk(node, path):
+        if isinstance(node, dict):
+            for name, child in node.items():
+                yield from walk(child, path + (name,))
+        else:
+            for value in node:
+                yield path + (value,)
+
+    paths = list(walk(section_map, ()))
+    lookup = {}
+    for position, path in enumerate(paths):
+        group = lookup.setdefault(None if group_level is None else path[group_level], {})
+        if path[-1] in group:
+            raise ValueError(f'{path[-1]} appears more than once in the same group of the section map.')
+        group[path[-1]] = position
+
+    _indexes[key] = (section_map, (paths, lookup))
+    return paths, lookup
+
+
+
+def cell_positions(values, lookup, group=None):
+    """
+    Maps values to their cell positions.
+
+    Args:
+        values (iterable): Values to look up, e.g. the categories of a rune column.
+        lookup (dict): Group -> value -> cell position, from `section_index`.
+        group (str, optional): Group to look the values up in. Defaults to None.
+
+    Returns:
+        np.ndarray: Cell position of each value, -1 for values not in the map.
+    """
+
+    cells = lookup.get(group, {})
+    return np.array([cells.get(value, -1) for value in values], dtype=np.intp)
+
+
+
+def count_cells(df, columns, index, groups=None):
+    """
+    Counts the values of some columns into the cells of a section index with one bincount.
+
+    Args:
+        df (pd.DataFrame): Data to count.
+        columns (list): Columns to count.
+        index (tuple): Index from `section_index`.
+        groups (list, optional): Group each column's values are looked up in. Defaults to None for every column.
+
+    Returns:
+        tuple: Count of every cell as an np.ndarray, and a dict counting the values that are not in the map.
+    """
+
+    import pandas as pd
+
+    paths, lookup = index
+    groups = groups or [None] * len(columns)
+    cells = []
+    unknown = {}
+    for column, group in zip(columns, groups):
+        codes, values = pd.factorize(df[column])
+        column_cells = cell_positions(values, lookup, group)[codes]
+        column_cells[codes < 0] = -2        # Missing values are not counted or flagged
+        cells.append(column_cells)
+
+        missing = column_cells == -1
+        if missing.any():
+            missing_counts = np.bincount(codes[missing], minlength=len(values))
+            for code in np.flatnonzero(missing_counts):
+                unknown[values[code]] = unknown.get(values[code], 0) + int(missing_counts[code])
+
+    cells = np.concatenate(cells) if cells else np.empty(0, dtype=np.intp)
+    return np.bincount(cells[cells >= 0], minlength=len(paths)), unknown
+
+
+
+def nest_cells(paths, counts):
+    """
+    Builds the nested section dict of a section index, e.g. {section: {slot: {rune: count}}}.
+
+    Args:
+        paths (list): Key path of every cell, from `section_index`.
+        counts (np.ndarray): Count of every cell.
+
+    Returns:
+        dict: Counts in the shape of the section map.
+    """
+
+    nested = {}
+    for path, count in zip(paths, counts.tolist()):
+        node = nested
+        for name in path[:-1]:
+            node = node.setdefault(name, {})
+        node[path[-1]] = count
+    return nested
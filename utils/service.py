@@ -0,0 +1,328 @@
+# Necessary imports
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from utils import metrics
+from utils.const import rune_section_map, sec_rune_section_map, stat_section_map
+from utils.cube import AggregateCube, PatchIndex
+from utils.formatting import display_most_popular
+
+
+
+class RecommendationService:
+    """
+    Headless recommendations from a saved cube snapshot (see `AggregateCube.save`), with an LRU cache of
+    encoded JSON responses keyed by (champion, role, num_items, patch window, data version).
+
+    The data version is the modification time of the snapshot's `meta.json`, checked at most once every
+    `check_interval` seconds. When it changes the snapshot is reloaded and the cache emptied, so a cube
+    refreshed by the crawler is picked up without restarting. Safe to call from many threads at once.
+
+    With a saved `PatchIndex`, queries can be limited to the last few patches or weighted by recency.
+
+    Example:
+        service = RecommendationService()
+        status, body = service.query('AHRI', 'MIDDLE')
+    """
+
+    def __init__(self, cube_path=os.path.join('data', 'cube'), cache_size=4096, check_interval=1.0, index_path=None):
+        self.cube_path = cube_path
+        self.index_path = index_path
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self._cache = OrderedDict()             # (champion, role, num_items, last, half_life, version) -> (status, JSON bytes)
+        self._lock = threading.Lock()
+        self._checked = 0
+        self.version = None
+        self.cube = None
+        self.index = None
+        self.hits = 0
+        self.misses = 0
+        self._refresh(force=True)
+
+    def _snapshot_version(self):
+        stat = os.stat(os.path.join(self.cube_path, 'meta.json'))
+        version = f'{stat.st_mtime_ns}-{stat.st_size}'
+        if self.index_path is not None and os.path.exists(os.path.join(self.index_path, PatchIndex.index_name)):
+            stat = os.stat(os.path.join(self.index_path, PatchIndex.index_name))
+            version += f'/{stat.st_mtime_ns}-{stat.st_size}'
+        return version
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return
+        self._checked = now
+
+        version = self._snapshot_version()
+        if version == self.version:
+            return
+        with self._lock:
+            if version == self.version:
+                return
+            self.cube = AggregateCube.load(self.cube_path, match_ids=False)
+            if '/' in version:
+                self.index = PatchIndex.load(self.index_path, match_ids=False)
+            self.version = version
+            self._cache.clear()
+
+    def _window(self, last, half_life):
+        # Cube of the requested patches and the patch list, or a message if there is no patch index
+        if not (last or half_life):
+            return self.cube, None
+        if self.index is None:
+            return 'Patch windows need a patch index (see refresh_patch_index).', None
+        cube_patches = self.index.patches()[-last:] if last else self.index.patches()
+        return self.index.window(patches=cube_patches, half_life=half_life), cube_patches
+
+    def recommend(self, champion_name, role, num_items=10, last=None, half_life=None):
+        """
+        Gets the recommendations of a (champion, role) as a JSON-serializable dict.
+
+        Args:
+            champion_name (str): Champion name, any case.
+            role (str): Role, any case.
+            num_items (int, optional): Number of items to return. Defaults to 10.
+            last (int, optional): Only count the newest `last` patches. Needs a patch index. Defaults to every patch.
+            half_life (float, optional): Weight patches by recency with this half-life in patches. Needs a patch index. Defaults to no weighting.
+
+        Returns:
+            dict or str: Recommendations and their text as shown in the GUI, or a message if there is no data.
+        """
+
+        self._refresh()
+        champion_name, role = champion_name.upper(), role.upper()
+        cube, cube_patches = self._window(last, half_life)
+        if isinstance(cube, str):
+            return cube
+        recommendations = cube.recommend(champion_name, role, rune_section_map, sec_rune_section_map, stat_section_map, as_series=False)
+        if isinstance(recommendations, str):
+            return recommendations
+
+        return {
+            'champion': champion_name,
+            'role': role,
+            'version': self.version,
+            'patches': cube_patches,
+            'games': int(cube.games[cube._rows[(champion_name, role)]]),
+            'items': recommendations['Items'][:num_items],
+            'runes': recommendations['Runes'],
+            'secondary_runes': recommendations['Secondary Runes'],
+            'stats': recommendations['Stats'],
+            'summoner_spells': recommendations['Summoner Spells'],
+            'unknown_runes': recommendations['Unknown Runes'],
+            'cores': [{'items': items, 'count': count, 'share': share} for items, count, share in recommendations.get('Cores', [])],
+            'text': display_most_popular(recommendations, num_items)
+        }
+
+    @metrics.timed('service_query_seconds', endpoint='next_items')
+    def next_items(self, champion_name, role, items=(), top=10, last=None):
+        """
+        Gets the items most often built with some items (see `BuildIndex.next_items`). Not cached, as it is a few binary searches.
+
+        Args:
+            champion_name (str): Champion name, any case.
+            role (str): Role, any case.
+            items (list, optional): Items already built, as named in the data. Defaults to none.
+            top (int, optional): Number of items to return. Defaults to 10.
+            last (int, optional): Only count the newest `last` patches. Defaults to every patch.
+
+        Returns:
+            dict or str: The next items, or a message if there is no data or no build index.
+        """
+
+        self._refresh()
+        champion_name, role = champion_name.upper(), role.upper()
+        cube, cube_patches = self._window(last, None)
+        if isinstance(cube, str):
+            return cube
+        if cube.builds is None:
+            return 'The cube has no build index. Rebuild it to answer next-item queries.'
+        if (champion_name, role) not in cube:
+            return f'No data available for champion {champion_name} in role {role}.'
+
+        return {
+            'champion': champion_name,
+            'role': role,
+            'version': self.version,
+            'patches': cube_patches,
+            'items': list(items),
+            'builds': cube.builds.count(champion_name, role, items),
+            'next_items': [{'item': item, 'count': count, 'share': share} for item, count, share in cube.builds.next_items(champion_name, role, items, top)]
+        }
+
+    @metrics.timed('service_query_seconds')
+    def query(self, champion_name, role, num_items=10, last=None, half_life=None):
+        """
+        Gets the encoded JSON response of a (champion, role), from the cache when possible.
+
+        Args:
+            champion_name (str): Champion name, any case.
+            role (str): Role, any case.
+            num_items (int, optional): Number of items to return. Defaults to 10.
+            last (int, optional): Only count the newest `last` patches. Defaults to every patch.
+            half_life (float, optional): Recency half-life in patches. Defaults to no weighting.
+
+        Returns:
+            tuple: HTTP status code (200, or 404 if there is no data) and the JSON body as bytes.
+        """
+
+        self._refresh()
+        key = (champion_name.upper(), role.upper(), num_items, last, half_life, self.version)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                metrics.count('service_cache_total', result='hit')
+                return self._cache[key]
+            self.misses += 1
+        metrics.count('service_cache_total', result='miss')
+
+        recommendations = self.recommend(champion_name, role, num_items, last, half_life)
+        if isinstance(recommendations, str):
+            response = (404, json.dumps({'error': recommendations}).encode())
+        else:
+            response = (200, json.dumps(recommendations).encode())
+
+        with self._lock:
+            # Responses computed against a snapshot that was just replaced are not cached
+            if key[-1] == self.version:
+                self._cache[key] = response
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return response
+
+    def champions(self):
+        """
+        Gets the (champion, role) pairs that have data.
+
+        Returns:
+            dict: Champion name -> list of roles.
+        """
+
+        self._refresh()
+        champions = {}
+        for champion, role in self.cube.keys:
+            champions.setdefault(champion, []).append(role)
+        return champions
+
+    def stats(self):
+        """
+        Gets the cache statistics.
+
+        Returns:
+            dict: Data version, number of cached responses, cache hits and misses.
+        """
+
+        return {'version': self.version, 'cached': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+
+
+def create_server(service, host='127.0.0.1', port=8000):
+    """
+    Creates a threaded HTTP server for a `RecommendationService`. Connections are kept alive between requests.
+
+    Endpoints:
+        GET /recommend?champion=AHRI&role=MIDDLE&num_items=10 -> recommendations (404 if there is no data)
+            Add last_patches=2 or half_life=1.5 to only count recent patches, if the service has a patch index.
+        GET /next_items?champion=AHRI&role=MIDDLE&item=Shadowflame&item=Zhonya's%20Hourglass&top=10 -> items most often built
+            with the given ones, with counts and shares (404 if there is no data). Add last_patches=2 for recent patches only.
+        GET /champions -> champion name -> roles with data
+        GET /health -> data version and cache statistics
+        GET /metrics -> instrumentation in the Prometheus text format (see `utils.metrics`)
+
+    Args:
+        service (RecommendationService): Service answering the queries.
+        host (str, optional): Address to listen on. Defaults to '127.0.0.1'.
+        port (int, optional): Port to listen on. Defaults to 8000.
+
+    Returns:
+        ThreadingHTTPServer: The server. Call `serve_forever` to start it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True          # Headers and body go out as separate writes
+
+        def _send(self, status, body, content_type='application/json'):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {name: values[0] for name, values in parse_qs(url.query).items()}
+
+            if url.path == '/recommend':
+                if 'champion' not in params or 'role' not in params:
+                    self._send(400, b'{"error": "champion and role are required."}')
+                    return
+                try:
+                    num_items = int(params.get('num_items', 10))
+                    last = int(params['last_patches']) if 'last_patches' in params else None
+                    half_life = float(params['half_life']) if 'half_life' in params else None
+                except ValueError:
+                    self._send(400, b'{"error": "num_items and last_patches must be integers, half_life a number."}')
+                    return
+                self._send(*service.query(params['champion'], params['role'], num_items, last, half_life))
+            elif url.path == '/next_items':
+                if 'champion' not in params or 'role' not in params:
+                    self._send(400, b'{"error": "champion and role are required."}')
+                    return
+                try:
+                    top = int(params.get('top', 10))
+                    last = int(params['last_patches']) if 'last_patches' in params else None
+                except ValueError:
+                    self._send(400, b'{"error": "top and last_patches must be integers."}')
+                    return
+                result = service.next_items(params['champion'], params['role'], parse_qs(url.query).get('item', []), top, last)
+                if isinstance(result, str):
+                    self._send(404, json.dumps({'error': result}).encode())
+                else:
+                    self._send(200, json.dumps(result).encode())
+            elif url.path == '/champions':
+                self._send(200, json.dumps(service.champions()).encode())
+            elif url.path == '/health':
+                self._send(200, json.dumps(service.stats()).encode())
+            elif url.path == '/metrics':
+                self._send(200, metrics.render().encode(), 'text/plain; version=0.0.4')
+            else:
+                self._send(404, b'{"error": "Not found."}')
+
+        def log_message(self, format, *args):
+            # Logging every request would cost more than answering it
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+
+def run_batch(service, queries, num_items=10, last=None, half_life=None):
+    """
+    Answers a batch of queries.
+
+    Args:
+        service (RecommendationService): Service answering the queries.
+        queries (iterable): (champion, role) pairs.
+        num_items (int, optional): Number of items to return. Defaults to 10.
+        last (int, optional): Only count the newest `last` patches. Defaults to every patch.
+        half_life (float, optional): Recency half-life in patches. Defaults to no weighting.
+
+    Yields:
+        dict: Recommendations of each query, or {'champion', 'role', 'error'} if there is no data.
+    """
+
+    for champion_name, role in queries:
+        recommendations = service.recommend(champion_name, role, num_items, last, half_life)
+        if isinstance(recommendations, str):
+            yield {'champion': champion_name.upper(), 'role': role.upper(), 'error': recommendations}
+        else:
+            yield recommendations
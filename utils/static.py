@@ -0,0 +1,233 @@
+# Necessary imports
+import json
+import os
+import numpy as np
+
+
+
+def patch_of(version):
+    """
+    Gets the patch of a game version, e.g. '14.17.615.7524' -> '14.17'.
+
+    Args:
+        version (str): Game version, as in the `Game Version` column.
+
+    Returns:
+        str: Patch.
+    """
+
+    return '.'.join(str(version).split('.')[:2])
+
+
+
+def patch_key(patch):
+    # Sort key of a patch, so that '14.9' < '14.10'
+    return tuple(int(part) for part in patch.split('.') if part.isdigit())
+
+
+
+class StaticData:
+    """
+    Versioned local store of the CommunityDragon/DataDragon static data, keyed by patch.
+
+    The first time a patch is needed, `perks.json`, `summoner-spells.json`, `items.json` and `champion.json`
+    are downloaded once and reduced to ID -> name and champion -> class maps, which are saved to
+    `<path>/<patch>.json`. Later loads read only that small file. In offline mode the network is never
+    touched; a patch that was never downloaded falls back to the closest cached patch. Offline mode is either
+    passed in or, when left as None, read from the `static_offline` environment variable (or `.env`) on every load,
+    so the shared store of `utils.func` and worker processes follow it too.
+    """
+
+    cdragon_url = 'https://raw.communitydragon.org/{patch}/plugins/rcp-be-lol-game-data/global/default/v1/{file}'
+    ddragon_url = 'https://ddragon.leagueoflegends.com/cdn/{version}/data/en_US/champion.json'
+    versions_url = 'https://ddragon.leagueoflegends.com/api/versions.json'
+
+    def __init__(self, path=os.path.join('data', 'static'), offline=None):
+        self.path = path
+        self._offline = offline
+        self._maps = {}
+        self._lookups = {}
+
+    @property
+    def offline(self):
+        if self._offline is not None:
+            return self._offline
+        return os.environ.get('static_offline', '').lower() not in ('', '0', 'false')
+
+    @offline.setter
+    def offline(self, offline):
+        self._offline = offline
+
+    def _file(self, patch):
+        return os.path.join(self.path, f'{patch}.json')
+
+    def patches(self):
+        """
+        Gets the patches saved locally.
+
+        Returns:
+            list: Patches, oldest first.
+        """
+
+        if not os.path.isdir(self.path):
+            return []
+        return sorted((name[:-len('.json')] for name in os.listdir(self.path) if name.endswith('.json')), key=patch_key)
+
+    def _download(self, patch):
+        from utils.fetch import engine
+
+        cdragon_patch = 'latest' if patch == 'latest' else patch
+        runes_json = engine.get_json(self.cdragon_url.format(patch=cdragon_patch, file='perks.json'))
+        summs_json = engine.get_json(self.cdragon_url.format(patch=cdragon_patch, file='summoner-spells.json'))
+        items_json = engine.get_json(self.cdragon_url.format(patch=cdragon_patch, file='items.json'))
+
+        # DataDragon wants a full version, e.g. 14.17.1
+        versions = engine.get_json(self.versions_url)
+        version = versions[0] if patch == 'latest' else next((v for v in versions if v.startswith(f'{patch}.')), f'{patch}.1')
+        champion_json = engine.get_json(self.ddragon_url.format(version=version))
+
+        return {
+            'runes': [[entry['id'], entry['name']] for entry in runes_json],
+            'summoner_spells': [[entry['id'], entry['name']] for entry in summs_json],
+            'items': [[int(entry['id']), entry['name']] for entry in items_json],
+            'champion_classes': {name: info.get('tags', []) for name, info in champion_json.get('data', {}).items()}
+        }
+
+    def maps(self, patch='latest'):
+        """
+        Gets the static data maps of a patch, downloading and saving them the first time unless offline.
+
+        Args:
+            patch (str, optional): Patch, e.g. '14.17', or 'latest'. Defaults to 'latest'.
+
+        Returns:
+            dict: 'runes', 'summoner_spells' and 'items' as [id, name] pairs, and 'champion_classes' as name -> tags.
+
+        Raises:
+            FileNotFoundError: If offline and no patch has been saved locally.
+        """
+
+        if patch in self._maps:
+            return self._maps[patch]
+
+        if not os.path.exists(self._file(patch)):
+            if self.offline:
+                cached = self.patches()
+                if not cached:
+                    raise FileNotFoundError(f'No static data saved in {self.path} and offline mode is on.')
+                # Closest cached patch, preferring older ones
+                older = [p for p in cached if p != 'latest' and patch != 'latest' and patch_key(p) <= patch_key(patch)]
+                fallback = older[-1] if older else cached[-1]
+                print(f'Static data for patch {patch} is not saved, using {fallback}.')
+                self._maps[patch] = self.maps(fallback)
+                return self._maps[patch]
+
+            # Downloaded before anything is written, and saved under a temporary name first, so a failed download
+            # or an interrupted write never leaves a broken file behind
+            maps = self._download(patch)
+            os.makedirs(self.path, exist_ok=True)
+            with open(f'{self._file(patch)}.tmp', 'w') as file:
+                json.dump(maps, file)
+            os.replace(f'{self._file(patch)}.tmp', self._file(patch))
+
+        with open(self._file(patch), 'r') as file:
+            self._maps[patch] = json.load(file)
+        return self._maps[patch]
+
+    def lookups(self, patch='latest'):
+        """
+        Gets dense ID -> name lookups of a patch (see `id_lookup`).
+
+        Args:
+            patch (str, optional): Patch, e.g. '14.17', or 'latest'. Defaults to 'latest'.
+
+        Returns:
+            dict: 'runes', 'summoner_spells' and 'items' lookups.
+        """
+
+        if patch not in self._lookups:
+            self._lookups[patch] = {kind: id_lookup([id for id, _ in pairs], [name for _, name in pairs])
+                                    for kind, pairs in self.maps(patch).items() if kind != 'champion_classes'}
+        return self._lookups[patch]
+
+    def champion_classes(self, patch='latest'):
+        """
+        Gets the classes (Mage, Support, Tank, etc.) of every champion in a patch.
+
+        Args:
+            patch (str, optional): Patch, e.g. '14.17', or 'latest'. Defaults to 'latest'.
+
+        Returns:
+            dict: Champion name -> list of classes.
+        """
+
+        return self.maps(patch)['champion_classes']
+
+
+
+def id_lookup(ids, names):
+    """
+    Builds a dense lookup from integer IDs to names.
+
+    Args:
+        ids (list): Integer IDs.
+        names (list): Name of each ID.
+
+    Returns:
+        tuple: An array mapping each ID to the index of its name (-1 for unknown IDs), and the array of unique names.
+    """
+
+    import pandas as pd
+
+    ids = np.asarray(ids, dtype=np.int64)
+    name_codes, unique_names = pd.factorize(pd.Series(names, dtype=object))
+    codes = np.full(ids.max() + 1 if len(ids) else 0, -1, dtype=np.int32)
+    codes[ids] = name_codes
+    return codes, np.asarray(unique_names, dtype=object)
+
+
+
+def encode_ids(df, columns, lookup, patches=None):
+    """
+    Replaces integer ID columns with categoricals of their names, in place. All columns share the same categories.
+    IDs missing from the lookup (e.g. added in a newer patch) are kept as categories named after the ID.
+
+    Args:
+        df (pd.DataFrame): DataFrame to modify.
+        columns (list): Integer ID columns to replace.
+        lookup (tuple or dict): Dense lookup from `id_lookup`, or a dict of them by patch.
+        patches (np.ndarray, optional): Patch of each row, required when `lookup` is a dict.
+    """
+
+    import pandas as pd
+
+    if not isinstance(lookup, dict):
+        lookup = {None: lookup}
+
+    ids = df[columns].to_numpy(dtype=np.int64)
+    name_codes = np.full(ids.shape, -1, dtype=np.int32)
+    positions = {}                              # name -> shared category code
+
+    for patch, (codes, names) in lookup.items():
+        # Map this patch's names onto the shared categories
+        remap = np.array([positions.setdefault(name, len(positions)) for name in names], dtype=np.int32)
+        rows = slice(None) if patches is None else patches == patch
+        patch_ids = ids[rows]
+
+        known = (patch_ids >= 0) & (patch_ids < len(codes))
+        patch_codes = np.full(patch_ids.shape, -1, dtype=np.int32)
+        patch_codes[known] = codes[patch_ids[known]]
+        found = patch_codes >= 0
+        patch_codes[found] = remap[patch_codes[found]]
+        name_codes[rows] = patch_codes
+
+    categories = list(positions)
+    unknown = name_codes < 0
+    if unknown.any():
+        unknown_ids, inverse = np.unique(ids[unknown], return_inverse=True)
+        name_codes[unknown] = len(categories) + inverse
+        categories += [str(unknown_id) for unknown_id in unknown_ids]
+
+    dtype = pd.CategoricalDtype(categories)
+    for i, col in enumerate(columns):
+        df[col] = pd.Categorical.from_codes(name_codes[:, i], dtype=dtype)
@@ -0,0 +1,265 @@
+# Necessary imports
+import gzip
+import json
+import os
+import zlib
+
+
+
+class MatchStore:
+    """
+    On-disk store of raw match-v5 JSON keyed by match ID.
+
+    Each match is gzip-compressed on its own and appended to one of `num_shards` shard files, picked by
+    a hash of its match ID. An append-only index records the shard, offset and length of every match, so
+    membership checks are O(1) dictionary lookups and single matches can be read without touching the rest.
+    A match is only added to the index after its bytes are on disk, so a crash mid-crawl loses at most the
+    match being written and a re-run only needs to fetch what is missing.
+
+    Example:
+        with MatchStore() as store:
+            for match_id in store.missing(matches):
+                store.put(get_match_details(match_id))
+    """
+
+    index_name = 'index.tsv'
+    meta_name = 'store.json'
+
+    def __init__(self, path=os.path.join('data', 'matches_raw'), num_shards=64):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        # The shard count is fixed when the store is created
+        meta_path = os.path.join(path, self.meta_name)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as file:
+                num_shards = json.load(file)['num_shards']
+        else:
+            with open(meta_path, 'w') as file:
+                json.dump({'num_shards': num_shards}, file)
+        self.num_shards = num_shards
+
+        self._index = {}                        # match ID -> (shard, offset, length)
+        index_path = os.path.join(path, self.index_name)
+        if os.path.exists(index_path):
+            valid = 0
+            with open(index_path, 'rb') as file:
+                for line in file:
+                    if not line.endswith(b'\n'):    # Partially written entry from a crash
+                        break
+                    match_id, shard, offset, length = line.decode().rstrip('\n').split('\t')
+                    self._index[match_id] = (int(shard), int(offset), int(length))
+                    valid += len(line)
+            if valid != os.path.getsize(index_path):
+                os.truncate(index_path, valid)
+
+        self._index_file = None
+        self._shard_files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, match_id):
+        return match_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return self.iter_matches()
+
+    def _shard_path(self, shard):
+        return os.path.join(self.path, f'shard-{shard:04d}.gz')
+
+    def shard_of(self, match_id):
+        """
+        Gets the shard a match ID belongs in.
+
+        Args:
+            match_id (str): ID of the match.
+
+        Returns:
+            int: Shard number.
+        """
+
+        return zlib.crc32(match_id.encode()) % self.num_shards
+
+    def ids(self):
+        """
+        Gets the IDs of every stored match.
+
+        Returns:
+            list: Match IDs.
+        """
+
+        return list(self._index)
+
+    def missing(self, match_ids):
+        """
+        Filters match IDs down to the ones not yet in the store, keeping their order.
+
+        Args:
+            match_ids (iterable): IDs of matches.
+
+        Returns:
+            list: Match IDs that still need to be fetched.
+        """
+
+        return [match_id for match_id in dict.fromkeys(match_ids) if match_id not in self._index]
+
+    def put(self, match_json):
+        """
+        Compresses and appends a match to its shard, then records it in the index.
+
+        Args:
+            match_json (dict): The JSON of match details.
+
+        Returns:
+            bool: True if the match was added, False if it was already stored.
+        """
+
+        match_id = match_json['metadata']['matchId']
+        if match_id in self._index:
+            return False
+
+        shard = self.shard_of(match_id)
+        data = gzip.compress(json.dumps(match_json, separators=(',', ':')).encode())
+
+        if shard not in self._shard_files:
+            self._shard_files[shard] = open(self._shard_path(shard), 'ab')
+        shard_file = self._shard_files[shard]
+        offset = shard_file.seek(0, os.SEEK_END)
+        shard_file.write(data)
+        shard_file.flush()
+
+        if self._index_file is None:
+            self._index_file = open(os.path.join(self.path, self.index_name), 'a')
+        self._index_file.write(f'{match_id}\t{shard}\t{offset}\t{len(data)}\n')
+        self._index_file.flush()
+
+        self._index[match_id] = (shard, offset, len(data))
+        return True
+
+    def get(self, match_id):
+        """
+        Reads a single match from the store.
+
+        Args:
+            match_id (str): ID of the match.
+
+        Returns:
+            dict: The JSON of match details.
+
+        Raises:
+            KeyError: If the match is not in the store.
+        """
+
+        shard, offset, length = self._index[match_id]
+        with open(self._shard_path(shard), 'rb') as file:
+            file.seek(offset)
+            return json.loads(gzip.decompress(file.read(length)))
+
+    def iter_matches(self, shards=None):
+        """
+        Streams matches out of the store one at a time, reading each shard front to back.
+
+        Args:
+            shards (iterable, optional): Shard numbers to read. Defaults to all of them.
+
+        Yields:
+            dict: The JSON of match details.
+        """
+
+        # Group index entries by shard and sort by offset so every shard is read sequentially
+        entries = {}
+        for shard, offset, length in self._index.values():
+            entries.setdefault(shard, []).append((offset, length))
+
+        for shard in sorted(entries) if shards is None else shards:
+            if shard not in entries:
+                continue
+            with open(self._shard_path(shard), 'rb') as file:
+                for offset, length in sorted(entries[shard]):
+                    file.seek(offset)
+                    yield json.loads(gzip.decompress(file.read(length)))
+
+    def close(self):
+        """Closes any open shard and index files."""
+        for shard_file in self._shard_files.values():
+            shard_file.close()
+        self._shard_files = {}
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+
+
+
+def iter_legacy_matches(path=os.path.join('data', 'matches_detailed.txt'), chunk_size=1 << 20):
+    """
+    Streams matches out of a legacy `matches_detailed.txt` (one JSON list of every match) one at a time,
+    without parsing the whole file. Memory is bounded by the largest single match plus `chunk_size`.
+
+    Args:
+        path (str, optional): Path of the legacy file. Defaults to 'data/matches_detailed.txt'.
+        chunk_size (int, optional): Number of characters read at a time. Defaults to 1 MiB.
+
+    Yields:
+        dict: The JSON of match details.
+
+    Raises:
+        ValueError: If the file is not a JSON list of objects.
+    """
+
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as file:
+        buffer = file.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f'{path} is not a JSON list.')
+        buffer = buffer[1:]
+        eof = False
+
+        while True:
+            # Skip the separators between list elements
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            if not buffer and eof:
+                raise ValueError(f'{path} ended before the JSON list was closed.')
+
+            try:
+                match_json, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # The next element is cut off at the end of the buffer
+                if eof:
+                    raise
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+
+            yield match_json
+            buffer = buffer[end:]
+
+
+
+def iter_matches(source=os.path.join('data', 'matches_raw')):
+    """
+    Streams matches one at a time from either a `MatchStore` directory or a legacy `matches_detailed.txt`.
+
+    Args:
+        source (str or MatchStore, optional): Store, store directory, or legacy file path. Defaults to 'data/matches_raw'.
+
+    Yields:
+        dict: The JSON of match details.
+    """
+
+    if isinstance(source, MatchStore):
+        yield from source.iter_matches()
+    elif os.path.isdir(source):
+        with MatchStore(source) as store:
+            yield from store.iter_matches()
+    else:
+        yield from iter_legacy_matches(source)
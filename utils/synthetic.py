@@ -0,0 +1,166 @@
+# Necessary imports
+import json
+import os
+import random
+from utils.const import finished_items, rune_section_map, stat_section_map
+
+
+
+# Synthetic IDs, in the ranges Riot uses for each kind of ID
+roles = ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY']
+summoner_spells = ['Flash', 'Ignite', 'Teleport', 'Smite', 'Heal', 'Exhaust', 'Barrier', 'Cleanse', 'Ghost']
+unfinished_items = ['Doran\'s Blade', 'Doran\'s Ring', 'Doran\'s Shield', 'Health Potion', 'Control Ward', 'Long Sword', 'Amplifying Tome', 'Boots']
+champion_classes = ['Assassin', 'Fighter', 'Mage', 'Marksman', 'Support', 'Tank']
+
+rune_ids = {rune: 8000 + i for i, rune in enumerate(dict.fromkeys(rune for slots in rune_section_map.values() for runes in slots.values() for rune in runes))}
+stat_ids = {stat: 5001 + i for i, stat in enumerate(dict.fromkeys(stat for stats in stat_section_map.values() for stat in stats))}
+summoner_spell_ids = {spell: i + 1 for i, spell in enumerate(summoner_spells)}
+item_ids = {item: 3000 + i for i, item in enumerate(finished_items + unfinished_items)}
+
+
+
+def synthetic_static(num_champions=170):
+    """
+    Builds static data maps for the synthetic IDs, in the format saved by `utils.static.StaticData`.
+
+    Args:
+        num_champions (int, optional): Number of champions. Defaults to 170.
+
+    Returns:
+        dict: 'runes', 'summoner_spells' and 'items' as [id, name] pairs, and 'champion_classes' as name -> tags.
+    """
+
+    return {
+        'runes': [[id, name] for name, id in rune_ids.items()] + [[id, name] for name, id in stat_ids.items()],
+        'summoner_spells': [[id, name] for name, id in summoner_spell_ids.items()],
+        'items': [[id, name] for name, id in item_ids.items()],
+        'champion_classes': {f'Champion{i}': [champion_classes[i % len(champion_classes)]] for i in range(num_champions)}
+    }
+
+
+
+def write_synthetic_static(path, patches):
+    """
+    Saves the synthetic static data for some patches, so `StaticData(path, offline=True)` can name synthetic matches.
+
+    Args:
+        path (str): Static data directory.
+        patches (list): Patches to save, e.g. ['14.17'].
+    """
+
+    os.makedirs(path, exist_ok=True)
+    static = synthetic_static()
+    for patch in list(patches) + ['latest']:
+        with open(os.path.join(path, f'{patch}.json'), 'w') as file:
+            json.dump(static, file)
+
+
+
+def synthetic_match(match_number, patches=('14.17',), num_champions=170, skip_rate=0.05, region='NA1'):
+    """
+    Generates the match-v5 JSON of a random match, with every field `process_match` reads.
+
+    Every participant plays a consistent rune page (a keystone and three slots of one tree, two runes of another),
+    one stat shard per category and six item slots, some of them empty or unfinished. A share of the matches are
+    not ranked or are remakes, like a real crawl.
+
+    Args:
+        match_number (int): Number of the match. The same number always gives the same match.
+        patches (tuple, optional): Patches to spread the matches over. Defaults to ('14.17',).
+        num_champions (int, optional): Number of distinct champions. Defaults to 170.
+        skip_rate (float, optional): Share of matches that `process_match` skips. Defaults to 0.05.
+        region (str, optional): Prefix of the match ID. Defaults to 'NA1'.
+
+    Returns:
+        dict: The JSON of match details.
+    """
+
+    rng = random.Random(match_number)
+    trees = list(rune_section_map)
+    items = list(item_ids.values())
+    stat_categories = [('offense', 'Offense'), ('flex', 'Flex'), ('defense', 'Defense')]
+
+    participants = []
+    champions = rng.sample(range(num_champions), 10)
+    for i, champion in enumerate(champions):
+        primary, secondary = rng.sample(trees, 2)
+        secondary_slots = rng.sample(['Slot 1', 'Slot 2', 'Slot 3'], 2)
+        win = (i < 5) == (match_number % 2 == 0)
+        participants.append({
+            'riotIdGameName': f'Player{rng.randrange(10 ** 6)}', 'riotIdTagline': region,
+            'championId': champion + 1, 'championName': f'Champion{champion}', 'champLevel': rng.randint(8, 18),
+            'teamId': 100 if i < 5 else 200, 'teamPosition': roles[i % 5],
+            'kills': rng.randint(0, 20), 'assists': rng.randint(0, 25), 'totalMinionsKilled': rng.randint(0, 350),
+            'totalAllyJungleMinionsKilled': rng.randint(0, 150), 'totalEnemyJungleMinionsKilled': rng.randint(0, 30),
+            'firstBloodKill': rng.random() < 0.1, 'firstTowerKill': rng.random() < 0.1, 'objectivesStolen': int(rng.random() < 0.02),
+            'goldEarned': rng.randint(5000, 20000), 'goldSpent': rng.randint(4000, 20000),
+            'totalDamageDealtToChampions': rng.randint(2000, 60000), 'totalDamageTaken': rng.randint(5000, 60000),
+            'damageSelfMitigated': rng.randint(1000, 50000), 'totalTimeCCDealt': rng.randint(0, 1000),
+            'turretTakedowns': rng.randint(0, 8), 'visionScore': rng.randint(5, 120),
+            'tripleKills': int(rng.random() < 0.1), 'quadraKills': int(rng.random() < 0.02), 'pentaKills': int(rng.random() < 0.005),
+            'gameEndedInSurrender': rng.random() < 0.2, 'win': win,
+            'challenges': {
+                'deathsByEnemyChamps': rng.randint(0, 15), 'goldPerMinute': rng.uniform(200, 700),
+                'teamDamagePercentage': rng.uniform(0.05, 0.45), 'effectiveHealAndShielding': rng.uniform(0, 20000),
+                'turretPlatesTaken': rng.randint(0, 6)
+            },
+            'perks': {
+                'statPerks': {key: stat_ids[rng.choice(stat_section_map[category])] for key, category in stat_categories},
+                'styles': [
+                    {'description': 'primaryStyle',
+                     'selections': [{'perk': rune_ids[rng.choice(runes)]} for runes in rune_section_map[primary].values()]},
+                    {'description': 'subStyle',
+                     'selections': [{'perk': rune_ids[rng.choice(rune_section_map[secondary][slot])]} for slot in secondary_slots]}
+                ]
+            },
+            'summoner1Id': summoner_spell_ids['Flash'],
+            'summoner2Id': summoner_spell_ids[rng.choice(summoner_spells[1:])],
+            # item6 is the trinket, which `process_match` does not read
+            **{f'item{slot}': rng.choice(items) if rng.random() < 0.85 else 0 for slot in range(7)}
+        })
+
+    def objectives():
+        return {name: {'first': rng.random() < 0.5, 'kills': rng.randint(0, limit)}
+                for name, limit in [('baron', 2), ('champion', 40), ('dragon', 4), ('horde', 6), ('inhibitor', 3), ('riftHerald', 1), ('tower', 11)]}
+
+    skip = rng.random()
+    return {
+        'metadata': {'dataVersion': '2', 'matchId': f'{region}_{5000000000 + match_number}',
+                     'participants': [f'puuid-{match_number}-{i}' for i in range(10)]},
+        'info': {
+            'gameDuration': rng.randint(600, 899) if skip < skip_rate / 2 else rng.randint(900, 2700),
+            'gameVersion': f'{patches[match_number % len(patches)]}.{rng.randint(100, 999)}.{rng.randint(1000, 9999)}',
+            'queueId': 440 if skip_rate / 2 <= skip < skip_rate else 420,
+            'participants': participants,
+            'teams': [{'teamId': 100, 'win': participants[0]['win'], 'objectives': objectives()},
+                      {'teamId': 200, 'win': participants[5]['win'], 'objectives': objectives()}]
+        }
+    }
+
+
+
+def synthetic_matches(num_matches, patches=('14.17',), num_distinct=None, **kwargs):
+    """
+    Streams synthetic matches (see `synthetic_match`).
+
+    Args:
+        num_matches (int): Number of matches.
+        patches (tuple, optional): Patches to spread the matches over. Defaults to ('14.17',).
+        num_distinct (int, optional): Only generate this many distinct matches and reuse them under new match IDs,
+            which keeps very large runs fast and small in memory. Defaults to every match being distinct.
+        **kwargs: Passed on to `synthetic_match`.
+
+    Yields:
+        dict: The JSON of match details.
+    """
+
+    pool = {}
+    for match_number in range(num_matches):
+        if num_distinct is None:
+            yield synthetic_match(match_number, patches, **kwargs)
+            continue
+        if match_number % num_distinct not in pool:
+            pool[match_number % num_distinct] = synthetic_match(match_number % num_distinct, patches, **kwargs)
+        template = pool[match_number % num_distinct]
+        yield {'metadata': {**template['metadata'], 'matchId': f'{template["metadata"]["matchId"].split("_")[0]}_{5000000000 + match_number}'},
+               'info': template['info']}